@@ -33,6 +33,22 @@ assert any(app in INSTALLED_APPS for app in ['posts.apps.PostsConfig', 'posts'])
     'Пожалуйста зарегистрируйте приложение в `settings.INSTALLED_APPS`'
 )
 
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def image_index(settings, tmp_path):
+    # Индекс похожих картинок не должен оставаться в дереве проекта.
+    settings.POSTS_IMAGE_INDEX = str(tmp_path / 'image_index.pickle')
+
+
+@pytest.fixture(autouse=True)
+def inline_thumbnails(settings):
+    # Фоновые потоки миниатюр писали бы в базу во время очистки таблиц
+    # между транзакционными тестами.
+    settings.POSTS_THUMBNAIL_WORKERS = 0
+
+
 pytest_plugins = [
     'tests.fixtures.fixture_user',
     'tests.fixtures.fixture_data',
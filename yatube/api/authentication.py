@@ -0,0 +1,52 @@
+import time
+
+from django.core.cache import cache
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+TOKEN_USER_KEY = 'auth:token:{}'
+USER_VERSION_KEY = 'auth:user:{}'
+# Пользователь из кэша может отставать от базы не дольше этого времени;
+# смена пароля и блокировка сбрасывают кэш сразу.
+AUTH_CACHE_TIMEOUT = 60
+
+
+def bump_user_version(user_id):
+    """Делает недействительными закэшированные токены пользователя."""
+    key = USER_VERSION_KEY.format(user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, int(time.time() * 1000), None)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication, которая не читает пользователя из базы на
+    каждый запрос.
+
+    Пользователь кэшируется по идентификатору токена (jti) вместе с
+    поколением пользователя. Смена пароля, блокировка или удаление
+    меняют поколение (api.signals), и старые записи больше не подходят.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            return super().get_user(validated_token)
+        token_id = validated_token.get(api_settings.JTI_CLAIM)
+        if token_id is None:
+            return super().get_user(validated_token)
+        token_key = TOKEN_USER_KEY.format(token_id)
+        version_key = USER_VERSION_KEY.format(user_id)
+        stored = cache.get_many([token_key, version_key])
+        version = stored.get(version_key)
+        if version is None:
+            cache.add(version_key, int(time.time() * 1000), None)
+            version = cache.get(version_key)
+        cached = stored.get(token_key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        user = super().get_user(validated_token)
+        cache.set(token_key, (version, user), AUTH_CACHE_TIMEOUT)
+        return user
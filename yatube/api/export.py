@@ -0,0 +1,67 @@
+from datetime import datetime, time
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+from .rows import RowSerializer
+
+# Сколько строк курсор базы отдаёт за раз при выгрузке и сколько строк
+# ответа отправляется клиенту одним куском.
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_WRITE_ROWS = 200
+
+
+class NDJSONRenderer(JSONRenderer):
+    """Рендерер для согласования Accept: application/x-ndjson.
+
+    Выгрузку пишет StreamingHttpResponse, сам рендерер выводит только
+    ответы с ошибками — одной строкой JSON.
+    """
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+
+def parse_since(value):
+    """Момент из ?since=: дата и время ISO 8601 или только дата."""
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValidationError({'since': 'Неверная дата.'})
+        moment = datetime.combine(day, time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def ndjson_lines(serializer, queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """Объекты выборки по одному JSON на строку, как их выводит
+    serializer.
+
+    Строки читаются курсором базы пачками по chunk_size, поэтому память
+    не зависит от размера выборки.
+    """
+    encoder = JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    rows = RowSerializer.for_serializer(serializer)
+    if rows is not None:
+        for chunk in chunked(rows.queryset(queryset).iterator(
+                chunk_size=chunk_size), EXPORT_WRITE_ROWS):
+            yield ''.join(encoder.encode(item) + '\n'
+                          for item in rows.represent(chunk))
+        return
+    for instance in queryset.iterator(chunk_size=chunk_size):
+        yield encoder.encode(serializer.to_representation(instance)) + '\n'
+
+
+def chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
@@ -0,0 +1,14 @@
+from rest_framework.filters import BaseFilterBackend
+
+from posts.search import search_posts
+
+
+class FullTextSearchFilter(BaseFilterBackend):
+    """Фильтр постов по полнотекстовому индексу, параметр ?search=."""
+    search_param = 'search'
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '').strip()
+        if not query:
+            return queryset
+        return search_posts(queryset, query)
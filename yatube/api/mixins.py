@@ -1,4 +1,13 @@
+import hashlib
+import time
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
 from rest_framework import mixins, viewsets
+from rest_framework.response import Response
+
+from posts.caching import versions
+from .rows import RowSerializer
 
 
 class CreateListViewSet(mixins.CreateModelMixin,
@@ -6,3 +15,80 @@ class CreateListViewSet(mixins.CreateModelMixin,
                         viewsets.GenericViewSet):
     """Вьюсет, выдающий только список и позволяющий его создавать."""
     pass
+
+
+class ConditionalGetMixin:
+    """ETag и Last-Modified для list и retrieve без сериализации.
+
+    Валидаторы строятся из поколений данных в кэше (version_keys),
+    которые сигналы меняют при каждом изменении, и адреса запроса. Если
+    клиент прислал совпадающий If-None-Match или If-Modified-Since,
+    сразу отдаётся 304: ни запросов к базе, ни сериализации.
+    """
+    # Поколения данных, которые добавляет в ответ ?expand=<поле>.
+    expand_version_keys = {}
+
+    def get_version_keys(self):
+        raise NotImplementedError
+
+    def get_validators(self, request):
+        keys = list(self.get_version_keys())
+        sparse_params = getattr(self.get_serializer_class(),
+                                'sparse_params', None)
+        if sparse_params is not None:
+            _, expand = sparse_params(request)
+            keys.extend(self.expand_version_keys[name] for name in expand
+                        if name in self.expand_version_keys)
+        current, modified = versions(*dict.fromkeys(keys))
+        raw = '|'.join([*map(str, current), request.get_full_path(),
+                        request.accepted_renderer.format])
+        etag = quote_etag(hashlib.md5(raw.encode()).hexdigest())
+        if int(modified) >= int(time.time()):
+            # Last-Modified точен до секунды: пока она не прошла, правку в
+            # ту же секунду по нему не отличить, остаётся только ETag.
+            return etag, None
+        return etag, int(modified)
+
+    def conditional(self, request, handler, *args, **kwargs):
+        # If-Modified-Since не проверяется, если есть If-None-Match
+        # (RFC 7232, 3.3): так делает get_conditional_response.
+        etag, modified = self.get_validators(request)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=modified)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if modified is not None:
+                response['Last-Modified'] = http_date(modified)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional(request, super().retrieve, *args, **kwargs)
+
+
+class RowListMixin:
+    """list по строкам values_list() вместо экземпляров моделей.
+
+    Ответ совпадает с ответом сериализатора байт в байт, но модели и
+    поля DRF на каждый объект не создаются. Если поля сериализатора так
+    не представить (например, при ?expand=), работает обычный list.
+    """
+    row_list = True
+
+    def list(self, request, *args, **kwargs):
+        rows = None
+        if self.row_list:
+            rows = RowSerializer.for_serializer(
+                self.get_serializer(),
+                getattr(self.paginator, 'keyset', ()))
+        if rows is None:
+            return super().list(request, *args, **kwargs)
+        queryset = rows.queryset(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            return Response(rows.represent(queryset))
+        return self.get_paginated_response(rows.represent(page))
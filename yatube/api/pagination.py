@@ -0,0 +1,101 @@
+from collections import OrderedDict
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from posts.utils import CursorPage, decode_cursor
+
+
+class KeysetPagination(BasePagination):
+    """Курсорная пагинация API по ключу keyset, от новых к старым.
+
+    Страница выбирается условием по индексу, поэтому её стоимость не
+    зависит от того, как далеко она от начала, а COUNT(*) не нужен.
+    Ссылки next/previous содержат курсоры ?after=/?before=, размер
+    страницы задаётся ?limit= и не может превышать max_limit.
+    """
+    keyset = ('id',)
+    default_limit = 20
+    max_limit = 100
+    limit_query_param = 'limit'
+    after_query_param = 'after'
+    before_query_param = 'before'
+    # Старые клиенты с ?offset= получают прежнюю пагинацию.
+    offset_fallback = False
+    # Параметры, с которыми порядок задаёт сам запрос (например,
+    # релевантность поиска), а не keyset: такие списки листаются по
+    # ?offset=, иначе order_by(*keyset) отбросил бы этот порядок.
+    ordering_query_params = ()
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params[self.limit_query_param])
+        except (KeyError, ValueError):
+            return self.default_limit
+        return min(max(limit, 1), self.max_limit)
+
+    def get_cursor(self, request, param):
+        token = request.query_params.get(param)
+        if not token:
+            return None
+        cursor = decode_cursor(token)
+        if cursor is None or len(cursor) != len(self.keyset):
+            raise NotFound(self.invalid_cursor_message)
+        return cursor
+
+    def use_offset(self, request):
+        params = request.query_params
+        if self.offset_fallback and 'offset' in params:
+            return True
+        return any(params.get(param, '').strip()
+                   for param in self.ordering_query_params)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.fallback = None
+        if self.use_offset(request):
+            self.fallback = LimitOffsetPagination()
+            self.fallback.default_limit = self.default_limit
+            self.fallback.max_limit = self.max_limit
+            return self.fallback.paginate_queryset(queryset, request, view)
+        self.request = request
+        self.page = CursorPage(
+            queryset, self.keyset, self.get_limit(request),
+            after=self.get_cursor(request, self.after_query_param),
+            before=self.get_cursor(request, self.before_query_param))
+        return list(self.page)
+
+    def _link(self, param, cursor):
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.after_query_param)
+        url = remove_query_param(url, self.before_query_param)
+        return replace_query_param(url, param, cursor)
+
+    def get_next_link(self):
+        cursor = self.page.next_cursor
+        return cursor and self._link(self.after_query_param, cursor)
+
+    def get_previous_link(self):
+        cursor = self.page.previous_cursor
+        return cursor and self._link(self.before_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        if self.fallback is not None:
+            return self.fallback.get_paginated_response(data)
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+
+class PostPagination(KeysetPagination):
+    keyset = ('pub_date', 'id')
+    offset_fallback = True
+    ordering_query_params = ('search',)
+
+
+class CommentPagination(KeysetPagination):
+    keyset = ('created', 'id')
@@ -7,4 +7,5 @@ class IsOwnerOrReadOnly(BasePermission):
     message = "You're not an owner to change it!"
 
     def has_object_permission(self, request, view, obj):
-        return (obj.author == request.user) or (request.method in SAFE_METHODS)
+        # Чтение проверяется первым: автор мог быть не загружен в выборке.
+        return (request.method in SAFE_METHODS) or (obj.author == request.user)
@@ -1,27 +1,213 @@
+import json
+
 from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
 from rest_framework.relations import SlugRelatedField
 from rest_framework.validators import UniqueTogetherValidator
 
+from posts.bulk import create_posts
 from posts.models import Comment, Follow, Group, Post, User
 
+# Сколько постов можно создать одним запросом.
+BULK_MAX_POSTS = 1000
 
-class PostSerializer(serializers.ModelSerializer):
-    """Сериализатор модели Post"""
-    author = SlugRelatedField(slug_field='username', read_only=True)
 
+def query_list(request, param):
+    """Значения параметра запроса через запятую или None без него."""
+    value = request.query_params.get(param)
+    if value is None:
+        return None
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+def model_columns(serializer_class):
+    """Поля модели, которые выводит сериализатор."""
+    meta = serializer_class.Meta
+    fields = getattr(meta, 'fields', '__all__')
+    if fields == '__all__':
+        excluded = getattr(meta, 'exclude', ())
+        return [field.name for field in meta.model._meta.concrete_fields
+                if field.name not in excluded]
+    return list(fields)
+
+
+class SparseFieldsMixin:
+    """Поддержка ?fields= и ?expand= в ответах на чтение.
+
+    ?fields=id,pub_date оставляет в ответе только эти поля, а
+    ?expand=author,group выводит вместо ключа или имени связанный объект
+    целиком. Meta.expandable задаёт сериализаторы раскрываемых полей,
+    Meta.field_sources — поля модели, нужные полю ответа, если они не
+    совпадают с его именем. narrow_queryset сужает выборку до колонок,
+    которые понадобятся.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields, expand = self.sparse_params(self.context.get('request'))
+        expandable = getattr(self.Meta, 'expandable', {})
+        for name in expand:
+            self.fields[name] = expandable[name](read_only=True)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+    @classmethod
+    def sparse_params(cls, request):
+        """Запрошенные поля (None — все) и раскрываемые связи."""
+        if request is None or request.method not in SAFE_METHODS:
+            return None, []
+        expandable = getattr(cls.Meta, 'expandable', {})
+        fields = query_list(request, 'fields')
+        expand = [name for name in query_list(request, 'expand') or []
+                  if name in expandable
+                  and (fields is None or name in fields)]
+        return fields, expand
+
+    @classmethod
+    def narrow_queryset(cls, queryset, request, always=('id',)):
+        """Выборка только с колонками и связями для запрошенных полей.
+
+        always — поля, которые нужны всегда: ключ, поля курсора и поля
+        для проверки прав.
+        """
+        fields, expand = cls.sparse_params(request)
+        expandable = getattr(cls.Meta, 'expandable', {})
+        sources = getattr(cls.Meta, 'field_sources', {})
+        if fields is None:
+            return queryset.select_related(*expand) if expand else queryset
+        model = cls.Meta.model
+        names = {field.name for field in model._meta.concrete_fields}
+        columns = set(always)
+        related = []
+        for name in fields:
+            if name in expand:
+                related.append(name)
+                columns.update(
+                    f'{name}__{column}'
+                    for column in model_columns(expandable[name]))
+                continue
+            for source in sources.get(name, (name,)):
+                if source.split('__')[0] in names:
+                    columns.add(source)
+                if '__' in source:
+                    related.append(source.split('__')[0])
+        queryset = queryset.select_related(None)
+        if related:
+            # Без аргументов select_related подтянул бы все связи.
+            queryset = queryset.select_related(*related)
+        return queryset.only(*columns)
+
+
+class GroupField(serializers.PrimaryKeyRelatedField):
+    """Группа по ключу; при массовом создании берётся из заранее
+    загруженных групп, а не отдельным запросом на каждый пост."""
+
+    def to_internal_value(self, data):
+        groups = self.context.get('groups')
+        if groups is None:
+            return super().to_internal_value(data)
+        try:
+            return groups[int(data)]
+        except KeyError:
+            self.fail('does_not_exist', pk_value=data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+
+class BulkPostSerializer(serializers.ListSerializer):
+    """Список постов для массового создания.
+
+    Ошибка в одном посте не мешает остальным: ошибки собираются в
+    item_errors по номеру поста, а в validated_data попадают только
+    правильные посты, номера которых лежат в valid_indexes.
+    """
+
+    def to_internal_value(self, data):
+        if not isinstance(data, list):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not data:
+            self.fail('empty')
+        if len(data) > BULK_MAX_POSTS:
+            raise serializers.ValidationError(
+                f'За один запрос можно создать не больше '
+                f'{BULK_MAX_POSTS} постов.')
+        group_ids = {
+            item['group'] for item in data
+            if isinstance(item, dict) and isinstance(item.get('group'), int)
+        }
+        self._context['groups'] = Group.objects.in_bulk(group_ids)
+        self.item_errors = {}
+        self.valid_indexes = []
+        validated = []
+        for index, item in enumerate(data):
+            try:
+                validated.append(self.child.run_validation(item))
+            except serializers.ValidationError as error:
+                self.item_errors[index] = error.detail
+            else:
+                self.valid_indexes.append(index)
+        return validated
+
+    def create(self, validated_data):
+        return create_posts(Post(**attrs) for attrs in validated_data)
+
+
+class AuthorSerializer(serializers.ModelSerializer):
+    """Автор поста или комментария для ?expand=author."""
     class Meta:
-        fields = '__all__'
-        model = Post
+        model = User
+        fields = ('id', 'username', 'first_name', 'last_name')
 
 
-class GroupSerializer(serializers.ModelSerializer):
+class GroupSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Сериализатор модели Group"""
     class Meta:
         model = Group
         fields = '__all__'
 
 
-class CommentSerializer(serializers.ModelSerializer):
+class PostSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """Сериализатор модели Post"""
+    author = SlugRelatedField(slug_field='username', read_only=True)
+    group = GroupField(queryset=Group.objects.all(), allow_null=True,
+                       required=False)
+    image_variants = serializers.SerializerMethodField()
+
+    class Meta:
+        exclude = ('image_hash',)
+        model = Post
+        list_serializer_class = BulkPostSerializer
+        expandable = {'author': AuthorSerializer, 'group': GroupSerializer}
+        field_sources = {
+            'author': ('author__username',),
+            'image_variants': ('image', 'image_variants'),
+        }
+
+    def get_image_variants(self, post):
+        """Ссылки на варианты картинки: {mime: [{width, url}, ...]}."""
+        return self.variant_urls(post.image.storage, post.variants)
+
+    def row_image_variants(self, row):
+        """То же для строки values_list() с колонкой image_variants."""
+        variants = row.image_variants
+        return self.variant_urls(Post.image.field.storage,
+                                 json.loads(variants) if variants else {})
+
+    def variant_urls(self, storage, image_variants):
+        request = self.context.get('request')
+        variants = {}
+        for mime, items in image_variants.items():
+            variants[mime] = []
+            for width, name in items:
+                url = storage.url(name)
+                if request is not None:
+                    url = request.build_absolute_uri(url)
+                variants[mime].append({'width': width, 'url': url})
+        return variants
+
+
+class CommentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Сериализатор модели Comment"""
     author = serializers.SlugRelatedField(
         read_only=True, slug_field='username'
@@ -31,6 +217,8 @@ class CommentSerializer(serializers.ModelSerializer):
         fields = '__all__'
         model = Comment
         read_only_fields = ('post', )
+        expandable = {'author': AuthorSerializer}
+        field_sources = {'author': ('author__username',)}
 
 
 class FollowSerializer(serializers.ModelSerializer):
@@ -0,0 +1,37 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .authentication import bump_user_version
+
+User = get_user_model()
+
+# Поля, после изменения которых токены пользователя надо проверить заново.
+AUTH_FIELDS = ('password', 'is_active')
+
+
+@receiver(pre_save, sender=User)
+def user_changing(sender, instance, update_fields=None, **kwargs):
+    """Запоминает, меняются ли пароль или активность пользователя."""
+    instance._auth_changed = False
+    if instance.pk is None:
+        return
+    if update_fields is not None and not set(update_fields) & set(
+            AUTH_FIELDS):
+        # Например, обновление last_login при входе.
+        return
+    previous = User.objects.filter(pk=instance.pk).values_list(
+        *AUTH_FIELDS).first()
+    current = tuple(getattr(instance, field) for field in AUTH_FIELDS)
+    instance._auth_changed = previous != current
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, **kwargs):
+    if getattr(instance, '_auth_changed', False):
+        bump_user_version(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    bump_user_version(instance.pk)
@@ -0,0 +1,23 @@
+from rest_framework.throttling import BaseThrottle
+
+from core.ratelimit import client_key, hit
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Ограничение частоты действий вьюсета корзиной токенов в кэше.
+
+    Вьюсет задаёт ratelimits = {действие: (scope, 'user' или 'ip')},
+    частоты берутся из RATELIMIT_RATES. Отказ — 429 с Retry-After.
+    """
+
+    def allow_request(self, request, view):
+        limit = getattr(view, 'ratelimits', {}).get(
+            getattr(view, 'action', None))
+        if limit is None:
+            return True
+        scope, key = limit
+        self.retry_after = hit(scope, client_key(request, key))
+        return not self.retry_after
+
+    def wait(self):
+        return self.retry_after
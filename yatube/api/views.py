@@ -1,26 +1,106 @@
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-from rest_framework import filters, viewsets
-from rest_framework.pagination import LimitOffsetPagination
+from rest_framework import filters, status, viewsets
+from rest_framework.decorators import action
 from rest_framework.permissions import (IsAuthenticated,
                                         IsAuthenticatedOrReadOnly)
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
 
+from posts.caching import (COMMENTS_VERSION_KEY, GROUPS_VERSION_KEY,
+                           POST_COMMENTS_VERSION_KEY, POSTS_VERSION_KEY,
+                           USERS_VERSION_KEY)
 from posts.models import Group, Post
-from .mixins import CreateListViewSet
+from .export import NDJSONRenderer, ndjson_lines, parse_since
+from .filters import FullTextSearchFilter
+from .mixins import ConditionalGetMixin, CreateListViewSet, RowListMixin
+from .pagination import CommentPagination, PostPagination
 from .permissions import IsOwnerOrReadOnly
 from .serializers import (CommentSerializer, FollowSerializer, GroupSerializer,
                           PostSerializer)
 
 
-class PostViewSet(viewsets.ModelViewSet):
+class PostViewSet(ConditionalGetMixin, RowListMixin, viewsets.ModelViewSet):
     """Вьюсет для модели постов."""
-    queryset = Post.objects.all()
+    queryset = Post.objects.select_related('author')
     serializer_class = PostSerializer
     permission_classes = [IsOwnerOrReadOnly, IsAuthenticatedOrReadOnly]
-    pagination_class = LimitOffsetPagination
+    pagination_class = PostPagination
+    filter_backends = (FullTextSearchFilter,)
+    ratelimits = {
+        'create': ('api-write', 'user'),
+        'update': ('api-write', 'user'),
+        'partial_update': ('api-write', 'user'),
+        'destroy': ('api-write', 'user'),
+        'bulk': ('api-bulk', 'user'),
+        'export': ('api-export', 'user'),
+    }
+
+    expand_version_keys = {
+        'author': USERS_VERSION_KEY,
+        'group': GROUPS_VERSION_KEY,
+    }
+
+    def get_version_keys(self):
+        # В постах показываются и число комментариев, и имя автора.
+        return POSTS_VERSION_KEY, COMMENTS_VERSION_KEY, USERS_VERSION_KEY
+
+    def get_queryset(self):
+        # Поля курсора и автор нужны пагинации и проверке прав.
+        return PostSerializer.narrow_queryset(
+            super().get_queryset(), self.request,
+            always=('id', 'pub_date', 'author'))
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """Создаёт список постов одним запросом.
+
+        Возвращает результат по каждому посту: созданный пост или его
+        ошибки. Статус 201 — созданы все, 207 — часть, 400 — ни одного.
+        """
+        serializer = self.get_serializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        created = serializer.save(author=request.user)
+        results = [
+            {'index': index, 'status': status.HTTP_201_CREATED,
+             'data': data}
+            for index, data in zip(serializer.valid_indexes,
+                                   serializer.data)
+        ]
+        results.extend(
+            {'index': index, 'status': status.HTTP_400_BAD_REQUEST,
+             'errors': errors}
+            for index, errors in serializer.item_errors.items())
+        results.sort(key=lambda result: result['index'])
+        if not serializer.item_errors:
+            code = status.HTTP_201_CREATED
+        elif created:
+            code = status.HTTP_207_MULTI_STATUS
+        else:
+            code = status.HTTP_400_BAD_REQUEST
+        return Response(results, status=code)
+
+    @action(detail=False, permission_classes=[IsAuthenticated],
+            renderer_classes=[NDJSONRenderer, JSONRenderer])
+    def export(self, request):
+        """Все посты от старых к новым, по JSON на строку (NDJSON).
+
+        ?since= — дата или дата и время ISO 8601: только посты,
+        опубликованные начиная с этого момента. ?fields= работает как в
+        списке.
+        """
+        queryset = Post.objects.select_related('author').order_by(
+            'pub_date', 'id')
+        since = request.query_params.get('since')
+        if since:
+            queryset = queryset.filter(pub_date__gte=parse_since(since))
+        return StreamingHttpResponse(
+            ndjson_lines(self.get_serializer(), queryset),
+            content_type='application/x-ndjson')
+
 
 class GroupViewSet(viewsets.ReadOnlyModelViewSet):
     """Вьюсет для модели групп."""
@@ -28,17 +108,37 @@ class GroupViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = GroupSerializer
     permission_classes = (IsAuthenticatedOrReadOnly, )
 
+    def get_queryset(self):
+        return GroupSerializer.narrow_queryset(
+            super().get_queryset(), self.request)
+
 
-class CommentViewSet(viewsets.ModelViewSet):
+class CommentViewSet(ConditionalGetMixin, RowListMixin,
+                     viewsets.ModelViewSet):
     """Вьюсет для модели """
     serializer_class = CommentSerializer
     permission_classes = [IsOwnerOrReadOnly, IsAuthenticatedOrReadOnly]
+    pagination_class = CommentPagination
+    ratelimits = {
+        'create': ('comment', 'user'),
+        'update': ('api-write', 'user'),
+        'partial_update': ('api-write', 'user'),
+        'destroy': ('api-write', 'user'),
+    }
+
+    expand_version_keys = {'author': USERS_VERSION_KEY}
+
+    def get_version_keys(self):
+        return (POST_COMMENTS_VERSION_KEY.format(self.kwargs.get('post_id')),
+                USERS_VERSION_KEY)
 
     def get_post(self):
         return get_object_or_404(Post, id=self.kwargs.get('post_id'))
 
     def get_queryset(self):
-        return self.get_post().comments.all()
+        return CommentSerializer.narrow_queryset(
+            self.get_post().comment.select_related('author'), self.request,
+            always=('id', 'created', 'author'))
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user, post=self.get_post())
@@ -52,7 +152,8 @@ class FollowViewSet(CreateListViewSet):
     search_fields = ('user__username', 'following__username')
 
     def get_queryset(self):
-        return self.request.user.follower.all()
+        return self.request.user.follower.select_related(
+            'user', 'following')
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
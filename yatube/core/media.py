@@ -0,0 +1,179 @@
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.http import (FileResponse, Http404, HttpResponse,
+                         HttpResponseNotModified)
+from django.utils._os import safe_join
+from django.utils.http import (http_date, parse_etags, parse_http_date_safe,
+                               quote_etag)
+from django.views.decorators.http import require_safe
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+# Файлы с именем по хэшу содержимого никогда не меняются.
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+MUTABLE_CACHE = 'public, max-age=3600'
+
+
+class RangeFile:
+    """Открытый файл, из которого можно прочитать только length байт
+    начиная с offset.
+
+    fileno() и позиция файла остаются настоящими, поэтому
+    wsgi.file_wrapper сервера (gunicorn, uWSGI) отдаёт диапазон через
+    os.sendfile, не копируя байты через Python.
+    """
+
+    def __init__(self, file, offset, length):
+        self.file = file
+        self.remaining = length
+        file.seek(offset)
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def seek(self, *args):
+        return self.file.seek(*args)
+
+    def tell(self):
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """Диапазон (начало, конец включительно) из заголовка Range.
+
+    None — заголовок не подходит (несколько диапазонов, другие единицы),
+    тогда отдаётся весь файл. ValueError — диапазон вне файла.
+    """
+    match = RANGE_RE.match(header.replace(' ', ''))
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if not first:
+        length = int(last)
+        if not length:
+            raise ValueError(header)
+        return max(0, size - length), size - 1
+    first = int(first)
+    last = min(int(last), size - 1) if last else size - 1
+    if first >= size or first > last:
+        raise ValueError(header)
+    return first, last
+
+
+def file_etag(stat):
+    return quote_etag(f'{stat.st_mtime_ns:x}-{stat.st_size:x}')
+
+
+def not_modified(request, etag, mtime):
+    """Совпадают ли If-None-Match/If-Modified-Since с файлом."""
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match is not None:
+        # Для If-None-Match сравнение слабое: W/"x" совпадает с "x".
+        tags = parse_etags(if_none_match)
+        if tags == ['*']:
+            return True
+        return etag in {tag[2:] if tag.startswith('W/') else tag
+                        for tag in tags}
+    since = parse_http_date_safe(
+        request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+    return since is not None and int(mtime) <= since
+
+
+def range_allowed(request, etag, mtime):
+    """If-Range: диапазон отдаётся, только если файл не изменился."""
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if if_range is None:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == int(mtime)
+
+
+def accel_response(path, content_type):
+    """Пустой ответ, по которому файл отдаёт сам веб-сервер."""
+    response = HttpResponse(content_type=content_type)
+    if settings.MEDIA_SENDFILE == 'x-accel':
+        response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_PREFIX + path
+    else:
+        response['X-Sendfile'] = safe_join(settings.MEDIA_ROOT, path)
+    return response
+
+
+def cache_control(path):
+    is_content_addressed = getattr(default_storage, 'is_content_addressed',
+                                   None)
+    if is_content_addressed is not None and is_content_addressed(path):
+        return IMMUTABLE_CACHE
+    return MUTABLE_CACHE
+
+
+def file_response(request, full_path, size, etag, mtime):
+    """Ответ с файлом целиком или с запрошенным диапазоном байт."""
+    first, last = 0, size - 1
+    header = request.META.get('HTTP_RANGE')
+    byte_range = None
+    if header and range_allowed(request, etag, mtime):
+        try:
+            byte_range = parse_range(header, size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+    if byte_range is not None:
+        first, last = byte_range
+    content_type, encoding = mimetypes.guess_type(full_path)
+    response = FileResponse(
+        RangeFile(open(full_path, 'rb'), first, last - first + 1),
+        status=200 if byte_range is None else 206,
+        content_type=content_type or 'application/octet-stream')
+    response['Content-Length'] = last - first + 1
+    if byte_range is not None:
+        response['Content-Range'] = f'bytes {first}-{last}/{size}'
+    if encoding:
+        response['Content-Encoding'] = encoding
+    return response
+
+
+@require_safe
+def serve_media(request, path):
+    """Отдаёт загруженный файл с поддержкой Range и условных запросов.
+
+    При MEDIA_SENDFILE = 'x-accel' или 'x-sendfile' отдачу берёт на себя
+    nginx или Apache, и воркер не занят передачей файла.
+    """
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        stat = os.stat(full_path)
+    except (SuspiciousFileOperation, OSError):
+        raise Http404('Файл не найден')
+    if not os.path.isfile(full_path):
+        raise Http404('Файл не найден')
+    if settings.MEDIA_SENDFILE:
+        content_type, _ = mimetypes.guess_type(full_path)
+        return accel_response(
+            path, content_type or 'application/octet-stream')
+    etag = file_etag(stat)
+    if not_modified(request, etag, stat.st_mtime):
+        response = HttpResponseNotModified()
+    else:
+        response = file_response(request, full_path, stat.st_size, etag,
+                                 stat.st_mtime)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Accept-Ranges'] = 'bytes'
+    response['Cache-Control'] = cache_control(path)
+    return response
@@ -0,0 +1,14 @@
+from django.db import models
+
+
+class StoredFile(models.Model):
+    """Файл хранилища по содержимому и число ссылок на него."""
+    name = models.CharField(max_length=255,
+                            primary_key=True,
+                            verbose_name='имя файла')
+    references = models.IntegerField(default=0,
+                                     verbose_name='ссылок')
+
+    class Meta:
+        verbose_name = 'файл хранилища'
+        verbose_name_plural = 'файлы хранилища'
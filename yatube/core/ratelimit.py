@@ -0,0 +1,98 @@
+import math
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Warning, register
+from django.http import HttpResponse
+
+RATE_KEY = 'ratelimit:{}:{}'
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 60 * 60 * 24}
+
+_lock = threading.Lock()
+
+
+def parse_rate(rate):
+    """Ограничение вида '10/m' как (число запросов, период в секундах)."""
+    count, period = rate.split('/')
+    return int(count), PERIODS[period[0]]
+
+
+def client_key(request, key='user'):
+    """Чей запрос: пользователь для key='user' (аноним — по адресу) или
+    адрес клиента для key='ip'."""
+    user = getattr(request, 'user', None)
+    if key == 'user' and user is not None and user.is_authenticated:
+        return f'user:{user.pk}'
+    return f'ip:{request.META.get("REMOTE_ADDR", "")}'
+
+
+def hit(scope, ident):
+    """Списывает запрос из корзины токенов scope для ident.
+
+    Возвращает 0, если запрос можно выполнить, иначе число секунд до
+    следующей попытки. Корзина хранится в кэше одним числом — моментом,
+    когда она снова станет полной (GCRA), поэтому проверка не делает
+    запросов к базе. Ограничения берутся из RATELIMIT_RATES; для scope
+    без ограничения запросы не считаются.
+
+    Корзины видны всем процессам сервера, только если кэш общий
+    (Memcached, Redis). У LocMemCache корзины свои в каждом процессе, и
+    при N процессах клиент проходит до N * rate запросов. _lock
+    упорядочивает лишь потоки одного процесса: в общем кэше процессы,
+    одновременно прочитавшие корзину, могут пропустить по лишнему
+    запросу.
+    """
+    rate = settings.RATELIMIT_RATES.get(scope)
+    if rate is None:
+        return 0
+    count, period = parse_rate(rate)
+    interval = period / count
+    key = RATE_KEY.format(scope, ident)
+    with _lock:
+        now = time.time()
+        full_at = max(cache.get(key) or now, now) + interval
+        if full_at - now > period:
+            return full_at - now - period
+        cache.set(key, full_at, math.ceil(full_at - now))
+    return 0
+
+
+@register(deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """Предупреждает, что с LocMemCache ограничения не общие."""
+    if (not settings.RATELIMIT_RATES
+            or not isinstance(caches['default'], LocMemCache)):
+        return []
+    return [Warning(
+        'RATELIMIT_RATES соблюдаются в каждом процессе отдельно: кэш '
+        'default — LocMemCache.',
+        hint='Для нескольких процессов сервера настройте в CACHES общий '
+             'кэш, например Memcached или Redis.',
+        id='core.W001',
+    )]
+
+
+def too_many_requests(retry_after):
+    response = HttpResponse('Слишком много запросов, попробуйте позже.',
+                            status=429, content_type='text/plain')
+    response['Retry-After'] = math.ceil(retry_after)
+    return response
+
+
+def ratelimit(scope, key='user', methods=('POST',)):
+    """Декоратор представления: не больше RATELIMIT_RATES[scope]
+    запросов с методами methods от одного пользователя или адреса."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method in methods:
+                retry_after = hit(scope, client_key(request, key))
+                if retry_after:
+                    return too_many_requests(retry_after)
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
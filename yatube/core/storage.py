@@ -0,0 +1,87 @@
+import hashlib
+import os
+import re
+
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+# Первые символы хэша задают два уровня вложенных каталогов, чтобы в
+# одном каталоге не копились миллионы файлов.
+SHARD_LEVELS = 2
+SHARD_WIDTH = 2
+HASHED_NAME_RE = re.compile(
+    r'^(?:[^/]+/)?' + r'[0-9a-f]{2}/' * SHARD_LEVELS
+    + r'[0-9a-f]{64}(?:\.\w+)?$')
+
+
+def file_digest(content):
+    """SHA-256 содержимого файла."""
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранилище, в котором имя файла — хэш его содержимого.
+
+    Каталог из upload_to сохраняется, внутри него файлы раскладываются
+    по каталогам из первых символов хэша. Одинаковые файлы хранятся
+    один раз, а число ссылок на них ведётся в StoredFile: файл удаляется
+    с диска, только когда пропадает последняя ссылка.
+    """
+
+    def hashed_name(self, name, digest):
+        parts = name.replace('\\', '/').split('/')
+        top = parts[0] if len(parts) > 1 else ''
+        _, extension = os.path.splitext(name)
+        shards = [digest[i * SHARD_WIDTH:(i + 1) * SHARD_WIDTH]
+                  for i in range(SHARD_LEVELS)]
+        return '/'.join(
+            [part for part in (top, *shards) if part]
+            + [digest + extension.lower()])
+
+    def is_content_addressed(self, name):
+        return bool(HASHED_NAME_RE.match(name))
+
+    def _save(self, name, content):
+        name = self.hashed_name(name, file_digest(content))
+        if not self.exists(name):
+            saved = super()._save(name, content)
+            if saved != name:
+                # Такой же файл успели записать параллельно.
+                super().delete(saved)
+        self.acquire(name)
+        return name
+
+    def delete(self, name):
+        if self.release(name):
+            super().delete(name)
+
+    def acquire(self, name):
+        """Добавляет ссылку на файл."""
+        from .models import StoredFile
+
+        files = StoredFile.objects.filter(name=name)
+        if files.update(references=F('references') + 1):
+            return
+        try:
+            with transaction.atomic():
+                StoredFile.objects.create(name=name, references=1)
+        except IntegrityError:
+            files.update(references=F('references') + 1)
+
+    def release(self, name):
+        """Убирает ссылку на файл; True, если файл больше не нужен.
+
+        Файлы, которых нет в учёте ссылок, удаляются сразу.
+        """
+        from .models import StoredFile
+
+        files = StoredFile.objects.filter(name=name)
+        with transaction.atomic():
+            if not files.update(references=F('references') - 1):
+                return True
+            deleted, _ = files.filter(references__lte=0).delete()
+        return bool(deleted)
@@ -0,0 +1,12 @@
+from django import template
+
+register = template.Library()
+
+
+@register.filter
+def page_window(page):
+    """Номера страниц для навигации с пропусками вместо длинных участков."""
+    paginator = page.paginator
+    if hasattr(paginator, 'get_elided_page_range'):
+        return paginator.get_elided_page_range(page.number)
+    return paginator.page_range
@@ -1,6 +1,10 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.http import HttpResponseRedirect
+from django.urls import reverse
 
+from .duplicates import similar_posts
 from .models import Post, Group
+from .search import search_posts
 
 
 @admin.register(Post)
@@ -10,6 +14,31 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     list_editable = ('group',)
     empty_value_display = '-пусто-'
+    actions = ('find_similar_images',)
+
+    def get_search_results(self, request, queryset, search_term):
+        """Ищет по тексту через полнотекстовый индекс."""
+        if not search_term:
+            return queryset, False
+        return search_posts(queryset, search_term), False
+
+    def find_similar_images(self, request, queryset):
+        """Показывает выбранные посты вместе с постами с похожими
+        картинками."""
+        found = set()
+        for post in queryset.exclude(image_hash='').only('pk', 'image_hash'):
+            similar = similar_posts(post)
+            if similar:
+                found.add(post.pk)
+                found.update(similar)
+        if not found:
+            self.message_user(request, 'Похожих картинок не найдено.',
+                              messages.INFO)
+            return None
+        pks = ','.join(str(pk) for pk in sorted(found))
+        return HttpResponseRedirect(
+            reverse('admin:posts_post_changelist') + f'?pk__in={pks}')
+    find_similar_images.short_description = 'Найти похожие картинки'
 
 
 @admin.register(Group)
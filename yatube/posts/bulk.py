@@ -0,0 +1,105 @@
+from contextlib import contextmanager
+
+from django.db import connection, transaction
+from django.db.models import Max
+
+from . import counters, timeline
+from .caching import bump_listing_versions, bump_posts_version, post_scopes
+from .models import Group, Post, User
+
+BULK_BATCH_SIZE = 500
+# На время массовой загрузки SQLite не ждёт записи на диск после каждой
+# транзакции и держит временные данные и побольше страниц в памяти.
+SQLITE_PRAGMAS = {
+    'synchronous': 'OFF',
+    'temp_store': 'MEMORY',
+    'cache_size': '-65536',
+}
+
+
+def _assign_pks(chunk, last_pk):
+    """Проставляет ключи постам, вставленным bulk_create.
+
+    SQLite не возвращает ключи вставленных строк. Внутри транзакции
+    после первой записи база заблокирована для других писателей, поэтому
+    новые строки — это ровно строки с ключом больше прежнего максимума,
+    в порядке вставки.
+    """
+    pks = Post.objects.filter(pk__gt=last_pk or 0).order_by(
+        'pk').values_list('pk', flat=True)
+    for post, pk in zip(chunk, pks):
+        post.pk = pk
+
+
+def listing_scopes(posts):
+    """Ленты, которые затрагивают посты, за два запроса на все посты."""
+    usernames = dict(User.objects.filter(
+        pk__in={post.author_id for post in posts}).values_list(
+        'pk', 'username'))
+    slugs = dict(Group.objects.filter(
+        pk__in={post.group_id for post in posts}).values_list('pk', 'slug'))
+    scopes = set()
+    for post in posts:
+        scopes.update(post_scopes(post, group_slug=slugs.get(post.group_id),
+                                  username=usernames[post.author_id]))
+    return scopes
+
+
+def create_posts(posts, batch_size=BULK_BATCH_SIZE):
+    """Создаёт посты пачками через bulk_create в одной транзакции.
+
+    bulk_create не отправляет сигналов, поэтому ленты подписчиков,
+    счётчики и поколения кэша обновляются здесь одним набором запросов
+    на все посты. Полнотекстовый индекс обновляют триггеры базы.
+    """
+    posts = list(posts)
+    if not posts:
+        return posts
+    with transaction.atomic():
+        for start in range(0, len(posts), batch_size):
+            chunk = posts[start:start + batch_size]
+            last_pk = Post.objects.aggregate(last=Max('pk'))['last']
+            Post.objects.bulk_create(chunk)
+            if chunk[0].pk is None:
+                _assign_pks(chunk, last_pk)
+        timeline.fan_out(posts)
+        counters.posts_added(posts)
+        scopes = listing_scopes(posts)
+    bump_listing_versions(scopes)
+    bump_posts_version()
+    return posts
+
+
+@contextmanager
+def keep_dates(model, field_name):
+    """Отключает auto_now_add, чтобы bulk_create сохранил заданные даты."""
+    field = model._meta.get_field(field_name)
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+@contextmanager
+def fast_sqlite():
+    """Включает SQLITE_PRAGMAS и возвращает прежние значения после.
+
+    Внутри транзакции SQLite не даёт менять synchronous, там настройки
+    остаются как есть.
+    """
+    if connection.vendor != 'sqlite' or connection.in_atomic_block:
+        yield
+        return
+    previous = {}
+    with connection.cursor() as cursor:
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name}')
+            previous[name] = cursor.fetchone()[0]
+            cursor.execute(f'PRAGMA {name} = {value}')
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            for name, value in previous.items():
+                cursor.execute(f'PRAGMA {name} = {value}')
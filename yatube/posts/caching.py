@@ -0,0 +1,130 @@
+import time
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+
+POSTS_VERSION_KEY = 'posts:version'
+LISTING_VERSION_KEY = 'posts:listing:{}'
+COMMENTS_VERSION_KEY = 'comments:version'
+POST_COMMENTS_VERSION_KEY = 'comments:version:{}'
+USERS_VERSION_KEY = 'users:version'
+GROUPS_VERSION_KEY = 'groups:version'
+MODIFIED_KEY = '{}:modified'
+# Ленты сбрасываются сигналами, поэтому в общем для всех процессов кэше
+# срок жизни может быть долгим.
+LISTING_CACHE_TIMEOUT = 60 * 60 * 6
+# LocMemCache у каждого процесса свой, и сброс поколения видит только
+# процесс, записавший данные. Остальные отдают устаревшее не дольше этого.
+LOCAL_CACHE_TIMEOUT = 20
+
+
+def cache_is_shared():
+    """Видят ли все процессы сервера один и тот же кэш."""
+    return not isinstance(caches['default'], LocMemCache)
+
+
+def listing_timeout():
+    """Срок жизни закэшированных страниц лент."""
+    return LISTING_CACHE_TIMEOUT if cache_is_shared() else LOCAL_CACHE_TIMEOUT
+
+
+def _version_timeout():
+    # В своём кэше процесса поколение истекает и начинается заново,
+    # поэтому чужие изменения становятся видны через LOCAL_CACHE_TIMEOUT.
+    return None if cache_is_shared() else LOCAL_CACHE_TIMEOUT
+
+
+def _version(key):
+    """Текущее поколение данных под ключом key.
+
+    Если ключ вытеснен из кэша, поколение начинается заново с текущего
+    времени, чтобы не совпасть ни с одним из уже выданных номеров.
+    """
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, int(time.time() * 1000), _version_timeout())
+        version = cache.get(key)
+    return version
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        _version(key)
+    cache.set(MODIFIED_KEY.format(key), time.time(), _version_timeout())
+
+
+def _modified(key):
+    """Время последнего изменения данных под ключом key.
+
+    Если оно неизвестно (ключ ещё не менялся или вытеснен), считается,
+    что данные изменились только что.
+    """
+    modified_key = MODIFIED_KEY.format(key)
+    modified = cache.get(modified_key)
+    if modified is None:
+        cache.add(modified_key, time.time(), _version_timeout())
+        modified = cache.get(modified_key)
+    return modified
+
+
+def versions(*keys):
+    """Поколения данных под ключами и unix-время их последнего изменения."""
+    modified_keys = [MODIFIED_KEY.format(key) for key in keys]
+    stored = cache.get_many(list(keys) + modified_keys)
+    current = [stored.get(key) or _version(key) for key in keys]
+    times = [stored.get(modified_key) or _modified(key)
+             for key, modified_key in zip(keys, modified_keys)]
+    return current, max(times)
+
+
+def posts_version():
+    """Текущее поколение данных о постах."""
+    return _version(POSTS_VERSION_KEY)
+
+
+def bump_posts_version():
+    """Делает устаревшими все закэшированные данные о постах."""
+    _bump(POSTS_VERSION_KEY)
+
+
+def bump_comments_version(post_id):
+    """Делает устаревшими данные о комментариях поста и счётчиках
+    комментариев в постах."""
+    _bump(POST_COMMENTS_VERSION_KEY.format(post_id))
+    _bump(COMMENTS_VERSION_KEY)
+
+
+def bump_users_version():
+    """Делает устаревшими данные, в которых показаны имена
+    пользователей."""
+    _bump(USERS_VERSION_KEY)
+
+
+def bump_groups_version():
+    """Делает устаревшими данные, в которых показаны группы."""
+    _bump(GROUPS_VERSION_KEY)
+
+
+def listing_version(scope):
+    """Текущее поколение ленты: 'index', 'group:<slug>', 'profile:<имя>'."""
+    return _version(LISTING_VERSION_KEY.format(scope))
+
+
+def bump_listing_versions(scopes):
+    """Делает устаревшими закэшированные страницы перечисленных лент."""
+    for scope in set(scopes):
+        _bump(LISTING_VERSION_KEY.format(scope))
+
+
+def post_scopes(post, group_slug=None, username=None):
+    """Ленты, в которых показывается пост."""
+    if username is None:
+        username = post.author.username
+    scopes = ['index', f'profile:{username}']
+    if group_slug is None and post.group_id is not None:
+        group_slug = post.group.slug
+    if group_slug is not None:
+        scopes.append(f'group:{group_slug}')
+    return scopes
@@ -0,0 +1,185 @@
+from collections import Counter, defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+
+from .caching import (bump_groups_version, bump_listing_versions,
+                      bump_posts_version, post_scopes)
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+
+def _apply(model, deltas, field):
+    """Атомарно прибавляет к счётчику field значения из deltas.
+
+    Возвращает количество обновлённых записей.
+    """
+    by_delta = defaultdict(list)
+    for pk, delta in deltas.items():
+        if delta:
+            by_delta[delta].append(pk)
+    updated = 0
+    for delta, pks in by_delta.items():
+        updated += model.objects.filter(pk__in=pks).update(
+            **{field: F(field) + delta})
+    return updated
+
+
+def actual_user_stats(user_ids):
+    """Считает счётчики пользователей заново по данным в базе."""
+    user_ids = list(user_ids)
+    posts = Post.objects.filter(author_id__in=user_ids)
+    followers = Follow.objects.filter(following_id__in=user_ids)
+    following = Follow.objects.filter(user_id__in=user_ids)
+    posts = dict(posts.order_by().values_list('author_id').annotate(
+        total=Count('pk')))
+    followers = dict(followers.order_by().values_list(
+        'following_id').annotate(total=Count('pk')))
+    following = dict(following.order_by().values_list('user_id').annotate(
+        total=Count('pk')))
+    return {
+        user_id: UserStats(user_id=user_id,
+                           posts_count=posts.get(user_id, 0),
+                           followers_count=followers.get(user_id, 0),
+                           following_count=following.get(user_id, 0))
+        for user_id in user_ids
+    }
+
+
+def _bump_users(field, deltas):
+    """Обновляет счётчики пользователей, заводя недостающие записи.
+
+    Сигналы приходят уже после записи в базу, поэтому новая запись
+    считается по данным и сразу учитывает это изменение. Записи
+    заводятся только при росте счётчика: уменьшение приходит и при
+    каскадном удалении самого пользователя.
+    """
+    deltas = {pk: delta for pk, delta in deltas.items() if delta}
+    growing = [pk for pk, delta in deltas.items() if delta > 0]
+    if _apply(UserStats, deltas, field) == len(deltas) or not growing:
+        return
+    existing = UserStats.objects.filter(
+        pk__in=growing).values_list('pk', flat=True)
+    missing = set(growing) - set(existing)
+    if not missing:
+        return
+    try:
+        with transaction.atomic():
+            UserStats.objects.bulk_create(
+                actual_user_stats(missing).values())
+    except IntegrityError:
+        # Запись успели создать параллельно, её значение уже верное.
+        pass
+
+
+def posts_added(posts, sign=1):
+    """Учитывает добавленные (или удалённые при sign=-1) посты."""
+    authors = Counter()
+    groups = Counter()
+    for post in posts:
+        authors[post.author_id] += sign
+        if post.group_id is not None:
+            groups[post.group_id] += sign
+    _bump_users('posts_count', authors)
+    _apply(Group, groups, 'posts_count')
+
+
+def post_moved(old_group_id, new_group_id):
+    """Переносит пост из одной группы в другую."""
+    if old_group_id == new_group_id:
+        return
+    deltas = Counter()
+    if old_group_id is not None:
+        deltas[old_group_id] -= 1
+    if new_group_id is not None:
+        deltas[new_group_id] += 1
+    _apply(Group, deltas, 'posts_count')
+
+
+def comments_added(comments, sign=1):
+    """Учитывает добавленные (или удалённые при sign=-1) комментарии."""
+    _apply(Post,
+           _signed(Counter(comment.post_id for comment in comments), sign),
+           'comments_count')
+
+
+def follows_added(follows, sign=1):
+    """Учитывает добавленные (или удалённые при sign=-1) подписки."""
+    follows = list(follows)
+    _bump_users('following_count',
+                _signed(Counter(f.user_id for f in follows), sign))
+    _bump_users('followers_count',
+                _signed(Counter(f.following_id for f in follows), sign))
+
+
+def _signed(counter, sign):
+    return {pk: total * sign for pk, total in counter.items()}
+
+
+def reconcile_users(user_ids):
+    """Исправляет расхождения в счётчиках пользователей, возвращает их
+    количество."""
+    actual = actual_user_stats(user_ids)
+    stored = UserStats.objects.in_bulk(list(actual))
+    fields = ('posts_count', 'followers_count', 'following_count')
+    stale = [
+        stats for pk, stats in actual.items()
+        if pk in stored and any(getattr(stats, field)
+                                != getattr(stored[pk], field)
+                                for field in fields)
+    ]
+    UserStats.objects.bulk_update(stale, fields)
+    missing = [stats for pk, stats in actual.items() if pk not in stored]
+    UserStats.objects.bulk_create(missing, ignore_conflicts=True)
+    if stale or missing:
+        # bulk_update не шлёт сигналов: ленты сбрасываются здесь.
+        usernames = User.objects.filter(
+            pk__in=[stats.user_id for stats in stale + missing]
+        ).values_list('username', flat=True)
+        bump_listing_versions(
+            f'profile:{username}' for username in usernames)
+    return len(stale) + len(missing)
+
+
+def reconcile_groups(group_ids):
+    """Исправляет счётчики постов в группах."""
+    actual = dict(Post.objects.filter(group_id__in=list(group_ids)).order_by(
+    ).values_list('group_id').annotate(total=Count('pk')))
+    stale = []
+    for group in Group.objects.filter(pk__in=list(group_ids)).only(
+            'pk', 'slug', 'posts_count'):
+        if group.posts_count != actual.get(group.pk, 0):
+            group.posts_count = actual.get(group.pk, 0)
+            stale.append(group)
+    Group.objects.bulk_update(stale, ['posts_count'])
+    if stale:
+        bump_listing_versions(f'group:{group.slug}' for group in stale)
+        bump_groups_version()
+    return len(stale)
+
+
+def reconcile_posts(post_ids):
+    """Исправляет счётчики комментариев к постам."""
+    actual = dict(Comment.objects.filter(post_id__in=list(post_ids)).order_by(
+    ).values_list('post_id').annotate(total=Count('pk')))
+    stale = []
+    posts = Post.objects.filter(pk__in=list(post_ids)).select_related(
+        'author', 'group').only('pk', 'comments_count', 'author__username',
+                                'group__slug')
+    for post in posts:
+        if post.comments_count != actual.get(post.pk, 0):
+            post.comments_count = actual.get(post.pk, 0)
+            stale.append(post)
+    Post.objects.bulk_update(stale, ['comments_count'])
+    if stale:
+        bump_listing_versions(
+            scope for post in stale for scope in post_scopes(post))
+        bump_posts_version()
+    return len(stale)
+
+
+def user_stats(user):
+    """Счётчики пользователя; для пользователя без записи — нули."""
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        return UserStats(user=user)
@@ -0,0 +1,168 @@
+"""Генерация синтетических данных для команды generate_dataset.
+
+Модуль не обращается к Django и базе: функции make_* выполняются в
+отдельных процессах и возвращают кортежи значений, а записывает их
+основной процесс. Каждая пачка строится из своего зерна, поэтому набор
+данных воспроизводится при том же --seed независимо от числа процессов.
+
+Популярность пользователей и постов распределена по закону Ципфа:
+немногие авторы пишут большую часть постов и собирают большую часть
+подписчиков, немногие посты собирают большую часть комментариев.
+"""
+import math
+import random
+
+# Длина текста в словах распределена логнормально: медиана и разброс.
+POST_WORDS = (30, 0.9)
+COMMENT_WORDS = (10, 0.7)
+MAX_WORDS = 1000
+SENTENCE_WORDS = 12
+# Доля постов в группах и доля комментариев от популярных авторов.
+GROUP_SHARE = 0.6
+POPULAR_COMMENTERS = 0.3
+# Средняя задержка комментария после поста, секунды.
+COMMENT_DELAY = 60 * 60 * 24
+VOCABULARY_SIZE = 3000
+NAMES_SIZE = 300
+
+_vocabulary = None
+
+
+def init_worker(locale, seed):
+    """Готовит словарь и имена процесса один раз с помощью Faker."""
+    global _vocabulary
+    from faker import Faker
+
+    fake = Faker(locale)
+    fake.seed_instance(seed)
+    _vocabulary = {
+        'words': fake.words(nb=VOCABULARY_SIZE),
+        'first_names': [fake.first_name() for _ in range(NAMES_SIZE)],
+        'last_names': [fake.last_name() for _ in range(NAMES_SIZE)],
+    }
+
+
+def zipf_rank(rnd, size):
+    """Ранг от 0 до size - 1 с вероятностью примерно 1 / (ранг + 1)."""
+    return int(size ** rnd.random()) - 1
+
+
+def spread(rank, size, stride):
+    """Перемешивает ранги, чтобы популярными были не первые ключи."""
+    return rank * stride % size
+
+
+def stride_for(size):
+    """Шаг перемешивания: взаимно простой с size, около 0.618 size."""
+    stride = max(1, int(size * 0.618))
+    while math.gcd(stride, size) != 1:
+        stride += 1
+    return stride
+
+
+def pick(spec, kind, rank):
+    first, size, stride = spec[kind]
+    return first + spread(rank, size, stride)
+
+
+def popular(rnd, spec, kind):
+    return pick(spec, kind, zipf_rank(rnd, spec[kind][1]))
+
+
+def uniform(rnd, spec, kind):
+    first, size, _ = spec[kind]
+    return first + rnd.randrange(size)
+
+
+def text(rnd, length):
+    """Текст из слов словаря длиной по логнормальному закону."""
+    median, sigma = length
+    total = min(MAX_WORDS, max(1, round(
+        rnd.lognormvariate(0, sigma) * median)))
+    words = rnd.choices(_vocabulary['words'], k=total)
+    sentences = []
+    for start in range(0, total, SENTENCE_WORDS):
+        sentence = ' '.join(words[start:start + SENTENCE_WORDS])
+        sentences.append(sentence[:1].upper() + sentence[1:] + '.')
+    return ' '.join(sentences)
+
+
+def post_time(spec, index):
+    """Посты идут равномерно по периоду в порядке ключей."""
+    first, size, _ = spec['posts']
+    return spec['start'] + (index - first + 1) * spec['span'] / size
+
+
+def chunk_random(spec, kind, first):
+    return random.Random(f'{spec["seed"]}:{kind}:{first}')
+
+
+def make_users(spec, chunk):
+    """(ключ, имя пользователя, имя, фамилия, время регистрации)."""
+    first, count = chunk
+    rnd = chunk_random(spec, 'users', first)
+    start = spec['users'][0]
+    return [
+        (pk, f'user{pk}', rnd.choice(_vocabulary['first_names']),
+         rnd.choice(_vocabulary['last_names']),
+         spec['start'] - rnd.random() * spec['span'])
+        for pk in range(start + first, start + first + count)
+    ]
+
+
+def make_posts(spec, chunk):
+    """(ключ, автор, группа, текст, время, картинка)."""
+    first, count = chunk
+    rnd = chunk_random(spec, 'posts', first)
+    start = spec['posts'][0]
+    rows = []
+    for pk in range(start + first, start + first + count):
+        group = None
+        if spec['groups'] and rnd.random() < GROUP_SHARE:
+            group = spec['groups'][zipf_rank(rnd, len(spec['groups']))]
+        image = ''
+        if spec['images'] and rnd.random() < spec['image_share']:
+            image = rnd.choice(spec['images'])
+        rows.append((pk, popular(rnd, spec, 'users'), group,
+                     text(rnd, POST_WORDS),
+                     post_time(spec, pk) - rnd.random() * spec['step'],
+                     image))
+    return rows
+
+
+def make_comments(spec, chunk):
+    """(пост, автор, текст, время)."""
+    first, count = chunk
+    rnd = chunk_random(spec, 'comments', first)
+    rows = []
+    for _ in range(count):
+        post = popular(rnd, spec, 'posts')
+        if rnd.random() < POPULAR_COMMENTERS:
+            author = popular(rnd, spec, 'users')
+        else:
+            author = uniform(rnd, spec, 'users')
+        created = min(spec['end'], post_time(spec, post)
+                      + rnd.expovariate(1 / COMMENT_DELAY))
+        rows.append((post, author, text(rnd, COMMENT_WORDS), created))
+    return rows
+
+
+def make_follows(spec, chunk):
+    """(подписчик, автор); повторы убирает база."""
+    first, count = chunk
+    rnd = chunk_random(spec, 'follows', first)
+    rows = set()
+    for _ in range(count):
+        user = uniform(rnd, spec, 'users')
+        following = popular(rnd, spec, 'users')
+        if user != following:
+            rows.add((user, following))
+    return sorted(rows)
+
+
+GENERATORS = {
+    'users': make_users,
+    'posts': make_posts,
+    'comments': make_comments,
+    'follows': make_follows,
+}
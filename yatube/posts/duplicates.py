@@ -0,0 +1,230 @@
+import os
+import pickle
+import threading
+
+from django.conf import settings
+from PIL import Image
+
+# Картинки, отличающиеся не больше чем на столько бит хэша, считаются
+# почти одинаковыми.
+DEFAULT_DISTANCE = 6
+HASH_SIZE = 8
+
+
+def image_hash(image):
+    """Разностный хэш (dHash) картинки: 64 бита в шестнадцатеричной записи.
+
+    Хэш почти не меняется от пережатия, масштаба и мелких правок.
+    """
+    with image.open('rb'):
+        source = Image.open(image)
+        # JPEG можно сразу декодировать в уменьшенном виде.
+        source.draft('L', (HASH_SIZE * 4, HASH_SIZE * 4))
+        small = source.convert('L').resize(
+            (HASH_SIZE + 1, HASH_SIZE), Image.LANCZOS)
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(HASH_SIZE):
+        for col in range(HASH_SIZE):
+            left = pixels[row * (HASH_SIZE + 1) + col]
+            value = value << 1 | (left > pixels[row * (HASH_SIZE + 1)
+                                                + col + 1])
+    return f'{value:016x}'
+
+
+def distance(first, second):
+    """Расстояние Хэмминга между двумя хэшами."""
+    return bin(first ^ second).count('1')
+
+
+class BKTree:
+    """BK-дерево по расстоянию Хэмминга.
+
+    Узел — список [хэш, ключи постов, {расстояние: дочерний узел}].
+    Поиск отбрасывает ветки по неравенству треугольника и смотрит
+    только малую часть узлов.
+    """
+
+    def __init__(self):
+        self.root = None
+        self.size = 0
+
+    def add(self, value, key):
+        self.size += 1
+        if self.root is None:
+            self.root = [value, [key], {}]
+            return
+        node = self.root
+        while True:
+            gap = distance(value, node[0])
+            if gap == 0:
+                node[1].append(key)
+                return
+            child = node[2].get(gap)
+            if child is None:
+                node[2][gap] = [value, [key], {}]
+                return
+            node = child
+
+    def search(self, value, limit):
+        """Пары (расстояние, ключ) для хэшей не дальше limit."""
+        found = []
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node = stack.pop()
+            gap = distance(value, node[0])
+            if gap <= limit:
+                found.extend((gap, key) for key in node[1])
+            for child_gap, child in node[2].items():
+                if gap - limit <= child_gap <= gap + limit:
+                    stack.append(child)
+        return sorted(found)
+
+
+class ImageIndex:
+    """BK-дерево хэшей картинок, сохранённое на диск.
+
+    Снимок дерева лежит в pickle-файле, а хэши, добавленные после него,
+    дописываются строками в журнал рядом. Каждый процесс держит дерево
+    в памяти и дочитывает журнал перед поиском.
+    """
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.journal = path + '.log'
+        self.tree = BKTree()
+        self._snapshot = None
+        self._offset = 0
+        self._lock = threading.Lock()
+
+    def _stat(self, path):
+        try:
+            return os.stat(path)
+        except FileNotFoundError:
+            return None
+
+    def refresh(self):
+        """Перечитывает снимок, если он сменился, и новые строки журнала."""
+        with self._lock:
+            stat = self._stat(self.path)
+            snapshot = stat and (stat.st_mtime_ns, stat.st_size)
+            if snapshot != self._snapshot:
+                self.tree = BKTree()
+                if stat is not None:
+                    with open(self.path, 'rb') as source:
+                        self.tree = pickle.load(source)
+                self._snapshot = snapshot
+                self._offset = 0
+            journal = self._stat(self.journal)
+            if journal is None or journal.st_size < self._offset:
+                self._offset = 0
+                return
+            with open(self.journal, 'rb') as lines:
+                lines.seek(self._offset)
+                for line in lines:
+                    if not line.endswith(b'\n'):
+                        # Строку ещё дописывают.
+                        break
+                    key, value = line.split()
+                    self.tree.add(int(value, 16), int(key))
+                    self._offset += len(line)
+
+    def add(self, key, value):
+        with open(self.journal, 'a') as lines:
+            lines.write(f'{key} {value}\n')
+        self.refresh()
+
+    def search(self, value, limit=DEFAULT_DISTANCE):
+        self.refresh()
+        return self.tree.search(int(value, 16), limit)
+
+    def rebuild(self, items):
+        """Строит дерево заново из пар (ключ, хэш) и сохраняет снимок."""
+        tree = BKTree()
+        for key, value in items:
+            tree.add(int(value, 16), key)
+        temporary = f'{self.path}.{os.getpid()}.tmp'
+        with open(temporary, 'wb') as target:
+            pickle.dump(tree, target, pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, self.path)
+        open(self.journal, 'w').close()
+        self.refresh()
+        return tree.size
+
+
+_indexes = {}
+
+
+def get_index():
+    """Индекс картинок процесса для пути из POSTS_IMAGE_INDEX."""
+    path = settings.POSTS_IMAGE_INDEX
+    if path not in _indexes:
+        _indexes[path] = ImageIndex(path)
+    return _indexes[path]
+
+
+def index_post(post):
+    """Считает хэш картинки поста, сохраняет его и добавляет в индекс."""
+    from .models import Post
+
+    value = image_hash(post.image)
+    if Post.objects.filter(pk=post.pk, image=post.image.name).update(
+            image_hash=value):
+        get_index().add(post.pk, value)
+    return value
+
+
+def rebuild_index():
+    """Пересобирает индекс по хэшам из базы."""
+    from .models import Post
+
+    return get_index().rebuild(Post.objects.exclude(
+        image_hash='').values_list('pk', 'image_hash').iterator())
+
+
+def similar_posts(post, limit=DEFAULT_DISTANCE):
+    """Посты с похожей картинкой: {ключ поста: расстояние}.
+
+    Индекс может хранить хэши удалённых или заменённых картинок, поэтому
+    найденное сверяется с базой.
+    """
+    from .models import Post
+
+    if not post.image_hash:
+        return {}
+    value = int(post.image_hash, 16)
+    found = {key for _, key in get_index().search(post.image_hash, limit)
+             if key != post.pk}
+    similar = {}
+    for key, other in Post.objects.filter(pk__in=found).exclude(
+            image_hash='').values_list('pk', 'image_hash'):
+        gap = distance(value, int(other, 16))
+        if gap <= limit:
+            similar[key] = gap
+    return similar
+
+
+def duplicate_groups(items, limit=DEFAULT_DISTANCE):
+    """Группы ключей постов с почти одинаковыми картинками.
+
+    items — пары (ключ поста, хэш), которые уже есть в индексе.
+    """
+    index = get_index()
+    index.refresh()
+    parent = {}
+
+    def root(key):
+        while parent.setdefault(key, key) != key:
+            parent[key] = parent[parent[key]]
+            key = parent[key]
+        return key
+
+    for key, value in items:
+        for _, other in index.tree.search(int(value, 16), limit):
+            parent[root(other)] = root(key)
+    groups = {}
+    for key in parent:
+        groups.setdefault(root(key), []).append(key)
+    return sorted(sorted(group) for group in groups.values()
+                  if len(group) > 1)
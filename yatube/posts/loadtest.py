@@ -0,0 +1,242 @@
+"""Виртуальные пользователи и отчёт для команды loadtest.
+
+Каждый виртуальный пользователь — отдельный поток со своими cookie и
+JWT. Он в цикле выбирает действие по весам MIX и выполняет несколько
+запросов, как это делал бы человек: открыть ленту, затем пост, затем
+оставить комментарий. Время каждого запроса записывается под именем
+URL из urls.py, поэтому в отчёте /posts/1/ и /posts/2/ — одна строка
+GET posts:post_detail.
+"""
+import http.cookiejar
+import json
+import math
+import random
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.urls import reverse
+
+# Веса действий: чтение заметно преобладает над записью.
+MIX = {
+    'browse': 40,
+    'feed': 15,
+    'search': 5,
+    'post': 3,
+    'comment': 7,
+    'follow': 2,
+    'api_read': 25,
+    'api_write': 3,
+}
+# Что делают пользователи без входа.
+ANONYMOUS_ACTIONS = ('browse', 'search', 'api_read')
+PERCENTILES = (50, 95, 99)
+REQUEST_TIMEOUT = 30
+API_PAGE_LIMIT = 20
+
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    """Редирект записывается как ответ, а не выполняется следующим
+    запросом: иначе время двух запросов сложилось бы в одно."""
+
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class VirtualUser:
+    def __init__(self, base_url, sample, rnd, username=None, password=None):
+        self.base_url = base_url.rstrip('/')
+        self.sample = sample
+        self.rnd = rnd
+        self.username = username
+        self.password = password
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(self.cookies), NoRedirect)
+        self.token = None
+        self.records = []
+
+    def request(self, name, path, data=None, headers=None, method=None):
+        """Выполняет запрос и записывает (метод и имя URL, статус,
+        секунды).
+
+        Статус 0 значит, что ответа не было: соединение оборвалось или
+        истёк таймаут.
+        """
+        request = urllib.request.Request(self.base_url + path, data=data,
+                                         headers=headers or {},
+                                         method=method)
+        started = time.perf_counter()
+        try:
+            with self.opener.open(request, timeout=REQUEST_TIMEOUT) as reply:
+                status, body = reply.status, reply.read()
+        except urllib.error.HTTPError as error:
+            status, body = error.code, error.read()
+        except OSError:
+            status, body = 0, b''
+        self.records.append((f'{request.get_method()} {name}', status,
+                             time.perf_counter() - started))
+        return status, body
+
+    def get(self, name, *args, query=None, **kwargs):
+        path = reverse(name, args=args)
+        if query:
+            path += '?' + urllib.parse.urlencode(query)
+        return self.request(name, path, **kwargs)
+
+    def submit(self, name, *args, fields):
+        """POST формы с CSRF-токеном из cookie, как у браузера."""
+        fields = {**fields, 'csrfmiddlewaretoken': self.csrf_token()}
+        return self.request(
+            name, reverse(name, args=args),
+            data=urllib.parse.urlencode(fields).encode(),
+            headers={'Content-Type': 'application/x-www-form-urlencoded'})
+
+    def api(self, name, *args, query=None, payload=None):
+        headers = {'Accept': 'application/json'}
+        if self.token:
+            headers['Authorization'] = f'Bearer {self.token}'
+        data = None
+        if payload is not None:
+            data = json.dumps(payload).encode()
+            headers['Content-Type'] = 'application/json'
+        return self.get(name, *args, query=query, data=data,
+                        headers=headers)
+
+    def csrf_token(self):
+        for cookie in self.cookies:
+            if cookie.name == 'csrftoken':
+                return cookie.value
+        return ''
+
+    def login(self):
+        """Входит на сайт и получает JWT; без входа остаётся анонимом."""
+        if self.username is None:
+            return
+        self.get('users:login')
+        status, _ = self.submit('users:login', fields={
+            'username': self.username, 'password': self.password})
+        if status != 302:
+            self.username = None
+            return
+        status, body = self.api('jwt-create', payload={
+            'username': self.username, 'password': self.password})
+        if status == 200:
+            self.token = json.loads(body)['access']
+
+    def run(self, deadline, think):
+        """Выполняет действия до deadline с паузами в среднем think
+        секунд."""
+        self.login()
+        actions = list(MIX)
+        if self.username is None:
+            actions = list(ANONYMOUS_ACTIONS)
+        weights = [MIX[action] for action in actions]
+        while time.time() < deadline:
+            action = self.rnd.choices(actions, weights)[0]
+            getattr(self, f'do_{action}')()
+            if think:
+                time.sleep(self.rnd.expovariate(1 / think))
+        return self.records
+
+    def choice(self, kind):
+        return self.rnd.choice(self.sample[kind])
+
+    def text(self):
+        return ' '.join(self.rnd.choices(self.sample['words'], k=12))
+
+    def do_browse(self):
+        self.get('posts:main_page')
+        page = self.rnd.random()
+        if page < 0.3 and self.sample['groups']:
+            self.get('posts:group_list', self.choice('groups'))
+        elif page < 0.5:
+            self.get('posts:profile', self.choice('authors'))
+        self.get('posts:post_detail', self.choice('posts'))
+
+    def do_feed(self):
+        self.get('posts:follow_index')
+
+    def do_search(self):
+        self.get('posts:search', query={'q': self.choice('words')})
+
+    def do_post(self):
+        self.get('posts:post_create')
+        self.submit('posts:post_create', fields={'text': self.text()})
+
+    def do_comment(self):
+        post = self.choice('posts')
+        self.get('posts:post_detail', post)
+        self.submit('posts:add_comment', post, fields={'text': self.text()})
+
+    def do_follow(self):
+        self.submit('posts:profile_follow', self.choice('authors'),
+                    fields={})
+
+    def do_api_read(self):
+        self.api('posts-list', query={'limit': API_PAGE_LIMIT})
+        post = self.choice('posts')
+        self.api('posts-detail', post)
+        self.api('comments-list', post)
+
+    def do_api_write(self):
+        self.api('posts-list', payload={'text': self.text()})
+
+
+def run_users(base_url, sample, accounts, password, seed, deadline, think):
+    """Запускает по потоку на аккаунт и возвращает все записи.
+
+    accounts — имена пользователей, None на месте анонимов.
+    """
+    users = [
+        VirtualUser(base_url, sample, random.Random(f'{seed}:{number}'),
+                    username, password)
+        for number, username in accounts
+    ]
+    if not users:
+        return []
+    with ThreadPoolExecutor(len(users)) as executor:
+        runs = [executor.submit(user.run, deadline, think) for user in users]
+    return [record for run in runs for record in run.result()]
+
+
+def percentile(values, percent):
+    """Значение, не меньше которого percent процентов отсортированных
+    values (метод ближайшего ранга)."""
+    rank = math.ceil(percent / 100 * len(values))
+    return values[max(rank, 1) - 1]
+
+
+def summarize(records, elapsed):
+    """Пропускная способность и перцентили задержки по именам URL, мс."""
+    by_name = defaultdict(list)
+    statuses = defaultdict(Counter)
+    for name, status, seconds in records:
+        by_name[name].append(seconds * 1000)
+        statuses[name][status] += 1
+    urls = {}
+    for name, latencies in sorted(by_name.items()):
+        latencies.sort()
+        stats = {
+            'requests': len(latencies),
+            'throughput': round(len(latencies) / elapsed, 2),
+            'errors': sum(count for status, count in statuses[name].items()
+                          if status == 0 or status >= 500),
+            'statuses': {str(status): count for status, count
+                         in sorted(statuses[name].items())},
+            'mean': round(sum(latencies) / len(latencies), 2),
+            'max': round(latencies[-1], 2),
+        }
+        for percent in PERCENTILES:
+            stats[f'p{percent}'] = round(percentile(latencies, percent), 2)
+        urls[name] = stats
+    total = len(records)
+    return {
+        'requests': total,
+        'throughput': round(total / elapsed, 2),
+        'errors': sum(stats['errors'] for stats in urls.values()),
+        'urls': urls,
+    }
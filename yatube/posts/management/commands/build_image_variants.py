@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.thumbnails import generate_thumbnails
+
+
+class Command(BaseCommand):
+    help = ('Строит варианты картинок для srcset у постов, '
+            'где их ещё нет.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Перестроить варианты у всех постов.')
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='')
+        if not options['all']:
+            posts = posts.filter(image_variants='')
+        built = 0
+        for pk in posts.values_list('pk', flat=True).iterator():
+            generate_thumbnails(pk)
+            built += 1
+        self.stdout.write(f'Построены варианты для постов: {built}')
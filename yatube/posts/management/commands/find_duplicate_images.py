@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from posts import duplicates
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = ('Ищет посты с почти одинаковыми картинками по индексу '
+            'перцептивных хэшей.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--distance', type=int,
+                            default=duplicates.DEFAULT_DISTANCE,
+                            help='Сколько бит хэша могут различаться.')
+        parser.add_argument('--hash-missing', action='store_true',
+                            help='Сначала посчитать хэши картинок, '
+                                 'у которых их ещё нет.')
+
+    def handle(self, *args, **options):
+        if options['hash_missing']:
+            missing = Post.objects.exclude(image='').filter(image_hash='')
+            for post in missing.only('pk', 'image').iterator():
+                duplicates.index_post(post)
+        # Свежий снимок не содержит хэшей удалённых и заменённых картинок.
+        indexed = duplicates.rebuild_index()
+        groups = duplicates.duplicate_groups(
+            Post.objects.exclude(image_hash='').values_list(
+                'pk', 'image_hash').iterator(),
+            options['distance'])
+        for group in groups:
+            self.stdout.write(' '.join(str(pk) for pk in group))
+        self.stdout.write(f'Картинок в индексе: {indexed}, '
+                          f'групп похожих: {len(groups)}')
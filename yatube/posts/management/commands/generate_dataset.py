@@ -0,0 +1,249 @@
+import os
+import random
+import time
+from datetime import datetime, timezone
+from functools import partial
+from io import BytesIO
+from multiprocessing import Pool
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Count, F, Max
+from PIL import Image, ImageDraw
+
+from core.models import StoredFile
+from posts import dataset, timeline
+from posts.bulk import fast_sqlite, keep_dates
+from posts.caching import (bump_groups_version, bump_listing_versions,
+                           bump_posts_version)
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# Пароль всех сгенерированных пользователей: хэш считается один раз.
+DATASET_PASSWORD = 'dataset-password'
+IMAGE_SIZE = (1200, 800)
+# Сколько лент пересобирать за раз.
+TIMELINE_BATCH = 500
+
+
+def make_image(number, seed):
+    """Картинка-градиент с кругами: каждая со своим содержимым."""
+    rnd = random.Random(f'{seed}:image:{number}')
+    image = Image.linear_gradient('L').resize(IMAGE_SIZE).convert('RGB')
+    tint = Image.new('RGB', IMAGE_SIZE, tuple(
+        rnd.randrange(256) for _ in range(3)))
+    image = Image.blend(image, tint, 0.6)
+    draw = ImageDraw.Draw(image)
+    for _ in range(8):
+        x, y = rnd.randrange(IMAGE_SIZE[0]), rnd.randrange(IMAGE_SIZE[1])
+        radius = rnd.randrange(40, 240)
+        draw.ellipse((x - radius, y - radius, x + radius, y + radius),
+                     fill=tuple(rnd.randrange(256) for _ in range(3)))
+    content = BytesIO()
+    image.save(content, 'JPEG', quality=85)
+    return content.getvalue()
+
+
+class Command(BaseCommand):
+    help = ('Заполняет базу синтетическими пользователями, постами, '
+            'комментариями и подписками для нагрузочного тестирования. '
+            'Строки строятся в нескольких процессах и пишутся bulk_create, '
+            'после чего пересчитываются счётчики и ленты подписок. '
+            'Варианты картинок строит build_image_variants.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument('--follows', type=int, default=5000,
+                            help='Сколько подписок попытаться создать; '
+                                 'повторы отбрасываются.')
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--images', type=int, default=0,
+                            help='Сколько разных картинок создать для '
+                                 'постов.')
+        parser.add_argument('--image-share', type=float, default=0.3,
+                            help='Доля постов с картинкой.')
+        parser.add_argument('--days', type=int, default=365,
+                            help='За сколько дней распределить посты.')
+        parser.add_argument('--workers', type=int,
+                            default=os.cpu_count() or 1,
+                            help='Процессы для генерации; 0 — без '
+                                 'отдельных процессов.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--locale', default='ru_RU')
+
+    def handle(self, *args, **options):
+        if options['posts'] and not options['users']:
+            raise CommandError('Для постов нужны пользователи.')
+        if options['comments'] and not options['posts']:
+            raise CommandError('Для комментариев нужны посты.')
+        spec = self.make_spec(options)
+        started = time.perf_counter()
+        pool = None
+        if options['workers']:
+            pool = Pool(options['workers'], initializer=dataset.init_worker,
+                        initargs=(options['locale'], options['seed']))
+            imap = pool.imap
+        else:
+            dataset.init_worker(options['locale'], options['seed'])
+            imap = map
+        try:
+            with fast_sqlite(), keep_dates(Post, 'pub_date'), \
+                    keep_dates(Comment, 'created'):
+                spec['groups'] = self.create_groups(options['groups'])
+                spec['images'] = self.create_images(options['images'],
+                                                    options['seed'])
+                for kind in dataset.GENERATORS:
+                    self.generate(imap, kind, options[kind], spec,
+                                  options['batch_size'])
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+        with fast_sqlite():
+            self.settle(spec)
+        self.stdout.write(
+            f'Готово за {time.perf_counter() - started:.1f} с. Пароль '
+            f'пользователей: {DATASET_PASSWORD}')
+
+    def make_spec(self, options):
+        now = time.time()
+        span = options['days'] * 24 * 60 * 60
+        spec = {
+            'seed': options['seed'],
+            'start': now - span,
+            'end': now,
+            'span': span,
+            'step': span / max(options['posts'], 1),
+            'image_share': options['image_share'],
+        }
+        for kind, model in (('users', User), ('posts', Post)):
+            size = options[kind]
+            first = (model.objects.aggregate(last=Max('pk'))['last']
+                     or 0) + 1
+            spec[kind] = (first, size, dataset.stride_for(max(size, 1)))
+        return spec
+
+    def create_groups(self, count):
+        first = Group.objects.filter(slug__startswith='dataset-').count()
+        Group.objects.bulk_create(
+            Group(title=f'Группа {number}', slug=f'dataset-{number}',
+                  description=f'Сгенерированная группа {number}')
+            for number in range(first, first + count))
+        return list(Group.objects.filter(
+            slug__startswith='dataset-').values_list('pk', flat=True))
+
+    def create_images(self, count, seed):
+        return [default_storage.save(f'posts/dataset-{number}.jpg',
+                                     ContentFile(make_image(number, seed)))
+                for number in range(count)]
+
+    def generate(self, imap, kind, total, spec, batch_size):
+        """Строит строки пачками в процессах и пишет их по мере
+        готовности."""
+        write = getattr(self, f'write_{kind}')
+        chunks = [(first, min(batch_size, total - first))
+                  for first in range(0, total, batch_size)]
+        started = time.perf_counter()
+        written = 0
+        for rows in imap(partial(dataset.GENERATORS[kind], spec), chunks):
+            with transaction.atomic():
+                written += write(rows)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f'{kind}: {written} за {elapsed:.1f} с, '
+                          f'{written / max(elapsed, 1e-9):.0f} строк/с')
+
+    def write_users(self, rows):
+        password = getattr(self, 'password', None)
+        if password is None:
+            password = self.password = make_password(DATASET_PASSWORD)
+        User.objects.bulk_create(
+            User(pk=pk, username=username, first_name=first_name,
+                 last_name=last_name, password=password,
+                 date_joined=moment(joined))
+            for pk, username, first_name, last_name, joined in rows)
+        return len(rows)
+
+    def write_posts(self, rows):
+        Post.objects.bulk_create(
+            Post(pk=pk, author_id=author, group_id=group, text=text,
+                 pub_date=moment(published), image=image)
+            for pk, author, group, text, published, image in rows)
+        return len(rows)
+
+    def write_comments(self, rows):
+        Comment.objects.bulk_create(
+            Comment(post_id=post, author_id=author, text=text,
+                    created=moment(created))
+            for post, author, text, created in rows)
+        return len(rows)
+
+    def write_follows(self, rows):
+        before = Follow.objects.count()
+        Follow.objects.bulk_create(
+            (Follow(user_id=user, following_id=following)
+             for user, following in rows), ignore_conflicts=True)
+        return Follow.objects.count() - before
+
+    def settle(self, spec):
+        """То, что сигналы сделали бы для каждой записи: счётчики, ленты,
+        ссылки на картинки и поколения кэша."""
+        if connection.vendor != 'sqlite':
+            # Ключи заданы явно, последовательности надо догнать.
+            with connection.cursor() as cursor:
+                for sql in connection.ops.sequence_reset_sql(
+                        no_style(), [User, Post]):
+                    cursor.execute(sql)
+        if spec['images']:
+            self.settle_images(spec['images'])
+        call_command('reconcile_counters', stdout=self.stdout)
+        started = time.perf_counter()
+        user_ids = list(Follow.objects.order_by('user_id').values_list(
+            'user_id', flat=True).distinct())
+        for start in range(0, len(user_ids), TIMELINE_BATCH):
+            with transaction.atomic():
+                timeline.rebuild(user_ids[start:start + TIMELINE_BATCH])
+        self.stdout.write(
+            f'Ленты пересобраны за {time.perf_counter() - started:.1f} с')
+        self.reset_caches(spec)
+
+    def settle_images(self, names):
+        """Ссылки постов на картинки; картинки без постов удаляются."""
+        uses = dict(Post.objects.filter(image__in=names).order_by(
+        ).values_list('image').annotate(total=Count('pk')))
+        for name in set(names):
+            if not uses.get(name):
+                default_storage.delete(name)
+            elif hasattr(default_storage, 'acquire'):
+                # Одна ссылка уже есть от сохранения картинки.
+                StoredFile.objects.filter(name=name).update(
+                    references=F('references') + uses[name] - 1)
+
+    def reset_caches(self, spec):
+        """bulk_create не отправляет сигналов: сбрасывает поколения лент,
+        где появились новые посты, и ETag постов и групп в API."""
+        first, size, _ = spec['posts']
+        cards = Post.objects.filter(
+            pk__gte=first, pk__lt=first + size).order_by().values_list(
+            'author__username', 'group__slug').distinct()
+        scopes = {'index'}
+        for username, slug in cards:
+            scopes.add(f'profile:{username}')
+            if slug is not None:
+                scopes.add(f'group:{slug}')
+        bump_listing_versions(scopes)
+        bump_posts_version()
+        bump_groups_version()
+
+
+def moment(timestamp):
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc)
@@ -0,0 +1,321 @@
+import csv
+import json
+import os
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts import counters, timeline
+from posts.bulk import create_posts, fast_sqlite, keep_dates
+from posts.caching import (bump_comments_version, bump_listing_versions,
+                           bump_posts_version)
+from posts.models import Comment, Follow, Group, ImportCheckpoint, Post
+
+User = get_user_model()
+
+KINDS = ('posts', 'comments', 'follows')
+# Сколько пропущенных строк показать, прежде чем только считать их.
+MAX_WARNINGS = 20
+
+
+class RowError(ValueError):
+    """Строку файла нельзя загрузить."""
+
+
+def lines(source):
+    """Строки двоичного файла в виде текста.
+
+    Файл читается readline(), поэтому после каждой строки source.tell()
+    указывает на её конец.
+    """
+    for line in iter(source.readline, b''):
+        # Первая строка файла может начинаться с BOM.
+        yield line.decode('utf-8-sig' if source.tell() == len(line)
+                          else 'utf-8')
+
+
+def read_rows(source, file_format, offset):
+    """Пары (строка файла, смещение её конца), начиная со смещения offset.
+
+    Строка JSONL отдаётся текстом, строка CSV — словарём по заголовку.
+    """
+    if file_format == 'csv':
+        header = next(csv.reader(lines(source)), None)
+        if offset:
+            source.seek(offset)
+        for values in csv.reader(lines(source)):
+            if values:
+                yield dict(zip(header, values)), source.tell()
+        return
+    if offset:
+        source.seek(offset)
+    for line in lines(source):
+        if line.strip():
+            yield line, source.tell()
+
+
+def parse_date(value, default):
+    if not value:
+        return default
+    moment = parse_datetime(value)
+    if moment is None:
+        raise RowError(f'неверная дата {value!r}')
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def parse_id(value, name):
+    if value in (None, ''):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise RowError(f'неверный {name} {value!r}')
+
+
+class Command(BaseCommand):
+    help = ('Загружает посты, комментарии или подписки из JSONL или CSV '
+            'пачками через bulk_create. Прерванная загрузка того же файла '
+            'продолжается с первой незагруженной строки.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=KINDS,
+                            help='Что загружать.')
+        parser.add_argument('path', help='Файл .jsonl или .csv.')
+        parser.add_argument('--format', choices=('jsonl', 'csv'),
+                            help='Формат файла, если не ясен из '
+                                 'расширения.')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Сколько строк записывать одной '
+                                 'транзакцией.')
+        parser.add_argument('--create-users', action='store_true',
+                            help='Заводить пользователей, которых ещё '
+                                 'нет, без пароля.')
+        parser.add_argument('--restart', action='store_true',
+                            help='Загружать файл с начала, забыв '
+                                 'сохранённую позицию.')
+
+    def handle(self, *args, **options):
+        kind = options['kind']
+        path = os.path.abspath(options['path'])
+        file_format = options['format'] or (
+            'csv' if path.lower().endswith('.csv') else 'jsonl')
+        self.create_users = options['create_users']
+        self.now = timezone.now()
+        self.users = dict(User.objects.values_list('username', 'pk'))
+        self.groups = dict(Group.objects.values_list('slug', 'pk'))
+        self.scopes = set()
+        self.commented = set()
+        self.skipped = 0
+        source_key = f'{kind}:{path}'[-512:]
+        if options['restart']:
+            ImportCheckpoint.objects.filter(source=source_key).delete()
+        checkpoint, _ = ImportCheckpoint.objects.get_or_create(
+            source=source_key)
+        self.first_line = checkpoint.line
+        if checkpoint.line:
+            self.stdout.write(f'Продолжение со строки {checkpoint.line + 1}')
+        try:
+            source = open(path, 'rb')
+        except OSError as error:
+            raise CommandError(error)
+        started = time.perf_counter()
+        with source, fast_sqlite(), keep_dates(Post, 'pub_date'), \
+                keep_dates(Comment, 'created'):
+            self.load(source, file_format, kind, checkpoint,
+                      options['batch_size'], started)
+        self.finish(kind)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'Загружено ({kind}): {checkpoint.imported}, '
+            f'пропущено строк: {self.skipped}, '
+            f'{self.rate(checkpoint, started):.0f} строк/с '
+            f'за {elapsed:.1f} с')
+
+    def load(self, source, file_format, kind, checkpoint, batch_size,
+             started):
+        """Читает файл с сохранённой позиции и пишет его пачками."""
+        parse = getattr(self, f'parse_{kind}')
+        write = getattr(self, f'write_{kind}')
+        line = checkpoint.line
+        batch = []
+        for raw, offset in read_rows(source, file_format, checkpoint.offset):
+            line += 1
+            try:
+                row = json.loads(raw) if isinstance(raw, str) else raw
+                if not isinstance(row, dict):
+                    raise RowError('ожидался объект')
+                batch.append((line, parse(row)))
+            except ValueError as error:
+                self.skip(line, error)
+            if len(batch) >= batch_size:
+                self.flush(write, batch, checkpoint, offset, line)
+                self.progress(checkpoint, started)
+                batch = []
+        if line != checkpoint.line:
+            self.flush(write, batch, checkpoint, source.tell(), line)
+
+    def flush(self, write, batch, checkpoint, offset, line):
+        """Записывает пачку и позицию в файле одной транзакцией."""
+        try:
+            with transaction.atomic():
+                written = write(batch) if batch else 0
+                checkpoint.offset = offset
+                checkpoint.line = line
+                checkpoint.imported += written
+                checkpoint.save()
+        except IntegrityError as error:
+            raise CommandError(
+                f'Строки {batch[0][0]}–{line}: {error}. Загрузка '
+                f'остановлена на строке {checkpoint.line}.')
+
+    def rate(self, checkpoint, started):
+        """Строк файла в секунду за этот запуск."""
+        return ((checkpoint.line - self.first_line)
+                / max(time.perf_counter() - started, 1e-9))
+
+    def progress(self, checkpoint, started):
+        self.stdout.write(f'Строк: {checkpoint.line}, загружено: '
+                          f'{checkpoint.imported}, '
+                          f'{self.rate(checkpoint, started):.0f} строк/с')
+
+    def skip(self, line, error):
+        self.skipped += 1
+        if self.skipped <= MAX_WARNINGS:
+            self.stderr.write(f'Строка {line} пропущена: {error}')
+        elif self.skipped == MAX_WARNINGS + 1:
+            self.stderr.write('Дальше пропущенные строки только считаются.')
+
+    def username(self, row, field):
+        username = row.get(field)
+        if not username:
+            raise RowError(f'не указан {field}')
+        if username not in self.users and not self.create_users:
+            raise RowError(f'нет пользователя {username!r}')
+        return username
+
+    def resolve_users(self, usernames):
+        """Заводит недостающих пользователей при --create-users."""
+        missing = set(usernames) - set(self.users)
+        if not missing:
+            return
+        User.objects.bulk_create(
+            User(username=username, password='!') for username in missing)
+        self.users.update(User.objects.filter(
+            username__in=missing).values_list('username', 'pk'))
+
+    def parse_posts(self, row):
+        text = row.get('text')
+        if not text:
+            raise RowError('пустой текст')
+        slug = row.get('group') or None
+        if slug is not None and slug not in self.groups:
+            raise RowError(f'нет группы {slug!r}')
+        return {
+            'pk': parse_id(row.get('id'), 'id'),
+            'author': self.username(row, 'author'),
+            'group': slug,
+            'text': text,
+            'pub_date': parse_date(row.get('pub_date'), self.now),
+        }
+
+    def write_posts(self, batch):
+        items = [item for _, item in batch]
+        self.resolve_users(item['author'] for item in items)
+        posts = []
+        for item in items:
+            posts.append(Post(
+                pk=item['pk'], author_id=self.users[item['author']],
+                group_id=self.groups.get(item['group']), text=item['text'],
+                pub_date=item['pub_date']))
+            self.scopes.add(f'profile:{item["author"]}')
+            if item['group'] is not None:
+                self.scopes.add(f'group:{item["group"]}')
+        # create_posts проставляет ключи только пачкам без ключей.
+        for keyed in (True, False):
+            create_posts([post for post in posts
+                          if (post.pk is not None) == keyed],
+                         batch_size=len(posts))
+        return len(posts)
+
+    def parse_comments(self, row):
+        text = row.get('text')
+        if not text:
+            raise RowError('пустой текст')
+        post_id = parse_id(row.get('post'), 'post')
+        if post_id is None:
+            raise RowError('не указан post')
+        return {
+            'post': post_id,
+            'author': self.username(row, 'author'),
+            'text': text,
+            'created': parse_date(row.get('created'), self.now),
+        }
+
+    def write_comments(self, batch):
+        existing = set(Post.objects.filter(
+            pk__in={item['post'] for _, item in batch}).values_list(
+            'pk', flat=True))
+        items = []
+        for line, item in batch:
+            if item['post'] in existing:
+                items.append(item)
+            else:
+                self.skip(line, f'нет поста {item["post"]}')
+        self.resolve_users(item['author'] for item in items)
+        comments = Comment.objects.bulk_create(
+            Comment(post_id=item['post'],
+                    author_id=self.users[item['author']],
+                    text=item['text'], created=item['created'])
+            for item in items)
+        counters.comments_added(comments)
+        self.commented.update(comment.post_id for comment in comments)
+        return len(comments)
+
+    def parse_follows(self, row):
+        user = self.username(row, 'user')
+        following = self.username(row, 'following')
+        if user == following:
+            raise RowError('подписка на самого себя')
+        return {'user': user, 'following': following}
+
+    def write_follows(self, batch):
+        self.resolve_users(item[field] for _, item in batch
+                           for field in ('user', 'following'))
+        pairs = {(self.users[item['user']], self.users[item['following']])
+                 for _, item in batch}
+        existing = set(Follow.objects.filter(
+            user_id__in={user for user, _ in pairs},
+            following_id__in={following for _, following in pairs},
+        ).values_list('user_id', 'following_id'))
+        follows = Follow.objects.bulk_create(
+            Follow(user_id=user, following_id=following)
+            for user, following in sorted(pairs - existing))
+        counters.follows_added(follows)
+        for follow in follows:
+            timeline.backfill(follow.user_id, follow.following_id)
+        return len(follows)
+
+    def finish(self, kind):
+        """Сбрасывает кэш после всех записей: bulk_create не отправляет
+        сигналов."""
+        if kind == 'posts':
+            bump_listing_versions(self.scopes | {'index'})
+        if self.commented:
+            # Карточки постов в лентах показывают число комментариев.
+            self.scopes.add('index')
+            for username, slug in Post.objects.filter(
+                    pk__in=self.commented).values_list(
+                    'author__username', 'group__slug').distinct():
+                self.scopes.add(f'profile:{username}')
+                if slug is not None:
+                    self.scopes.add(f'group:{slug}')
+            bump_listing_versions(self.scopes)
+        for post_id in self.commented:
+            bump_comments_version(post_id)
+        bump_posts_version()
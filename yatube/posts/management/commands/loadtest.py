@@ -0,0 +1,176 @@
+import json
+import random
+import threading
+import time
+from multiprocessing import Pool
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.core.servers.basehttp import (ThreadedWSGIServer,
+                                          WSGIRequestHandler)
+from django.db import connection
+
+from posts import loadtest
+from posts.management.commands.generate_dataset import DATASET_PASSWORD
+from posts.models import Group, Post
+
+User = get_user_model()
+
+# Сколько постов, групп и авторов передать виртуальным пользователям.
+SAMPLE_SIZE = 500
+WORDS_SIZE = 200
+
+
+class QuietHandler(WSGIRequestHandler):
+    """Не пишет строку в консоль на каждый запрос."""
+
+    def log_message(self, *args):
+        pass
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный тест: виртуальные пользователи в потоках и '
+            'процессах смотрят ленты, пишут посты и комментарии и ходят '
+            'в API локального сервера yatube.wsgi. Отчёт содержит '
+            'пропускную способность и p50/p95/p99 по именам URL. Данные '
+            'для теста создаёт generate_dataset.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20,
+                            help='Сколько виртуальных пользователей.')
+        parser.add_argument('--processes', type=int, default=1,
+                            help='Между сколькими процессами их '
+                                 'разделить.')
+        parser.add_argument('--duration', type=float, default=30,
+                            help='Длительность теста, секунды.')
+        parser.add_argument('--think', type=float, default=0,
+                            help='Средняя пауза между действиями, '
+                                 'секунды.')
+        parser.add_argument('--anonymous', type=float, default=0.2,
+                            help='Доля пользователей без входа.')
+        parser.add_argument('--password', default=DATASET_PASSWORD,
+                            help='Пароль пользователей userN.')
+        parser.add_argument('--url',
+                            help='Адрес уже запущенного сервера; без '
+                                 'него сервер запускается здесь же.')
+        parser.add_argument('--port', type=int, default=0)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output',
+                            help='Файл для отчёта в JSON.')
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['processes'] < 1:
+            raise CommandError('Нужен хотя бы один пользователь и процесс.')
+        sample = self.make_sample(options['seed'])
+        accounts = self.make_accounts(options['users'],
+                                      options['anonymous'])
+        server = None
+        base_url = options['url']
+        if base_url is None:
+            server = self.start_server(options['port'])
+            base_url = 'http://127.0.0.1:{}'.format(server.server_port)
+        try:
+            records, elapsed = self.run(base_url, sample, accounts, options)
+        finally:
+            if server is not None:
+                server.shutdown()
+                server.server_close()
+        report = loadtest.summarize(records, elapsed)
+        report['settings'] = {
+            key: options[key] for key in ('users', 'processes', 'duration',
+                                          'think', 'anonymous', 'seed')}
+        report['settings'].update({
+            'mix': loadtest.MIX,
+            'database': connection.vendor,
+            'debug': settings.DEBUG,
+        })
+        self.write_report(report)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as target:
+                json.dump(report, target, ensure_ascii=False, indent=2,
+                          sort_keys=True)
+                target.write('\n')
+
+    def make_sample(self, seed):
+        """Посты, группы, авторы и слова, к которым обращаются
+        пользователи: половина постов свежие, половина случайные."""
+        recent = list(Post.objects.order_by('-pub_date').values_list(
+            'pk', flat=True)[:SAMPLE_SIZE // 2])
+        if not recent:
+            raise CommandError('В базе нет постов: запустите '
+                               'generate_dataset.')
+        rnd = random.Random(seed)
+        last = Post.objects.order_by('-pk').values_list('pk', flat=True)[0]
+        others = Post.objects.filter(pk__in=[
+            rnd.randint(1, last) for _ in range(SAMPLE_SIZE // 2)])
+        words = set()
+        for text in Post.objects.filter(pk__in=recent[:50]).values_list(
+                'text', flat=True):
+            words.update(word.strip('.,!?').lower() for word in text.split()
+                         if len(word) > 3)
+        return {
+            'posts': recent + list(others.values_list('pk', flat=True)),
+            'groups': list(Group.objects.values_list(
+                'slug', flat=True)[:SAMPLE_SIZE]),
+            'authors': list(Post.objects.order_by('-pub_date').values_list(
+                'author__username', flat=True)[:SAMPLE_SIZE]),
+            'words': sorted(words)[:WORDS_SIZE] or ['пост'],
+        }
+
+    def make_accounts(self, total, anonymous):
+        """Пары (номер, имя пользователя или None для анонима)."""
+        signed_in = total - round(total * anonymous)
+        usernames = list(User.objects.filter(
+            username__regex=r'^user\d+$', is_active=True).order_by(
+            '?').values_list('username', flat=True)[:signed_in])
+        if len(usernames) < signed_in:
+            self.stderr.write(f'Пользователей userN: {len(usernames)}, '
+                              f'остальные будут анонимами.')
+        usernames += [None] * (total - len(usernames))
+        return list(enumerate(usernames))
+
+    def start_server(self, port):
+        """Многопоточный сервер разработки с приложением yatube.wsgi."""
+        from yatube.wsgi import application
+
+        server = ThreadedWSGIServer(('127.0.0.1', port), QuietHandler)
+        server.set_app(application)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+    def run(self, base_url, sample, accounts, options):
+        """Запускает пользователей и возвращает записи и время теста."""
+        processes = min(options['processes'], len(accounts))
+        started = time.time()
+        deadline = started + options['duration']
+        jobs = [(base_url, sample, accounts[number::processes],
+                 options['password'], options['seed'], deadline,
+                 options['think']) for number in range(processes)]
+        self.stdout.write(f'{len(accounts)} пользователей, {processes} '
+                          f'процесс(ов), {options["duration"]:g} с: '
+                          f'{base_url}')
+        if processes == 1:
+            records = loadtest.run_users(*jobs[0])
+        else:
+            # Соединение с базой не должно перейти в дочерние процессы.
+            connection.close()
+            with Pool(processes) as pool:
+                parts = pool.starmap(loadtest.run_users, jobs)
+            records = [record for part in parts for record in part]
+        return records, time.time() - started
+
+    def write_report(self, report):
+        self.stdout.write(
+            f'{"URL":<34}{"запросы":>9}{"в с":>9}{"p50":>9}{"p95":>9}'
+            f'{"p99":>9}{"ошибки":>8}')
+        for name, stats in report['urls'].items():
+            self.stdout.write(
+                f'{name:<34}{stats["requests"]:>9}'
+                f'{stats["throughput"]:>9.1f}{stats["p50"]:>9.1f}'
+                f'{stats["p95"]:>9.1f}{stats["p99"]:>9.1f}'
+                f'{stats["errors"]:>8}')
+        self.stdout.write(
+            f'Всего: {report["requests"]} запросов, '
+            f'{report["throughput"]:.1f} в секунду, ошибок: '
+            f'{report["errors"]}. Задержки в миллисекундах.')
@@ -0,0 +1,45 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import counters
+from posts.models import Group, Post
+
+User = get_user_model()
+
+
+def batches(queryset, size):
+    """Идёт по первичным ключам выборки пачками по size штук."""
+    last_pk = None
+    while True:
+        page = queryset.order_by('pk')
+        if last_pk is not None:
+            page = page.filter(pk__gt=last_pk)
+        pks = list(page.values_list('pk', flat=True)[:size])
+        if not pks:
+            return
+        yield pks
+        last_pk = pks[-1]
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает денормализованные счётчики постов, '
+            'комментариев и подписок и исправляет расхождения.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Сколько записей проверять за раз.')
+
+    def handle(self, *args, **options):
+        size = options['batch_size']
+        targets = (
+            ('пользователей', User.objects.all(), counters.reconcile_users),
+            ('групп', Group.objects.all(), counters.reconcile_groups),
+            ('постов', Post.objects.all(), counters.reconcile_posts),
+        )
+        for title, queryset, reconcile in targets:
+            fixed = 0
+            for pks in batches(queryset, size):
+                with transaction.atomic():
+                    fixed += reconcile(pks)
+            self.stdout.write(f'Исправлено счётчиков {title}: {fixed}')
@@ -0,0 +1,84 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from posts.caching import (bump_listing_versions, bump_posts_version,
+                           post_scopes)
+from posts.models import Post
+
+IMAGE = Post._meta.get_field('image')
+
+
+def rehome_name(storage, name, moved):
+    """Переносит файл под имя по содержимому и возвращает новое имя."""
+    if not name or storage.is_content_addressed(name):
+        return name
+    if name not in moved:
+        with storage.open(name) as content:
+            moved[name] = storage.save(name, content)
+    return moved[name]
+
+
+def rehome_post(pk):
+    """Переносит картинку поста и её варианты, старые файлы удаляет.
+
+    Возвращает число перенесённых файлов.
+    """
+    storage = IMAGE.storage
+    post = Post.objects.select_related('author', 'group').filter(
+        pk=pk).first()
+    if post is None:
+        return 0
+    moved = {}
+    image = rehome_name(storage, post.image.name, moved)
+    variants = json.loads(post.image_variants or '{}')
+    for items in variants.values():
+        for item in items:
+            item[1] = rehome_name(storage, item[1], moved)
+    if not moved:
+        return 0
+    updated = Post.objects.filter(
+        pk=pk, image=post.image.name, image_variants=post.image_variants,
+    ).update(image=image,
+             image_variants=json.dumps(variants) if variants else '')
+    if updated:
+        # Ленты и ETag со ссылками на старые файлы устаревают до того,
+        # как файлы удалены.
+        bump_listing_versions(post_scopes(post))
+        bump_posts_version()
+    # Если пост успели изменить, новые копии не нужны, а старые
+    # файлы ещё используются.
+    for old, new in moved.items():
+        storage.delete(old if updated else new)
+    return len(moved) if updated else 0
+
+
+def _rehome_in_thread(pk):
+    try:
+        return rehome_post(pk)
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = ('Переносит картинки постов в хранилище по содержимому: '
+            'файлы получают имена по хэшу, одинаковые хранятся один раз.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4,
+                            help='Сколько файлов переносить параллельно.')
+
+    def handle(self, *args, **options):
+        storage = IMAGE.storage
+        if not hasattr(storage, 'is_content_addressed'):
+            self.stderr.write('Хранилище картинок не адресуется '
+                              'по содержимому, переносить некуда.')
+            return
+        pks = list(Post.objects.exclude(image='').values_list(
+            'pk', flat=True))
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            moved = sum(pool.map(_rehome_in_thread, pks))
+        self.stdout.write(f'Перенесено файлов: {moved} '
+                          f'(постов с картинками: {len(pks)})')
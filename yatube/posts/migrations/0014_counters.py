@@ -0,0 +1,71 @@
+# Generated by Django 2.2.16 on 2026-10-18 16:45
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+def grouped_counts(queryset, field):
+    return dict(queryset.order_by().values_list(field).annotate(
+        total=Count('pk')))
+
+
+def fill_counters(apps, schema_editor):
+    Comment = apps.get_model('posts', 'Comment')
+    Follow = apps.get_model('posts', 'Follow')
+    Group = apps.get_model('posts', 'Group')
+    Post = apps.get_model('posts', 'Post')
+    UserStats = apps.get_model('posts', 'UserStats')
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+
+    for group_id, total in grouped_counts(Post.objects, 'group_id').items():
+        Group.objects.filter(pk=group_id).update(posts_count=total)
+    comments = grouped_counts(Comment.objects, 'post_id')
+    for post_id, total in comments.items():
+        Post.objects.filter(pk=post_id).update(comments_count=total)
+    posts = grouped_counts(Post.objects, 'author_id')
+    followers = grouped_counts(Follow.objects, 'following_id')
+    following = grouped_counts(Follow.objects, 'user_id')
+    UserStats.objects.bulk_create(
+        [UserStats(user_id=user_id,
+                   posts_count=posts.get(user_id, 0),
+                   followers_count=followers.get(user_id, 0),
+                   following_count=following.get(user_id, 0))
+         for user_id in User.objects.values_list('pk', flat=True)],
+        batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0013_post_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='пользователь')),
+                ('posts_count', models.IntegerField(default=0, verbose_name='постов')),
+                ('followers_count', models.IntegerField(default=0, verbose_name='подписчиков')),
+                ('following_count', models.IntegerField(default=0, verbose_name='подписок')),
+            ],
+            options={
+                'verbose_name': 'счётчики пользователя',
+                'verbose_name_plural': 'счётчики пользователей',
+            },
+        ),
+        migrations.AddField(
+            model_name='group',
+            name='posts_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='постов в группе'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='комментариев к посту'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 2.2.16 on 2026-10-18 17:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportCheckpoint',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=512, unique=True, verbose_name='файл и тип данных')),
+                ('offset', models.BigIntegerField(default=0, verbose_name='смещение в файле')),
+                ('line', models.PositiveIntegerField(default=0, verbose_name='строк прочитано')),
+                ('imported', models.PositiveIntegerField(default=0, verbose_name='записей загружено')),
+                ('updated', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'точка продолжения загрузки',
+                'verbose_name_plural': 'точки продолжения загрузки',
+            },
+        ),
+    ]
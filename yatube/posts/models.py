@@ -1,19 +1,56 @@
+import json
+
 from django.contrib.auth import get_user_model
 from django.db import models
 
 User = get_user_model()
 
 
+def saved_fields(instance, kwargs, managed):
+    """Аргументы save() существующей записи без колонок managed.
+
+    Счётчики и результаты фоновой обработки пишутся только через
+    update(). Обычное сохранение экземпляра, загруженного раньше, иначе
+    вернуло бы в них старые значения.
+    """
+    if (instance._state.adding or kwargs.get('force_insert')
+            or kwargs.get('update_fields') is not None):
+        return kwargs
+    return {**kwargs, 'update_fields': [
+        field.name for field in instance._meta.concrete_fields
+        if not field.primary_key and field.name not in managed]}
+
+
 class Group(models.Model):
     title = models.CharField(max_length=200, verbose_name='название')
     slug = models.SlugField(max_length=30,
                             unique=True,
                             verbose_name='идентификатор')
     description = models.TextField(verbose_name='описание')
+    posts_count = models.IntegerField(default=0,
+                                      editable=False,
+                                      verbose_name='постов в группе')
+
+    # Колонки, которые обычное сохранение группы не трогает.
+    MANAGED_FIELDS = ('posts_count',)
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **saved_fields(self, kwargs,
+                                           self.MANAGED_FIELDS))
+
+
+class PostQuerySet(models.QuerySet):
+    def cards(self):
+        """Посты для карточек ленты: автор и группа приходят тем же запросом.
+
+        Варианты картинок хранятся в самом посте, поэтому других
+        запросов карточкам не нужно.
+        """
+        return self.select_related('author', 'group')
+
 
 class Post(models.Model):
     text = models.TextField(verbose_name='текст поста',)
@@ -34,15 +71,71 @@ class Post(models.Model):
     image = models.ImageField('Картинка',
                               upload_to='posts/',
                               blank=True)
+    image_variants = models.TextField(
+        blank=True,
+        editable=False,
+        verbose_name='варианты картинки',
+        help_text='JSON: {mime: [[ширина, имя файла], ...]}')
+    image_hash = models.CharField(
+        max_length=16,
+        blank=True,
+        editable=False,
+        verbose_name='перцептивный хэш картинки')
+    comments_count = models.IntegerField(
+        default=0,
+        editable=False,
+        verbose_name='комментариев к посту')
+
+    objects = PostQuerySet.as_manager()
+
+    # Колонки счётчиков и фонового обработчика картинок: обычное
+    # сохранение поста их не трогает.
+    MANAGED_FIELDS = ('comments_count', 'image_variants', 'image_hash')
 
     def __str__(self):
         LEN = 15
         return self.text[::LEN]
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **saved_fields(self, kwargs,
+                                           self.MANAGED_FIELDS))
+
+    @property
+    def variants(self):
+        """Готовые варианты картинки по форматам."""
+        return json.loads(self.image_variants) if self.image_variants else {}
+
     class Meta:
         ordering = ['-pub_date']
         verbose_name = 'пост'
         verbose_name_plural = 'посты'
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='post_date_id_idx'),
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_date_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_date_idx'),
+        ]
+
+
+class UserStats(models.Model):
+    """Счётчики пользователя, которые обновляются вместе с данными."""
+    user = models.OneToOneField(User,
+                                on_delete=models.CASCADE,
+                                primary_key=True,
+                                related_name='stats',
+                                verbose_name='пользователь')
+    posts_count = models.IntegerField(default=0,
+                                      verbose_name='постов')
+    followers_count = models.IntegerField(default=0,
+                                          verbose_name='подписчиков')
+    following_count = models.IntegerField(default=0,
+                                          verbose_name='подписок')
+
+    class Meta:
+        verbose_name = 'счётчики пользователя'
+        verbose_name_plural = 'счётчики пользователей'
 
 
 class Comment(models.Model):
@@ -59,6 +152,12 @@ class Comment(models.Model):
                                    null=False,
                                    blank=False,)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['post', '-created', '-id'],
+                         name='comment_post_created_idx'),
+        ]
+
 
 class Follow(models.Model):
     user = models.ForeignKey(User,
@@ -75,3 +174,59 @@ class Follow(models.Model):
             models.UniqueConstraint(
                 fields=['user', 'following'],
                 name='unique_following')]
+        indexes = [
+            models.Index(fields=['user', '-id'], name='follow_user_id_idx'),
+        ]
+
+
+class TimelineEntry(models.Model):
+    """Запись материализованной ленты подписок пользователя."""
+    user = models.ForeignKey(User,
+                             on_delete=models.CASCADE,
+                             related_name='timeline',
+                             verbose_name='читатель')
+    post = models.ForeignKey(Post,
+                             on_delete=models.CASCADE,
+                             related_name='timeline_entries',
+                             verbose_name='пост')
+    author = models.ForeignKey(User,
+                               on_delete=models.CASCADE,
+                               related_name='+',
+                               verbose_name='автор поста')
+    pub_date = models.DateTimeField(verbose_name='дата публикации')
+
+    class Meta:
+        ordering = ['-pub_date']
+        verbose_name = 'запись ленты'
+        verbose_name_plural = 'записи ленты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_timeline_entry')]
+        indexes = [
+            models.Index(fields=['user', '-pub_date'],
+                         name='timeline_user_date_idx'),
+            models.Index(fields=['user', 'author'],
+                         name='timeline_user_author_idx'),
+        ]
+
+
+class ImportCheckpoint(models.Model):
+    """Докуда файл загружен командой import_yatube.
+
+    Сохраняется в одной транзакции с загруженной пачкой, поэтому после
+    прерывания загрузка продолжается ровно с первой незагруженной строки.
+    """
+    source = models.CharField(max_length=512, unique=True,
+                              verbose_name='файл и тип данных')
+    offset = models.BigIntegerField(default=0,
+                                    verbose_name='смещение в файле')
+    line = models.PositiveIntegerField(default=0,
+                                       verbose_name='строк прочитано')
+    imported = models.PositiveIntegerField(default=0,
+                                           verbose_name='записей загружено')
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'точка продолжения загрузки'
+        verbose_name_plural = 'точки продолжения загрузки'
@@ -0,0 +1,200 @@
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.db.models.signals import (post_delete, post_migrate, post_save,
+                                      pre_delete, pre_save)
+from django.dispatch import receiver
+
+from . import counters, search, timeline
+from .caching import (bump_comments_version, bump_groups_version,
+                      bump_listing_versions, bump_posts_version,
+                      bump_users_version, post_scopes)
+from .models import Comment, Follow, Group, Post
+from .thumbnails import queue_thumbnails, release_images
+
+User = get_user_model()
+
+# Поля, которые показываются в карточках постов закэшированных лент.
+GROUP_CARD_FIELDS = ('slug', 'title')
+USER_CARD_FIELDS = ('username', 'first_name', 'last_name')
+
+
+def previous_values(model, instance, fields, update_fields):
+    """Прежние значения полей из базы или None, если они не меняются."""
+    if instance.pk is None:
+        return None
+    if update_fields is not None and not set(update_fields) & set(fields):
+        return None
+    previous = model.objects.filter(pk=instance.pk).values_list(
+        *fields).first()
+    current = tuple(getattr(instance, field) for field in fields)
+    if previous is None or previous == current:
+        return None
+    return previous
+
+
+@receiver(pre_save, sender=Post)
+def post_changing(sender, instance, **kwargs):
+    """Запоминает прежние группу и картинку поста."""
+    instance._previous_group = None
+    instance._previous_image = None
+    instance._previous_variants = None
+    if instance.pk is not None:
+        previous = Post.objects.filter(pk=instance.pk).values_list(
+            'group_id', 'group__slug', 'image', 'image_variants').first()
+        if previous is not None:
+            instance._previous_group = previous[:2]
+            instance._previous_image, instance._previous_variants = (
+                previous[2:])
+    instance._image_replaced = (
+        instance.image.name != instance._previous_image)
+    if instance._image_replaced:
+        # Варианты и хэш старой картинки новой не подходят.
+        instance.image_variants = ''
+        instance.image_hash = ''
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    """Новый пост попадает в ленты подписчиков, кэш постов устаревает."""
+    scopes = post_scopes(instance)
+    previous = getattr(instance, '_previous_group', None)
+    if created:
+        timeline.fan_out([instance])
+        counters.posts_added([instance])
+    elif previous is not None:
+        previous_id, previous_slug = previous
+        counters.post_moved(previous_id, instance.group_id)
+        if previous_slug is not None:
+            scopes.append(f'group:{previous_slug}')
+    if getattr(instance, '_image_replaced', False):
+        if not created:
+            # Обычное сохранение не пишет эти колонки, см. Post.save().
+            Post.objects.filter(pk=instance.pk).update(image_variants='',
+                                                       image_hash='')
+        # Та же картинка, загруженная заново, получает то же имя, но
+        # хранилище уже учло ещё одну ссылку на неё.
+        release_images(instance.image.storage, instance._previous_image,
+                       instance._previous_variants)
+        if instance.image:
+            queue_thumbnails(instance)
+    bump_listing_versions(scopes)
+    bump_posts_version()
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    """Удаление поста делает устаревшим кэш постов и освобождает
+    его картинки."""
+    release_images(instance.image.storage, instance.image.name,
+                   instance.image_variants)
+    counters.posts_added([instance], sign=-1)
+    bump_listing_versions(post_scopes(instance))
+    bump_posts_version()
+
+
+def bump_commented_listings(post_id):
+    """Карточка поста в лентах показывает число комментариев."""
+    post = Post.objects.select_related('author', 'group').filter(
+        pk=post_id).first()
+    # Комментарии удаляются вместе с постом: ленты сбросит сам пост.
+    if post is not None:
+        bump_listing_versions(post_scopes(post))
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.comments_added([instance])
+        bump_commented_listings(instance.post_id)
+    bump_comments_version(instance.post_id)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.comments_added([instance], sign=-1)
+    bump_commented_listings(instance.post_id)
+    bump_comments_version(instance.post_id)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    """После подписки в ленту подтягиваются последние посты автора."""
+    if created:
+        timeline.backfill(instance.user_id, instance.following_id)
+        counters.follows_added([instance])
+        bump_posts_version()
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    """После отписки посты автора убираются из ленты."""
+    timeline.remove(instance.user_id, instance.following_id)
+    counters.follows_added([instance], sign=-1)
+    bump_posts_version()
+
+
+@receiver(pre_save, sender=Group)
+def group_changing(sender, instance, update_fields=None, **kwargs):
+    instance._previous_card = previous_values(
+        Group, instance, GROUP_CARD_FIELDS, update_fields)
+
+
+def group_scopes(group, slug):
+    """Ленты, в карточках которых есть ссылка на группу."""
+    usernames = Post.objects.filter(group=group).order_by().values_list(
+        'author__username', flat=True).distinct()
+    return (['index', f'group:{slug}']
+            + [f'profile:{username}' for username in usernames])
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, **kwargs):
+    """Группа устаревает в ответах API, ссылки на неё — в лентах."""
+    bump_groups_version()
+    previous = getattr(instance, '_previous_card', None)
+    if previous is not None:
+        bump_listing_versions(group_scopes(instance, previous[0])
+                              + [f'group:{instance.slug}'])
+
+
+@receiver(pre_delete, sender=Group)
+def group_deleting(sender, instance, **kwargs):
+    # После удаления посты уже не ссылаются на группу.
+    instance._scopes = group_scopes(instance, instance.slug)
+
+
+@receiver(post_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    """Посты группы остаются без неё: SET_NULL не шлёт сигналов."""
+    bump_groups_version()
+    bump_listing_versions(getattr(instance, '_scopes', ['index']))
+    bump_posts_version()
+
+
+@receiver(pre_save, sender=User)
+def user_changing(sender, instance, update_fields=None, **kwargs):
+    instance._previous_card = previous_values(
+        User, instance, USER_CARD_FIELDS, update_fields)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, **kwargs):
+    """Имя автора устаревает в лентах, ссылках на профиль и ответах
+    API."""
+    previous = getattr(instance, '_previous_card', None)
+    if previous is None:
+        return
+    slugs = Post.objects.filter(
+        author=instance, group__isnull=False).order_by().values_list(
+        'group__slug', flat=True).distinct()
+    bump_listing_versions(
+        ['index', f'profile:{previous[0]}', f'profile:{instance.username}']
+        + [f'group:{slug}' for slug in slugs])
+    bump_users_version()
+
+
+@receiver(post_migrate)
+def posts_migrated(sender, using, **kwargs):
+    """После миграций проверяет полнотекстовый индекс постов."""
+    if sender.name == 'posts':
+        search.install(connections[using])
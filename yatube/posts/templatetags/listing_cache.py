@@ -0,0 +1,109 @@
+import hashlib
+import re
+
+from django import template
+from django.core.cache import cache
+from django.utils.safestring import mark_safe
+
+from ..caching import listing_timeout, listing_version
+
+register = template.Library()
+
+HOLES = 'listing_holes'
+HOLE_MARKER = '<!--listing-hole:{}-->'
+HOLE_RE = re.compile(r'<!--listing-hole:(\d+)-->')
+
+
+def page_key(page):
+    """Ключ страницы ленты: номер страницы или позиция курсора."""
+    if getattr(page, 'is_cursor', False):
+        raw = f'cursor:{page.after}:{page.before}'
+    else:
+        raw = f'page:{page.number}'
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+class ListingCacheNode(template.Node):
+    """Кэширует общую для всех часть ленты.
+
+    Внутри фрагмента вместо {% hole %} сохраняется метка, а сам шаблон
+    дырки отрисовывается заново при каждом запросе с текущим контекстом.
+    """
+
+    def __init__(self, nodelist, scope, page):
+        self.nodelist = nodelist
+        self.scope = scope
+        self.page = page
+
+    def render(self, context):
+        scope = self.scope.resolve(context)
+        page = self.page.resolve(context)
+        key = 'listing-fragment:{}:{}:{}'.format(
+            scope, listing_version(scope), page_key(page))
+        cached = cache.get(key)
+        if cached is None:
+            holes = []
+            with context.push(**{HOLES: holes}):
+                content = self.nodelist.render(context)
+            cached = (content, holes)
+            cache.set(key, cached, listing_timeout())
+        content, holes = cached
+        return mark_safe(HOLE_RE.sub(
+            lambda match: render_hole(context, *holes[int(match.group(1))]),
+            content))
+
+
+class HoleNode(template.Node):
+    def __init__(self, template_name, extra_context):
+        self.template_name = template_name
+        self.extra_context = extra_context
+
+    def render(self, context):
+        template_name = self.template_name.resolve(context)
+        values = {
+            name: var.resolve(context)
+            for name, var in self.extra_context.items()
+        }
+        holes = context.get(HOLES)
+        if holes is None:
+            return render_hole(context, template_name, values)
+        holes.append((template_name, values))
+        return HOLE_MARKER.format(len(holes) - 1)
+
+
+def render_hole(context, template_name, values):
+    hole = context.template.engine.get_template(template_name)
+    with context.push(**values):
+        return hole.render(context)
+
+
+@register.tag
+def cachelisting(parser, token):
+    """{% cachelisting scope page_obj %} ... {% endcachelisting %}"""
+    bits = token.split_contents()
+    if len(bits) != 3:
+        raise template.TemplateSyntaxError(
+            f"'{bits[0]}' принимает название ленты и страницу")
+    nodelist = parser.parse(('endcachelisting',))
+    parser.delete_first_token()
+    return ListingCacheNode(nodelist,
+                            parser.compile_filter(bits[1]),
+                            parser.compile_filter(bits[2]))
+
+
+@register.tag
+def hole(parser, token):
+    """{% hole "шаблон.html" имя=значение ... %}
+
+    Фрагмент, который не попадает в кэш ленты и отрисовывается
+    для каждого пользователя отдельно.
+    """
+    bits = token.split_contents()
+    if len(bits) < 2:
+        raise template.TemplateSyntaxError(
+            f"'{bits[0]}' принимает имя шаблона")
+    extra_context = template.base.token_kwargs(bits[2:], parser)
+    if len(extra_context) != len(bits) - 2:
+        raise template.TemplateSyntaxError(
+            f"'{bits[0]}' принимает только аргументы вида имя=значение")
+    return HoleNode(parser.compile_filter(bits[1]), extra_context)
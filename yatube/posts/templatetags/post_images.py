@@ -0,0 +1,11 @@
+from django import template
+
+from .. import thumbnails
+
+register = template.Library()
+
+
+@register.inclusion_tag('includes/post_image.html')
+def post_picture(post):
+    """Картинка карточки поста с srcset или заглушка, пока её готовят."""
+    return {'post': post, 'picture': thumbnails.picture(post)}
@@ -0,0 +1,66 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+User = get_user_model()
+
+URL = '/api/v1/follow/'
+
+
+class CachedJWTAuthenticationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader',
+                                            password='secret-1')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    def test_cached_user_skips_query(self):
+        """Повторный запрос с тем же токеном не читает пользователя"""
+        with self.assertNumQueries(2):
+            self.client.get(URL)
+        with self.assertNumQueries(1):
+            response = self.client.get(URL)
+        self.assertEqual(response.status_code, 200)
+
+    def test_password_change_evicts(self):
+        """Смена пароля сбрасывает кэш пользователя"""
+        self.client.get(URL)
+        user = User.objects.get(pk=self.user.pk)
+        user.set_password('secret-2')
+        user.save()
+        with self.assertNumQueries(2):
+            response = self.client.get(URL)
+        self.assertEqual(response.status_code, 200)
+
+    def test_deactivation_evicts(self):
+        """Заблокированный пользователь больше не проходит проверку"""
+        self.client.get(URL)
+        user = User.objects.get(pk=self.user.pk)
+        user.is_active = False
+        user.save()
+        self.assertEqual(self.client.get(URL).status_code, 401)
+
+    def test_deleted_user(self):
+        """Удалённый пользователь больше не проходит проверку"""
+        self.client.get(URL)
+        User.objects.get(pk=self.user.pk).delete()
+        self.assertEqual(self.client.get(URL).status_code, 401)
+
+    def test_unrelated_save_keeps_cache(self):
+        """Вход и правка профиля не сбрасывают кэш"""
+        self.client.get(URL)
+        user = User.objects.get(pk=self.user.pk)
+        user.last_login = timezone.now()
+        user.save(update_fields=['last_login'])
+        user.first_name = 'Лев'
+        user.save()
+        with self.assertNumQueries(1):
+            self.client.get(URL)
@@ -0,0 +1,111 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils.http import http_date
+from rest_framework.test import APIClient
+
+from ..models import Comment, Group, Post
+
+User = get_user_model()
+
+# Момент правки в середине секунды.
+CHANGED_AT = 2000000000.25
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(text='post', author=cls.user)
+        Comment.objects.create(post=cls.post, author=cls.user, text='first')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.urls = (
+            '/api/v1/posts/',
+            f'/api/v1/posts/{self.post.pk}/',
+            f'/api/v1/posts/{self.post.pk}/comments/',
+        )
+
+    def test_not_modified_without_queries(self):
+        """Совпавший ETag даёт 304 без запросов к базе"""
+        for url in self.urls:
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                with self.assertNumQueries(0):
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response['ETag'], etag)
+
+    def test_if_modified_since(self):
+        """По Last-Modified тоже отдаётся 304, но не в секунду правки"""
+        url = '/api/v1/posts/'
+        with mock.patch('time.time', return_value=CHANGED_AT):
+            Post.objects.create(text='new', author=self.user)
+        with mock.patch('time.time', return_value=CHANGED_AT + 0.5):
+            response = self.client.get(url)
+            self.assertNotIn('Last-Modified', response)
+            response = self.client.get(
+                url, HTTP_IF_MODIFIED_SINCE=http_date(CHANGED_AT))
+            self.assertEqual(response.status_code, 200)
+        with mock.patch('time.time', return_value=CHANGED_AT + 1):
+            response = self.client.get(url)
+            self.assertEqual(response['Last-Modified'],
+                             http_date(CHANGED_AT))
+            response = self.client.get(
+                url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+            self.assertEqual(response.status_code, 304)
+            response = self.client.get(
+                url, HTTP_IF_NONE_MATCH='"stale"',
+                HTTP_IF_MODIFIED_SINCE=http_date(CHANGED_AT))
+            self.assertEqual(response.status_code, 200)
+
+    def test_changes_invalidate_etag(self):
+        """Правка поста и новый комментарий меняют ETag"""
+        etags = {url: self.client.get(url)['ETag'] for url in self.urls}
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'edited'
+        post.save()
+        for url in self.urls[:2]:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etags[url])
+            self.assertEqual(response.status_code, 200, url)
+        etags = {url: self.client.get(url)['ETag'] for url in self.urls}
+        Comment.objects.create(post=self.post, author=self.user,
+                               text='second')
+        for url in self.urls:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etags[url])
+            self.assertEqual(response.status_code, 200, url)
+
+    def test_username_change_invalidates_etag(self):
+        """Смена имени автора меняет ETag постов и комментариев"""
+        etags = {url: self.client.get(url)['ETag'] for url in self.urls}
+        user = User.objects.get(pk=self.user.pk)
+        user.username = 'renamed'
+        user.save()
+        for url in self.urls:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etags[url])
+            self.assertEqual(response.status_code, 200, url)
+            self.assertContains(response, '"author":"renamed"')
+
+    def test_expanded_group_change_invalidates_etag(self):
+        """С ?expand=group ETag меняется при правке группы"""
+        group = Group.objects.create(title='Старое', slug='group',
+                                     description='Описание')
+        Post.objects.filter(pk=self.post.pk).update(group=group)
+        url = f'/api/v1/posts/{self.post.pk}/?expand=group,author'
+        etag = self.client.get(url)['ETag']
+        group.title = 'Новое'
+        group.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '"title":"Новое"')
+
+    def test_query_string_is_part_of_etag(self):
+        """У разных страниц разные ETag"""
+        first = self.client.get('/api/v1/posts/?limit=1')['ETag']
+        second = self.client.get('/api/v1/posts/?limit=2')['ETag']
+        self.assertNotEqual(first, second)
@@ -0,0 +1,71 @@
+import json
+from datetime import datetime, timezone
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from ..models import Group, Post
+
+User = get_user_model()
+
+URL = '/api/v1/posts/export/'
+
+
+class ExportTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='partner')
+        group = Group.objects.create(title='Группа', slug='group',
+                                     description='Описание')
+        for number in range(5):
+            Post.objects.create(text=f'Пост {number}\nс переносом',
+                                author=cls.user,
+                                group=group if number % 2 else None)
+        Post.objects.filter(text__startswith='Пост 0').update(
+            pub_date=datetime(2020, 1, 1, tzinfo=timezone.utc))
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def export(self, url=URL, **headers):
+        response = self.client.get(url, **headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        content = b''.join(response.streaming_content).decode()
+        self.assertTrue(content.endswith('\n'))
+        return [json.loads(line) for line in content.splitlines()]
+
+    def test_requires_authentication(self):
+        """Выгрузка доступна только авторизованным клиентам"""
+        self.assertEqual(APIClient().get(URL).status_code, 401)
+
+    def test_lines_match_list(self):
+        """Строки выгрузки — посты в том же виде, что и в списке,
+        от старых к новым"""
+        posts = self.client.get('/api/v1/posts/').json()['results']
+        self.assertEqual(self.export(), posts[::-1])
+        self.assertEqual(
+            self.export(URL, HTTP_ACCEPT='application/x-ndjson'),
+            posts[::-1])
+
+    def test_single_query_in_chunks(self):
+        """Выгрузка идёт одним запросом и отдаётся по частям"""
+        with mock.patch('api.export.EXPORT_WRITE_ROWS', 2):
+            response = self.client.get(URL)
+            with self.assertNumQueries(1):
+                chunks = list(response.streaming_content)
+        self.assertEqual(len(chunks), 3)
+
+    def test_since(self):
+        """?since= оставляет посты начиная с момента"""
+        self.assertEqual(len(self.export(URL + '?since=2021-01-01')), 4)
+        lines = self.export(URL + '?since=2019-12-31T23:00:00Z&fields=id')
+        self.assertEqual(len(lines), 5)
+        self.assertEqual(set(lines[0]), {'id'})
+        response = self.client.get(URL + '?since=вчера')
+        self.assertEqual(response.status_code, 400)
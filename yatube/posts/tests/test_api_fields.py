@@ -0,0 +1,86 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from ..models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class SparseFieldsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='writer', first_name='Лев', last_name='Толстой')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        cls.post = Post.objects.create(
+            text='Текст поста', author=cls.user, group=cls.group)
+        Comment.objects.create(post=cls.post, author=cls.user, text='Ответ')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_results(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        sql = ' '.join(query['sql'] for query in queries.captured_queries)
+        return response.json()['results'], sql
+
+    def test_fields_limit_response_and_columns(self):
+        """?fields= оставляет только запрошенные поля и колонки"""
+        results, sql = self.get_results('/api/v1/posts/?fields=id,pub_date')
+        self.assertEqual(set(results[0]), {'id', 'pub_date'})
+        self.assertNotIn('"text"', sql)
+        self.assertNotIn('"image_variants"', sql)
+        self.assertNotIn('"auth_user"', sql)
+
+    def test_expand_author_and_group(self):
+        """?expand= раскрывает автора и группу без лишних запросов"""
+        with self.assertNumQueries(2):
+            # Пост и комментарии к нему.
+            self.client.get(f'/api/v1/posts/{self.post.pk}/comments/'
+                            '?expand=author')
+        results, sql = self.get_results(
+            '/api/v1/posts/?fields=id,author,group&expand=author,group')
+        self.assertEqual(results[0], {
+            'id': self.post.pk,
+            'author': {'id': self.user.pk, 'username': 'writer',
+                       'first_name': 'Лев', 'last_name': 'Толстой'},
+            'group': {'id': self.group.pk, 'title': 'Группа',
+                      'slug': 'group', 'description': 'Описание',
+                      'posts_count': 1},
+        })
+        self.assertNotIn('"text"', sql)
+        self.assertNotIn('"password"', sql)
+
+    def test_expand_without_fields(self):
+        """Без ?fields= раскрытое поле выводится вместе с остальными"""
+        results, _ = self.get_results('/api/v1/posts/?expand=group')
+        self.assertEqual(results[0]['text'], 'Текст поста')
+        self.assertEqual(results[0]['group']['slug'], 'group')
+        self.assertEqual(results[0]['author'], 'writer')
+
+    def test_comment_and_group_fields(self):
+        """?fields= работает для комментариев и групп"""
+        results, sql = self.get_results(
+            f'/api/v1/posts/{self.post.pk}/comments/?fields=text')
+        self.assertEqual(results, [{'text': 'Ответ'}])
+        self.assertNotIn('"auth_user"', sql)
+        results, _ = self.get_results('/api/v1/groups/?fields=slug')
+        self.assertEqual(results, [{'slug': 'group'}])
+
+    def test_fields_ignored_on_write(self):
+        """Параметры не влияют на создание поста"""
+        response = self.client.post(
+            '/api/v1/posts/?fields=id&expand=author',
+            {'text': 'Новый пост', 'group': self.group.pk})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['text'], 'Новый пост')
+        self.assertEqual(response.json()['author'], 'writer')
@@ -0,0 +1,89 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api.pagination import KeysetPagination
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ApiPaginationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader')
+        authors = [User.objects.create_user(username=f'author{i}')
+                   for i in range(5)]
+        for author in authors:
+            Follow.objects.create(user=cls.user, following=author)
+        for i in range(25):
+            Group.objects.create(title=f'group {i}', slug=f'group-{i}',
+                                 description='group')
+        cls.post = Post.objects.create(text='post', author=cls.user)
+        for i in range(24):
+            Post.objects.create(text=f'post {i}', author=authors[i % 5])
+        for i in range(7):
+            Comment.objects.create(post=cls.post, author=cls.user,
+                                   text=f'comment {i}')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def walk(self, url):
+        """Проходит все страницы по ссылкам next и собирает id."""
+        ids = []
+        pages = 0
+        while url:
+            data = self.client.get(url).json()
+            ids.extend(item['id'] for item in data['results'])
+            url = data['next']
+            pages += 1
+        return ids, pages
+
+    def test_posts_walk_through_all_pages(self):
+        """По ссылкам next проходятся все посты от новых к старым"""
+        ids, pages = self.walk('/api/v1/posts/?limit=10')
+        expected = list(Post.objects.order_by(
+            '-pub_date', '-id').values_list('pk', flat=True))
+        self.assertEqual(ids, expected)
+        self.assertEqual(pages, 3)
+
+    def test_previous_link(self):
+        """Ссылка previous возвращает на предыдущую страницу"""
+        first = self.client.get('/api/v1/posts/?limit=5').json()
+        second = self.client.get(first['next']).json()
+        self.assertIsNone(first['previous'])
+        back = self.client.get(second['previous']).json()
+        self.assertEqual(back['results'], first['results'])
+
+    def test_every_list_is_paginated(self):
+        """Группы, комментарии и подписки тоже отдаются страницами"""
+        cases = (
+            ('/api/v1/groups/', Group.objects.count()),
+            (f'/api/v1/posts/{self.post.pk}/comments/?limit=3', 7),
+            ('/api/v1/follow/?limit=2', 5),
+        )
+        for url, total in cases:
+            with self.subTest(url=url):
+                ids, pages = self.walk(url)
+                self.assertEqual(len(set(ids)), total)
+                self.assertGreater(pages, 1)
+
+    def test_limit_is_capped(self):
+        """Размер страницы не превышает max_limit"""
+        response = self.client.get('/api/v1/groups/?limit=100000')
+        self.assertEqual(len(response.json()['results']),
+                         min(KeysetPagination.max_limit,
+                             Group.objects.count()))
+
+    def test_invalid_cursor(self):
+        """Битый курсор даёт 404"""
+        response = self.client.get('/api/v1/posts/?after=broken')
+        self.assertEqual(response.status_code, 404)
+
+    def test_offset_fallback(self):
+        """Старые клиенты с offset получают прежний формат"""
+        data = self.client.get('/api/v1/posts/?limit=5&offset=5').json()
+        self.assertEqual(data['count'], Post.objects.count())
+        self.assertEqual(len(data['results']), 5)
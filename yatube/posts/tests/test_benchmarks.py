@@ -0,0 +1,328 @@
+"""Бюджеты производительности страниц и API.
+
+Каждое представление запускается несколько раз на заполненной базе с
+холодным кэшем. Число SQL-запросов, время в базе, время вне базы
+(представление и шаблоны) и p50/p95 общего времени сравниваются с
+бюджетами из benchmark_budgets.json.
+
+RowSerializationBenchmarkTest сравнивает сериализацию страниц постов
+через PostSerializer и через строки values_list() (api.rows), а
+BulkCreateBenchmarkTest — создание BULK_SIZE постов одним запросом к
+/api/v1/posts/bulk/ и BULK_SIZE запросами к /api/v1/posts/.
+
+Бюджеты числа запросов проверяются всегда. Время и ускорение зависят
+от загрузки машины и сравниваются с бюджетами, только если задана
+переменная окружения YATUBE_BENCH_TIMING.
+
+YATUBE_BENCH_SCALE увеличивает объём данных, YATUBE_BENCH_REPEATS —
+число прогонов, а YATUBE_BENCH_REPORT задаёт файл, куда записываются
+измеренные значения для обновления бюджетов.
+"""
+import json
+import math
+import os
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from api.rows import RowSerializer
+from api.serializers import PostSerializer
+from .. import counters, timeline
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+BUDGETS_PATH = os.path.join(os.path.dirname(__file__),
+                            'benchmark_budgets.json')
+SCALE = int(os.environ.get('YATUBE_BENCH_SCALE', 1))
+REPEATS = int(os.environ.get('YATUBE_BENCH_REPEATS', 5))
+REPORT_PATH = os.environ.get('YATUBE_BENCH_REPORT')
+CHECK_TIMING = bool(os.environ.get('YATUBE_BENCH_TIMING'))
+# Метрики, которые не зависят от скорости машины.
+QUERY_METRICS = ('queries', 'queries_ratio')
+
+USERS = 20 * SCALE
+GROUPS = 5
+POSTS = 500 * SCALE
+COMMENTS_PER_POST = 3
+FOLLOWED_AUTHORS = 10
+# Размеры страниц для сравнения сериализации и минимальное ускорение.
+ROW_PAGES = (100, 1000)
+ROWS_MIN_SPEEDUP = 1.5
+# Сколько постов создаётся пачкой и по одному и у скольких читателей
+# автора они попадают в ленту.
+BULK_SIZE = 50
+BULK_FOLLOWERS = 10
+
+
+class QueryTimer:
+    """Обёртка для connection.execute_wrapper, считающая запросы и время."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - start
+            self.count += 1
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(share * len(ordered)) - 1)]
+
+
+def checked_metrics(budget):
+    """Бюджеты, которые проверяются в этом прогоне."""
+    return {metric: limit for metric, limit in budget.items()
+            if CHECK_TIMING or metric in QUERY_METRICS}
+
+
+def write_report(results):
+    if REPORT_PATH:
+        with open(REPORT_PATH, 'w') as report:
+            json.dump(results, report, indent=2, sort_keys=True)
+
+
+class BenchmarkTest(TestCase):
+    results = {}
+
+    @classmethod
+    def setUpTestData(cls):
+        authors = [
+            User(username=f'bench_user_{i}') for i in range(USERS)
+        ]
+        User.objects.bulk_create(authors)
+        authors = list(User.objects.filter(username__startswith='bench_'))
+        Group.objects.bulk_create(
+            Group(title=f'bench group {i}', slug=f'bench-group-{i}',
+                  description='group for benchmarks')
+            for i in range(GROUPS))
+        groups = list(Group.objects.all())
+        Post.objects.bulk_create(
+            (Post(text=f'benchmark post {i} ' * 10,
+                  author=authors[i % len(authors)],
+                  group=groups[i % len(groups)])
+             for i in range(POSTS)),
+            batch_size=500)
+        Comment.objects.bulk_create(
+            (Comment(post_id=post_id, author=authors[i % len(authors)],
+                     text=f'benchmark comment {i}')
+             for post_id in Post.objects.values_list('pk', flat=True)
+             for i in range(COMMENTS_PER_POST)),
+            batch_size=500)
+        cls.reader = authors[0]
+        for author in authors[1:FOLLOWED_AUTHORS + 1]:
+            Follow.objects.create(user=cls.reader, following=author)
+        cls.author = authors[1]
+        cls.group = groups[0]
+        cls.post = Post.objects.filter(author=cls.author).first()
+        timeline.rebuild([cls.reader.pk])
+        counters.reconcile_users(User.objects.values_list('pk', flat=True))
+        counters.reconcile_groups([group.pk for group in groups])
+        counters.reconcile_posts(Post.objects.values_list('pk', flat=True))
+        with open(BUDGETS_PATH) as budgets:
+            cls.budgets = json.load(budgets)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        write_report(cls.results)
+
+    def setUp(self):
+        self.client.force_login(self.reader)
+        self.api_client = APIClient()
+        self.api_client.force_authenticate(self.reader)
+
+    def measure(self, client, url):
+        latencies, db_times, queries = [], [], []
+        for _ in range(REPEATS):
+            cache.clear()
+            timer = QueryTimer()
+            start = time.perf_counter()
+            with connection.execute_wrapper(timer):
+                response = client.get(url)
+            latencies.append(time.perf_counter() - start)
+            self.assertEqual(response.status_code, 200, url)
+            db_times.append(timer.seconds)
+            queries.append(timer.count)
+        return {
+            'queries': max(queries),
+            'db_ms': max(db_times) * 1000,
+            'render_ms': max(lat - db for lat, db
+                             in zip(latencies, db_times)) * 1000,
+            'p50_ms': percentile(latencies, 0.5) * 1000,
+            'p95_ms': percentile(latencies, 0.95) * 1000,
+        }
+
+    def check_budgets(self, client, pages):
+        for name, url in pages:
+            with self.subTest(view=name):
+                measured = self.measure(client, url)
+                self.results[name] = measured
+                for metric, limit in checked_metrics(
+                        self.budgets[name]).items():
+                    self.assertLessEqual(
+                        measured[metric], limit,
+                        f'{name}: {metric} вышел за бюджет ({measured})')
+
+    def test_pages_within_budget(self):
+        """Страницы сайта укладываются в бюджет запросов и времени"""
+        self.check_budgets(self.client, (
+            ('index', reverse('posts:main_page')),
+            ('index_deep', reverse('posts:main_page') + '?page=40'),
+            ('group_posts', reverse('posts:group_list',
+                                    args=[self.group.slug])),
+            ('profile', reverse('posts:profile',
+                                args=[self.author.username])),
+            ('post_detail', reverse('posts:post_detail',
+                                    args=[self.post.pk])),
+            ('follow_index', reverse('posts:follow_index')),
+        ))
+
+    def test_api_within_budget(self):
+        """Эндпоинты API укладываются в бюджет запросов и времени"""
+        self.check_budgets(self.api_client, (
+            ('api_posts', '/api/v1/posts/?limit=100'),
+            ('api_post_detail', f'/api/v1/posts/{self.post.pk}/'),
+            ('api_groups', '/api/v1/groups/'),
+            ('api_comments', f'/api/v1/posts/{self.post.pk}/comments/'),
+            ('api_follow', '/api/v1/follow/'),
+        ))
+
+
+class RowSerializationBenchmarkTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(username='rows_author')
+        group = Group.objects.create(title='rows', slug='rows',
+                                     description='rows')
+        Post.objects.bulk_create(
+            (Post(text=f'row post {i} ' * 10, author=author,
+                  group=group if i % 2 else None)
+             for i in range(max(ROW_PAGES) * SCALE)),
+            batch_size=500)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        write_report(BenchmarkTest.results)
+
+    def setUp(self):
+        request = Request(APIRequestFactory().get('/api/v1/posts/'))
+        self.context = {'request': request}
+        self.queryset = Post.objects.select_related('author').order_by(
+            '-pub_date', '-id')
+
+    def serialize(self, size):
+        posts = list(self.queryset[:size])
+        data = PostSerializer(posts, many=True, context=self.context).data
+        return JSONRenderer().render(data)
+
+    def serialize_rows(self, size):
+        rows = RowSerializer(PostSerializer(context=self.context))
+        data = rows.represent(list(rows.queryset(self.queryset)[:size]))
+        return JSONRenderer().render(data)
+
+    def timed(self, serialize, size):
+        latencies = []
+        for _ in range(REPEATS):
+            start = time.perf_counter()
+            content = serialize(size)
+            latencies.append(time.perf_counter() - start)
+        return content, percentile(latencies, 0.5)
+
+    def test_rows_faster_than_serializer(self):
+        """Строки values_list() сериализуются быстрее PostSerializer"""
+        for size in ROW_PAGES:
+            with self.subTest(size=size):
+                content, slow = self.timed(self.serialize, size)
+                row_content, fast = self.timed(self.serialize_rows, size)
+                self.assertEqual(row_content, content)
+                speedup = slow / fast
+                BenchmarkTest.results[f'api_rows_{size}'] = {
+                    'serializer_ms': slow * 1000,
+                    'rows_ms': fast * 1000,
+                    'speedup': speedup,
+                }
+                if CHECK_TIMING:
+                    self.assertGreaterEqual(
+                        speedup, ROWS_MIN_SPEEDUP,
+                        f'{size} строк: ускорение {speedup:.1f}x')
+
+
+@override_settings(RATELIMIT_RATES={})
+class BulkCreateBenchmarkTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='bulk_author')
+        cls.group = Group.objects.create(title='bulk', slug='bulk',
+                                         description='bulk')
+        for i in range(BULK_FOLLOWERS):
+            reader = User.objects.create_user(username=f'bulk_reader_{i}')
+            Follow.objects.create(user=reader, following=cls.author)
+        with open(BUDGETS_PATH) as budgets:
+            cls.budget = json.load(budgets)['api_bulk']
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        write_report(BenchmarkTest.results)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+        self.items = [{'text': f'bulk post {i}', 'group': self.group.pk}
+                      for i in range(BULK_SIZE)]
+
+    def create_bulk(self):
+        response = self.client.post('/api/v1/posts/bulk/', self.items,
+                                    format='json')
+        self.assertEqual(response.status_code, 201)
+
+    def create_one_by_one(self):
+        for item in self.items:
+            response = self.client.post('/api/v1/posts/', item,
+                                        format='json')
+            self.assertEqual(response.status_code, 201)
+
+    def timed(self, create):
+        latencies, queries = [], []
+        for _ in range(REPEATS):
+            timer = QueryTimer()
+            start = time.perf_counter()
+            with connection.execute_wrapper(timer):
+                create()
+            latencies.append(time.perf_counter() - start)
+            queries.append(timer.count)
+        return max(queries), percentile(latencies, 0.5)
+
+    def test_bulk_cheaper_than_single_creates(self):
+        """Пачка постов дешевле стольких же отдельных запросов"""
+        bulk_queries, bulk_time = self.timed(self.create_bulk)
+        single_queries, single_time = self.timed(self.create_one_by_one)
+        self.assertEqual(Post.objects.count(), 2 * REPEATS * BULK_SIZE)
+        measured = {
+            'queries': bulk_queries,
+            'single_queries': single_queries,
+            'queries_ratio': bulk_queries / single_queries,
+            'bulk_ms': bulk_time * 1000,
+            'single_ms': single_time * 1000,
+            'time_ratio': bulk_time / single_time,
+        }
+        BenchmarkTest.results[f'api_bulk_{BULK_SIZE}'] = measured
+        for metric, limit in checked_metrics(self.budget).items():
+            self.assertLessEqual(
+                measured[metric], limit,
+                f'api_bulk: {metric} вышел за бюджет ({measured})')
@@ -0,0 +1,77 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from ..models import Follow, Group, Post, TimelineEntry
+from ..search import search_posts
+
+User = get_user_model()
+
+BULK_URL = '/api/v1/posts/bulk/'
+
+
+class BulkCreateTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='group', slug='group',
+                                         description='group')
+        Follow.objects.create(user=cls.reader, following=cls.author)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def test_bulk_create(self):
+        """Посты создаются пачкой и попадают в ленты, счётчики и поиск"""
+        items = [{'text': f'bulk post {i}', 'group': self.group.pk}
+                 for i in range(5)]
+        response = self.client.post(BULK_URL, items, format='json')
+        self.assertEqual(response.status_code, 201)
+        ids = [result['data']['id'] for result in response.json()]
+        self.assertEqual(
+            list(Post.objects.filter(pk__in=ids).order_by('pk').values_list(
+                'text', flat=True)),
+            [item['text'] for item in items])
+        self.assertEqual(TimelineEntry.objects.filter(
+            user=self.reader, post_id__in=ids).count(), 5)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 5)
+        self.assertEqual(self.author.stats.posts_count, 5)
+        self.assertEqual(
+            search_posts(Post.objects.all(), 'bulk').count(), 5)
+
+    def test_per_item_errors(self):
+        """Ошибки отдельных постов не мешают создать остальные"""
+        items = [{'text': 'good'}, {'text': ''}, {'text': 'bad group',
+                                                  'group': 999}]
+        response = self.client.post(BULK_URL, items, format='json')
+        self.assertEqual(response.status_code, 207)
+        results = response.json()
+        self.assertEqual([result['status'] for result in results],
+                         [201, 400, 400])
+        self.assertIn('text', results[1]['errors'])
+        self.assertIn('group', results[2]['errors'])
+        self.assertEqual(Post.objects.count(), 1)
+
+    def test_not_a_list(self):
+        """Не список отклоняется целиком"""
+        response = self.client.post(BULK_URL, {'text': 'post'},
+                                    format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Post.objects.exists())
+
+    def test_queries_dont_depend_on_batch_size(self):
+        """Число запросов не растёт с числом постов в пачке"""
+        def queries(size):
+            items = [{'text': f'post {i}', 'group': self.group.pk}
+                     for i in range(size)]
+            with CaptureQueriesContext(connection) as captured:
+                response = self.client.post(BULK_URL, items, format='json')
+            self.assertEqual(response.status_code, 201)
+            return len(captured)
+
+        self.assertEqual(queries(2), queries(50))
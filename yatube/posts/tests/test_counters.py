@@ -0,0 +1,107 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='test group',
+                                         slug='test-group',
+                                         description='group for tests')
+        cls.other_group = Group.objects.create(title='other group',
+                                               slug='other-group',
+                                               description='group for tests')
+
+    def refresh(self, obj):
+        obj.refresh_from_db()
+        return obj
+
+    def test_post_counters(self):
+        """Счётчики постов автора и группы следуют за постами"""
+        post = Post.objects.create(text='post', author=self.author,
+                                   group=self.group)
+        self.assertEqual(UserStats.objects.get(user=self.author).posts_count,
+                         1)
+        self.assertEqual(self.refresh(self.group).posts_count, 1)
+        post.group = self.other_group
+        post.save()
+        self.assertEqual(self.refresh(self.group).posts_count, 0)
+        self.assertEqual(self.refresh(self.other_group).posts_count, 1)
+        post.delete()
+        self.assertEqual(UserStats.objects.get(user=self.author).posts_count,
+                         0)
+        self.assertEqual(self.refresh(self.other_group).posts_count, 0)
+
+    def test_comment_and_follow_counters(self):
+        """Счётчики комментариев и подписок следуют за данными"""
+        post = Post.objects.create(text='post', author=self.author)
+        Comment.objects.create(post=post, author=self.reader, text='text')
+        self.assertEqual(self.refresh(post).comments_count, 1)
+        Follow.objects.create(user=self.reader, following=self.author)
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).followers_count, 1)
+        self.assertEqual(
+            UserStats.objects.get(user=self.reader).following_count, 1)
+        Follow.objects.all().delete()
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).followers_count, 0)
+
+    def test_stale_save_keeps_counters(self):
+        """Сохранение старого экземпляра не затирает счётчики и
+        результаты обработки картинки"""
+        post = Post.objects.create(text='post', author=self.author,
+                                   group=self.group)
+        Comment.objects.create(post=post, author=self.reader, text='text')
+        Post.objects.filter(pk=post.pk).update(image_variants='{}',
+                                               image_hash='00ff')
+        Post.objects.create(text='second', author=self.author,
+                            group=self.group)
+        group = Group.objects.get(pk=self.group.pk)
+        Post.objects.create(text='third', author=self.author,
+                            group=self.group)
+        post.text = 'edited'
+        post.save()
+        group.title = 'renamed'
+        group.save()
+        post.refresh_from_db()
+        self.assertEqual(post.text, 'edited')
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(post.image_variants, '{}')
+        self.assertEqual(post.image_hash, '00ff')
+        self.assertEqual(self.refresh(group).posts_count, 3)
+
+    def test_reconcile_counters(self):
+        """Команда исправляет разошедшиеся счётчики"""
+        post = Post.objects.create(text='post', author=self.author,
+                                   group=self.group)
+        UserStats.objects.filter(user=self.author).update(posts_count=7)
+        Group.objects.filter(pk=self.group.pk).update(posts_count=7)
+        Post.objects.filter(pk=post.pk).update(comments_count=7)
+        call_command('reconcile_counters', batch_size=1, stdout=StringIO())
+        self.assertEqual(UserStats.objects.get(user=self.author).posts_count,
+                         1)
+        self.assertEqual(self.refresh(self.group).posts_count, 1)
+        self.assertEqual(self.refresh(post).comments_count, 0)
+
+    def test_reconcile_resets_cached_listing(self):
+        """После исправления лента показывает верное число комментариев"""
+        cache.clear()
+        post = Post.objects.create(text='post', author=self.author)
+        Post.objects.filter(pk=post.pk).update(comments_count=7)
+        response = self.client.get(reverse('posts:main_page'))
+        self.assertContains(response, 'Комментариев: 7')
+        call_command('reconcile_counters', stdout=StringIO())
+        response = self.client.get(reverse('posts:main_page'))
+        self.assertContains(response, 'Комментариев: 0')
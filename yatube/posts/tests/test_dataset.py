@@ -0,0 +1,130 @@
+import shutil
+import tempfile
+from collections import Counter
+from datetime import datetime, timezone
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db.models import F
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.models import StoredFile
+from posts import timeline
+from posts.management.commands.generate_dataset import DATASET_PASSWORD
+from ..models import Comment, Follow, Group, Post, TimelineEntry, UserStats
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class GenerateDatasetTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def generate(self, **options):
+        options = {'users': 30, 'posts': 200, 'comments': 300,
+                   'follows': 100, 'groups': 3, 'workers': 0,
+                   'batch_size': 70, 'seed': 7, **options}
+        call_command('generate_dataset', stdout=StringIO(), **options)
+
+    def snapshot(self):
+        return (
+            list(User.objects.order_by('pk').values_list(
+                'username', 'first_name')),
+            list(Post.objects.order_by('pk').values_list(
+                'author_id', 'group__slug', 'text')),
+            sorted(Comment.objects.values_list('post_id', 'author_id',
+                                               'text')),
+            sorted(Follow.objects.values_list('user_id', 'following_id')),
+        )
+
+    def test_generates_consistent_data(self):
+        """Набор данных заполнен, счётчики и ленты сходятся"""
+        self.generate()
+        self.assertEqual(User.objects.count(), 30)
+        self.assertEqual(Post.objects.count(), 200)
+        self.assertEqual(Comment.objects.count(), 300)
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertTrue(Follow.objects.exists())
+        self.assertFalse(Follow.objects.filter(
+            user_id=F('following_id')).exists())
+        user = User.objects.order_by('pk').first()
+        self.assertTrue(user.check_password(DATASET_PASSWORD))
+        dates = Post.objects.dates('pub_date', 'day')
+        self.assertGreater(len(dates), 100)
+        for stats in UserStats.objects.all():
+            self.assertEqual(stats.posts_count,
+                             Post.objects.filter(author=stats.user).count())
+            self.assertEqual(stats.followers_count, Follow.objects.filter(
+                following=stats.user).count())
+        for post in Post.objects.all():
+            self.assertEqual(post.comments_count, post.comment.count())
+
+    def test_authors_follow_power_law(self):
+        """Немногие авторы пишут большую часть постов"""
+        self.generate(users=100, posts=2000, comments=0, follows=0)
+        counts = sorted(Counter(Post.objects.values_list(
+            'author_id', flat=True)).values(), reverse=True)
+        self.assertGreater(sum(counts[:10]), 2000 / 2)
+
+    def test_timelines_match_backfill(self):
+        """Ленты из одного запроса совпадают с построенными по подпискам"""
+        self.generate()
+        built = sorted(TimelineEntry.objects.values_list('user_id',
+                                                         'post_id'))
+        self.assertTrue(built)
+        TimelineEntry.objects.all().delete()
+        for user_id, author_id in Follow.objects.values_list(
+                'user_id', 'following_id'):
+            timeline.backfill(user_id, author_id)
+        self.assertEqual(built, sorted(TimelineEntry.objects.values_list(
+            'user_id', 'post_id')))
+
+    def test_same_seed_same_data(self):
+        """С тем же зерном данные не зависят от числа процессов"""
+        self.generate()
+        inline = self.snapshot()
+        for model in (Comment, Follow, Post, User, Group):
+            model.objects.all().delete()
+        self.generate(workers=2)
+        self.assertEqual(inline, self.snapshot())
+
+    def test_resets_listings_without_clearing_cache(self):
+        """Новые посты видны в закэшированной ленте, чужие ключи кэша
+        остаются"""
+        cache.clear()
+        author = User.objects.create_user(username='author')
+        post = Post.objects.create(text='Старый пост', author=author)
+        Post.objects.filter(pk=post.pk).update(
+            pub_date=datetime(2000, 1, 1, tzinfo=timezone.utc))
+        self.client.get(reverse('posts:main_page'))
+        cache.set('ratelimit:comment:user:1', 1)
+        self.generate()
+        response = self.client.get(reverse('posts:main_page'))
+        newest = response.context['page_obj'][0]
+        self.assertNotEqual(newest, post)
+        self.assertContains(
+            response, reverse('posts:profile', args=[newest.author]))
+        self.assertEqual(cache.get('ratelimit:comment:user:1'), 1)
+
+    def test_unused_images_are_deleted(self):
+        """Картинки без постов не остаются в хранилище"""
+        self.generate(users=5, posts=2, comments=0, follows=0, images=5,
+                      image_share=1)
+        used = set(Post.objects.exclude(image='').values_list(
+            'image', flat=True))
+        self.assertTrue(used)
+        self.assertFalse(StoredFile.objects.filter(references__lte=0))
+        self.assertEqual(set(StoredFile.objects.values_list(
+            'name', flat=True)), used)
+        for name in used:
+            self.assertTrue(default_storage.exists(name))
@@ -0,0 +1,118 @@
+import os
+import random
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image, ImageDraw
+
+from .. import duplicates, thumbnails
+from ..models import Post
+
+User = get_user_model()
+
+TEMP_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def make_image(name, seed, noise=0):
+    """PNG с узором из прямоугольников; noise меняет немного пикселей."""
+    generator = random.Random(seed)
+    image = Image.new('RGB', (120, 90), 'white')
+    draw = ImageDraw.Draw(image)
+    for _ in range(12):
+        x, y = generator.randrange(120), generator.randrange(90)
+        draw.rectangle((x, y, x + 30, y + 20),
+                       fill=tuple(generator.randrange(256) for _ in 'rgb'))
+    for _ in range(noise):
+        image.putpixel((generator.randrange(120), generator.randrange(90)),
+                       (0, 0, 0))
+    content = BytesIO()
+    image.save(content, 'PNG')
+    return SimpleUploadedFile(name, content.getvalue(), 'image/png')
+
+
+@override_settings(MEDIA_ROOT=os.path.join(TEMP_DIR, 'media'),
+                   POSTS_IMAGE_INDEX=os.path.join(TEMP_DIR, 'index.pickle'))
+class DuplicatesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+    def setUp(self):
+        duplicates._indexes.clear()
+        for name in ('index.pickle', 'index.pickle.log'):
+            path = os.path.join(TEMP_DIR, name)
+            if os.path.exists(path):
+                os.remove(path)
+
+    def create_post(self, image):
+        with mock.patch('posts.signals.queue_thumbnails'):
+            post = Post.objects.create(text='post', author=self.author,
+                                       image=image)
+        thumbnails.generate_thumbnails(post.pk)
+        post.refresh_from_db()
+        return post
+
+    def test_bk_tree_matches_brute_force(self):
+        """Поиск по BK-дереву находит то же, что полный перебор"""
+        generator = random.Random(1)
+        values = [generator.getrandbits(64) for _ in range(500)]
+        tree = duplicates.BKTree()
+        for key, value in enumerate(values):
+            tree.add(value, key)
+        target = values[0] ^ 0b1011
+        expected = sorted(
+            (duplicates.distance(target, value), key)
+            for key, value in enumerate(values)
+            if duplicates.distance(target, value) <= 12)
+        self.assertEqual(tree.search(target, 12), expected)
+
+    def test_similar_images_are_found(self):
+        """Слегка изменённая картинка находится, другая — нет"""
+        original = self.create_post(make_image('a.png', seed=1))
+        edited = self.create_post(make_image('b.png', seed=1, noise=5))
+        other = self.create_post(make_image('c.png', seed=2))
+        similar = duplicates.similar_posts(original)
+        self.assertIn(edited.pk, similar)
+        self.assertNotIn(other.pk, similar)
+
+    def test_index_is_persisted(self):
+        """Индекс восстанавливается с диска в новом процессе"""
+        original = self.create_post(make_image('a.png', seed=1))
+        copy = self.create_post(make_image('b.png', seed=1, noise=3))
+        duplicates.rebuild_index()
+        extra = self.create_post(make_image('c.png', seed=1, noise=4))
+        duplicates._indexes.clear()
+        self.assertEqual(
+            set(duplicates.similar_posts(original)), {copy.pk, extra.pk})
+        self.assertEqual(
+            duplicates.duplicate_groups([(original.pk,
+                                          original.image_hash)]),
+            [sorted([original.pk, copy.pk, extra.pk])])
+
+    def test_admin_action(self):
+        """Действие в админке показывает посты с похожими картинками"""
+        original = self.create_post(make_image('a.png', seed=1))
+        copy = self.create_post(make_image('b.png', seed=1, noise=5))
+        self.client.force_login(self.author)
+        response = self.client.post(
+            reverse('admin:posts_post_changelist'),
+            {'action': 'find_similar_images',
+             '_selected_action': [original.pk]})
+        self.assertRedirects(
+            response, reverse('admin:posts_post_changelist')
+            + f'?pk__in={original.pk},{copy.pk}',
+            fetch_redirect_response=False)
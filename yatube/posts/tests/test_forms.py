@@ -65,7 +65,9 @@ class PostFormTests (TestCase):
         self.assertEqual(post.text, form['text'])
         self.assertEqual(post.author, self.user)
         self.assertEqual(post.group.id, form['group'])
-        self.assertIn(form['image'].name, post.image.name)
+        self.assertTrue(post.image.name.startswith('posts/'))
+        with post.image.open('rb') as image:
+            self.assertEqual(image.read(), self.simple_image)
 
     def test_create_post(self):
         """Проверяем, что можно создать пост"""
@@ -79,7 +81,6 @@ class PostFormTests (TestCase):
         self.assertRedirects(response, self.link_create_redirect)
         self.assertEqual(Post.objects.count(), post_count + 1)
         self.check_fields(created_post, form_data)
-        self.assertIn(self.image.name, created_post.image.name)
 
     def test_edit_post(self):
         """Проверяем, что можно отредактировать пост"""
@@ -0,0 +1,133 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from posts.management.commands.import_yatube import Command
+from ..models import Follow, Group, Post, TimelineEntry, UserStats
+
+User = get_user_model()
+
+
+class ImportTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        Follow.objects.create(user=cls.reader, following=cls.author)
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as target:
+            target.write(content)
+        return path
+
+    def jsonl(self, name, rows):
+        return self.write(name, ''.join(
+            (row if isinstance(row, str) else json.dumps(row)) + '\n'
+            for row in rows))
+
+    def run_import(self, *args):
+        stdout, stderr = StringIO(), StringIO()
+        call_command('import_yatube', *args, stdout=stdout, stderr=stderr)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_posts(self):
+        """Посты загружаются с датами, ключами, лентами и счётчиками"""
+        path = self.jsonl('posts.jsonl', [
+            {'id': 500, 'author': 'author', 'group': 'group',
+             'text': 'Старый пост', 'pub_date': '2020-05-01T10:00:00Z'},
+            {'author': 'author', 'text': 'Новый пост'},
+            {'author': 'nobody', 'text': 'Чужой пост'},
+            {'author': 'author', 'text': ''},
+            'не json',
+        ])
+        stdout, stderr = self.run_import('posts', path, '--batch-size=1')
+        old = Post.objects.get(pk=500)
+        self.assertEqual(old.group, self.group)
+        self.assertEqual(old.pub_date.year, 2020)
+        self.assertTrue(Post.objects.filter(text='Новый пост').exists())
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(TimelineEntry.objects.filter(
+            user=self.reader).count(), 2)
+        self.assertEqual(UserStats.objects.get(pk=self.author.pk).posts_count,
+                         2)
+        self.assertEqual(Group.objects.get(pk=self.group.pk).posts_count, 1)
+        self.assertIn('Загружено (posts): 2, пропущено строк: 3', stdout)
+        self.assertIn('строк/с', stdout)
+        self.assertEqual(len(stderr.splitlines()), 3)
+
+    def test_comments_csv(self):
+        """Комментарии загружаются из CSV и учитываются в счётчиках"""
+        post = Post.objects.create(text='Пост', author=self.author)
+        path = self.write(
+            'comments.csv',
+            '\ufeffpost,author,text,created\n'
+            f'{post.pk},reader,"Первый,\nв две строки",2021-01-01 12:00\n'
+            f'{post.pk},author,Второй,\n'
+            f'{post.pk + 1},author,К чужому посту,\n')
+        stdout, _ = self.run_import('comments', path)
+        self.assertEqual(
+            list(post.comment.order_by('created').values_list(
+                'text', flat=True)),
+            ['Первый,\nв две строки', 'Второй'])
+        self.assertEqual(Post.objects.get(pk=post.pk).comments_count, 2)
+        self.assertIn('пропущено строк: 1', stdout)
+
+    def test_follows(self):
+        """Подписки без дублей, с новыми пользователями и лентами"""
+        Post.objects.create(text='Пост', author=self.reader)
+        path = self.jsonl('follows.jsonl', [
+            {'user': 'reader', 'following': 'author'},
+            {'user': 'newcomer', 'following': 'reader'},
+            {'user': 'newcomer', 'following': 'reader'},
+            {'user': 'author', 'following': 'author'},
+        ])
+        self.run_import('follows', path, '--create-users')
+        newcomer = User.objects.get(username='newcomer')
+        self.assertFalse(newcomer.has_usable_password())
+        self.assertEqual(Follow.objects.count(), 2)
+        self.assertEqual(
+            UserStats.objects.get(pk=self.reader.pk).followers_count, 1)
+        self.assertEqual(TimelineEntry.objects.filter(
+            user=newcomer).count(), 1)
+
+    def test_resume(self):
+        """Прерванная загрузка продолжается без повторов"""
+        path = self.jsonl('posts.jsonl', [
+            {'author': 'author', 'text': f'Пост {number}'}
+            for number in range(5)])
+        write_posts = Command.write_posts
+        calls = []
+
+        def interrupted(command, batch):
+            calls.append(batch)
+            if len(calls) == 2:
+                raise KeyboardInterrupt
+            return write_posts(command, batch)
+
+        with mock.patch.object(Command, 'write_posts', interrupted):
+            with self.assertRaises(KeyboardInterrupt):
+                self.run_import('posts', path, '--batch-size=2')
+        self.assertEqual(Post.objects.count(), 2)
+        stdout, _ = self.run_import('posts', path, '--batch-size=2')
+        self.assertIn('Продолжение со строки 3', stdout)
+        self.assertEqual(
+            sorted(Post.objects.values_list('text', flat=True)),
+            [f'Пост {number}' for number in range(5)])
+        self.run_import('posts', path)
+        self.assertEqual(Post.objects.count(), 5)
+        self.run_import('posts', path, '--restart')
+        self.assertEqual(Post.objects.count(), 10)
@@ -0,0 +1,72 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import LiveServerTestCase, SimpleTestCase
+
+from posts import loadtest
+from posts.management.commands.generate_dataset import DATASET_PASSWORD
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+class PercentileTest(SimpleTestCase):
+    def test_nearest_rank(self):
+        """Перцентиль — значение ближайшего ранга"""
+        values = list(range(1, 101))
+        self.assertEqual(loadtest.percentile(values, 50), 50)
+        self.assertEqual(loadtest.percentile(values, 99), 99)
+        self.assertEqual(loadtest.percentile([7], 95), 7)
+
+    def test_summary(self):
+        """Отчёт считает запросы, ошибки и задержки в миллисекундах"""
+        records = [('GET posts:main_page', 200, 0.01),
+                   ('GET posts:main_page', 500, 0.03),
+                   ('POST posts:add_comment', 0, 1.0)]
+        report = loadtest.summarize(records, elapsed=2)
+        self.assertEqual(report['requests'], 3)
+        self.assertEqual(report['errors'], 2)
+        main_page = report['urls']['GET posts:main_page']
+        self.assertEqual(main_page['throughput'], 1)
+        self.assertEqual(main_page['p50'], 10)
+        self.assertEqual(main_page['p99'], 30)
+        self.assertEqual(main_page['statuses'], {'200': 1, '500': 1})
+
+
+class LoadTestCommandTest(LiveServerTestCase):
+    def setUp(self):
+        group = Group.objects.create(title='Группа', slug='group',
+                                     description='Описание')
+        for number in range(1, 4):
+            user = User.objects.create_user(username=f'user{number}',
+                                            password=DATASET_PASSWORD)
+            Post.objects.create(text=f'Первый пост автора {number}',
+                                author=user, group=group)
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.output = os.path.join(directory, 'report.json')
+
+    def test_report(self):
+        """Виртуальные пользователи входят, читают и пишут без ошибок"""
+        stdout = StringIO()
+        # Потоки живого сервера делят одно соединение с базой в памяти,
+        # поэтому параллельные пользователи здесь давали бы случайные 500.
+        call_command('loadtest', url=self.live_server_url, users=1,
+                     anonymous=0, duration=1.5, output=self.output,
+                     stdout=stdout)
+        with open(self.output, encoding='utf-8') as source:
+            report = json.load(source)
+        self.assertGreater(report['requests'], 0)
+        self.assertEqual(report['errors'], 0)
+        self.assertEqual(report['settings']['users'], 1)
+        self.assertEqual(report['urls']['POST users:login']['statuses'],
+                         {'302': 1})
+        for stats in report['urls'].values():
+            self.assertLessEqual(stats['p50'], stats['p95'])
+            self.assertLessEqual(stats['p95'], stats['p99'])
+        self.assertIn('GET posts:main_page', stdout.getvalue())
@@ -0,0 +1,102 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+CONTENT = bytes(range(256)) * 4
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class MediaServingTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        with override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT):
+            cls.name = default_storage.save('posts/file.jpg',
+                                            ContentFile(CONTENT))
+        cls.url = settings.MEDIA_URL + cls.name
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def body(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_full_file(self):
+        """Файл отдаётся целиком с заголовками кэширования"""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), CONTENT)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('immutable', response['Cache-Control'])
+
+    def test_ranges(self):
+        """Запрос Range получает нужный кусок файла"""
+        cases = (
+            ('bytes=0-9', 0, 9),
+            ('bytes=1000-', 1000, 1023),
+            ('bytes=-24', 1000, 1023),
+            ('bytes=1020-5000', 1020, 1023),
+        )
+        for header, first, last in cases:
+            with self.subTest(header=header):
+                response = self.client.get(self.url, HTTP_RANGE=header)
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(self.body(response),
+                                 CONTENT[first:last + 1])
+                self.assertEqual(response['Content-Range'],
+                                 f'bytes {first}-{last}/{len(CONTENT)}')
+                self.assertEqual(int(response['Content-Length']),
+                                 last - first + 1)
+
+    def test_unsatisfiable_range(self):
+        """Диапазон за концом файла даёт 416"""
+        response = self.client.get(self.url, HTTP_RANGE='bytes=5000-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(CONTENT)}')
+
+    def test_conditional_requests(self):
+        """По ETag, в том числе слабому, и If-Modified-Since отдаётся 304,
+        старый If-Range даёт весь файл"""
+        response = self.client.get(self.url)
+        etag, modified = response['ETag'], response['Last-Modified']
+        self.assertEqual(
+            self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code,
+            304)
+        self.assertEqual(
+            self.client.get(self.url,
+                            HTTP_IF_MODIFIED_SINCE=modified).status_code,
+            304)
+        for if_none_match in (f'"stale", W/{etag}', '*'):
+            with self.subTest(if_none_match=if_none_match):
+                response = self.client.get(
+                    self.url, HTTP_IF_NONE_MATCH=if_none_match)
+                self.assertEqual(response.status_code, 304)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH='"stale"',
+                                   HTTP_IF_MODIFIED_SINCE=modified)
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9',
+                                   HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_missing_and_outside_files(self):
+        """Несуществующие файлы и пути вне MEDIA_ROOT дают 404"""
+        for path in ('posts/missing.jpg', '../manage.py', 'posts'):
+            with self.subTest(path=path):
+                response = self.client.get(settings.MEDIA_URL + path)
+                self.assertEqual(response.status_code, 404)
+
+    def test_accel_redirect(self):
+        """В режиме x-accel файл отдаёт веб-сервер"""
+        with self.settings(MEDIA_SENDFILE='x-accel'):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Accel-Redirect'],
+                         settings.MEDIA_ACCEL_PREFIX + self.name)
+        self.assertEqual(response.content, b'')
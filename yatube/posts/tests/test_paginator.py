@@ -0,0 +1,47 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+
+from ..models import Post
+from ..utils import PostPaginator
+
+User = get_user_model()
+
+
+class PostPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+        for i in range(3):
+            Post.objects.create(text=f'test post {i}', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_count_is_cached(self):
+        """Количество постов считается один раз до изменения постов"""
+        with self.assertNumQueries(1):
+            self.assertEqual(PostPaginator(Post.objects.all(), 10).count, 3)
+        with self.assertNumQueries(0):
+            self.assertEqual(PostPaginator(Post.objects.all(), 10).count, 3)
+
+    def test_count_invalidated_on_write(self):
+        """Новый пост сбрасывает закэшированное количество"""
+        PostPaginator(Post.objects.all(), 10).count
+        Post.objects.create(text='new post', author=self.user)
+        self.assertEqual(PostPaginator(Post.objects.all(), 10).count, 4)
+
+    def test_elided_page_range(self):
+        """Окно страниц содержит края и соседей текущей страницы"""
+        paginator = PostPaginator(list(range(1000)), 10)
+        ellipsis = paginator.ELLIPSIS
+        self.assertEqual(
+            list(paginator.get_elided_page_range(50)),
+            [1, ellipsis, 48, 49, 50, 51, 52, ellipsis, 100])
+        self.assertEqual(
+            list(paginator.get_elided_page_range(1)),
+            [1, 2, 3, ellipsis, 100])
+        self.assertEqual(
+            list(PostPaginator(list(range(50)), 10).get_elided_page_range(3)),
+            [1, 2, 3, 4, 5])
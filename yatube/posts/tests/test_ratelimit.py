@@ -0,0 +1,78 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core.ratelimit import check_shared_cache, hit, parse_rate
+from ..models import Comment, Post
+
+User = get_user_model()
+
+
+@override_settings(RATELIMIT_RATES={'api-write': '2/m', 'comment': '1/m'})
+class RateLimitTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='bot')
+        cls.other = User.objects.create_user(username='human')
+        cls.post = Post.objects.create(text='Пост', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+
+    def test_token_bucket(self):
+        """Корзина пропускает rate запросов и снова наполняется"""
+        self.assertEqual(parse_rate('10/m'), (10, 60))
+        self.assertEqual(parse_rate('3/hour'), (3, 3600))
+        with mock.patch('core.ratelimit.time.time', return_value=1000.0):
+            self.assertEqual(hit('api-write', 'a'), 0)
+            self.assertEqual(hit('api-write', 'a'), 0)
+            self.assertAlmostEqual(hit('api-write', 'a'), 30)
+            self.assertEqual(hit('api-write', 'b'), 0)
+            self.assertEqual(hit('unlimited', 'a'), 0)
+        with mock.patch('core.ratelimit.time.time', return_value=1030.0):
+            self.assertEqual(hit('api-write', 'a'), 0)
+            self.assertGreater(hit('api-write', 'a'), 0)
+
+    def test_api_write_throttled(self):
+        """Лишняя запись через API получает 429 без запросов к базе"""
+        for _ in range(2):
+            response = self.api.post('/api/v1/posts/', {'text': 'спам'})
+            self.assertEqual(response.status_code, 201)
+        with self.assertNumQueries(0):
+            response = self.api.post('/api/v1/posts/', {'text': 'спам'})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '30')
+        self.assertEqual(self.api.get('/api/v1/posts/').status_code, 200)
+        other = APIClient()
+        other.force_authenticate(self.other)
+        response = other.post('/api/v1/posts/', {'text': 'пост'})
+        self.assertEqual(response.status_code, 201)
+
+    def test_comments_share_limit(self):
+        """Комментарии на сайте и через API считаются вместе"""
+        client = Client()
+        client.force_login(self.user)
+        url = reverse('posts:add_comment', args=[self.post.pk])
+        response = client.post(url, {'text': 'первый'})
+        self.assertEqual(response.status_code, 302)
+        response = client.post(url, {'text': 'второй'})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '60')
+        response = self.api.post(
+            f'/api/v1/posts/{self.post.pk}/comments/', {'text': 'третий'})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(Comment.objects.count(), 1)
+
+    def test_local_cache_warning(self):
+        """С LocMemCache проверка предупреждает о лимитах по процессам"""
+        self.assertEqual([warning.id for warning in check_shared_cache(None)],
+                         ['core.W001'])
+        with self.settings(CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}):
+            self.assertEqual(check_shared_cache(None), [])
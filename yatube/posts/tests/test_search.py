@@ -0,0 +1,84 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import Post
+from ..search import match_expression, search_posts
+
+User = get_user_model()
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.cats = Post.objects.create(
+            text='Кошки спят на подоконнике', author=cls.author)
+        cls.dogs = Post.objects.create(
+            text='Собаки гуляют во дворе', author=cls.author)
+
+    def found(self, query):
+        return list(search_posts(Post.objects.all(), query))
+
+    def test_match_expression(self):
+        """Запрос превращается в безопасное выражение с префиксом"""
+        self.assertEqual(match_expression('кошки "спят'), '"кошки" "спят"*')
+        self.assertIsNone(match_expression(' !? '))
+
+    def test_search_finds_by_words_and_prefix(self):
+        """Поиск находит посты по словам и началу последнего слова"""
+        self.assertEqual(self.found('кошки'), [self.cats])
+        self.assertEqual(self.found('собаки дво'), [self.dogs])
+        self.assertEqual(self.found('кошки двор'), [])
+
+    def test_index_follows_updates_and_deletes(self):
+        """Индекс обновляется при изменении и удалении постов"""
+        Post.objects.filter(pk=self.cats.pk).update(text='Попугаи поют')
+        self.assertEqual(self.found('кошки'), [])
+        self.assertEqual(self.found('попугаи'), [self.cats])
+        Post.objects.filter(pk=self.cats.pk).delete()
+        self.assertEqual(self.found('попугаи'), [])
+
+    def test_search_page(self):
+        """Страница поиска показывает найденные посты"""
+        response = self.client.get(reverse('posts:search'), {'q': 'собаки'})
+        self.assertEqual(list(response.context['page_obj']), [self.dogs])
+        self.assertEqual(response.context['query'], 'собаки')
+
+    def test_search_page_without_words(self):
+        """Пустой запрос и запрос без слов показывают пустую выдачу"""
+        url = reverse('posts:search')
+        for query in (None, '', '!!!'):
+            with self.subTest(query=query):
+                data = {} if query is None else {'q': query}
+                response = self.client.get(url, data)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(list(response.context['page_obj']), [])
+
+    def test_api_search(self):
+        """API постов фильтрует выдачу по параметру search"""
+        response = self.client.get('/api/v1/posts/', {'search': 'кошки'})
+        self.assertEqual(
+            [post['id'] for post in response.json()['results']],
+            [self.cats.pk])
+
+    def test_api_search_keeps_ranking(self):
+        """Выдача API по поиску идёт по релевантности и на всех страницах"""
+        weak = Post.objects.create(
+            text='Енот живёт в лесу, где много деревьев, кустов и травы',
+            author=self.author)
+        strong = Post.objects.create(text='Енот, енот и ещё раз енот',
+                                     author=self.author)
+        Post.objects.create(text='Енот и белка в парке', author=self.author)
+        ranked = [post.pk for post in self.found('енот')]
+        self.assertEqual(ranked[0], strong.pk)
+        self.assertEqual(ranked[-1], weak.pk)
+        response = self.client.get('/api/v1/posts/', {'search': 'енот'})
+        self.assertEqual(
+            [post['id'] for post in response.json()['results']], ranked)
+        first = self.client.get('/api/v1/posts/',
+                                {'search': 'енот', 'limit': 2}).json()
+        second = self.client.get(first['next']).json()
+        self.assertEqual(
+            [post['id'] for post in first['results'] + second['results']],
+            ranked)
@@ -0,0 +1,93 @@
+import hashlib
+import json
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.cache import cache
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.models import StoredFile
+from core.storage import ContentAddressedStorage
+from ..management.commands.rehome_media import rehome_post
+from ..models import Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+CONTENT = b'same bytes'
+DIGEST = hashlib.sha256(CONTENT).hexdigest()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ContentAddressedStorageTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.storage = ContentAddressedStorage()
+
+    def test_name_is_sharded_hash(self):
+        """Имя файла — хэш содержимого во вложенных каталогах"""
+        name = self.storage.save('posts/photo.JPG', ContentFile(CONTENT))
+        self.assertEqual(
+            name, f'posts/{DIGEST[:2]}/{DIGEST[2:4]}/{DIGEST}.jpg')
+        self.assertTrue(self.storage.is_content_addressed(name))
+        self.assertFalse(self.storage.is_content_addressed('posts/a.jpg'))
+
+    def test_duplicates_are_stored_once(self):
+        """Одинаковые файлы хранятся один раз и удаляются с последней
+        ссылкой"""
+        first = self.storage.save('posts/a.jpg', ContentFile(CONTENT))
+        second = self.storage.save('posts/b.jpg', ContentFile(CONTENT))
+        self.assertEqual(first, second)
+        self.assertEqual(StoredFile.objects.get(name=first).references, 2)
+        self.storage.delete(first)
+        self.assertTrue(self.storage.exists(first))
+        self.storage.delete(first)
+        self.assertFalse(self.storage.exists(first))
+        self.assertFalse(StoredFile.objects.filter(name=first).exists())
+
+    def test_rehome_moves_legacy_files(self):
+        """Команда переносит старые файлы под имена по содержимому"""
+        legacy = FileSystemStorage()
+        image = legacy.save('posts/old.jpg', ContentFile(CONTENT))
+        variant = legacy.save('posts/old_480w.jpg', ContentFile(CONTENT))
+        author = User.objects.create_user(username='author')
+        post = Post.objects.create(text='old post', author=author)
+        Post.objects.filter(pk=post.pk).update(
+            image=image,
+            image_variants=json.dumps({'image/jpeg': [[480, variant]]}))
+        self.assertEqual(rehome_post(post.pk), 2)
+        post.refresh_from_db()
+        self.assertTrue(
+            default_storage.is_content_addressed(post.image.name))
+        self.assertEqual(post.variants['image/jpeg'][0][1], post.image.name)
+        self.assertFalse(legacy.exists(image))
+        self.assertFalse(legacy.exists(variant))
+        self.assertEqual(rehome_post(post.pk), 0)
+
+    def test_rehome_resets_cached_listing(self):
+        """После переноса лента показывает картинку по новому адресу"""
+        cache.clear()
+        legacy = FileSystemStorage()
+        image = legacy.save('posts/cached.jpg', ContentFile(CONTENT))
+        variant = legacy.save('posts/cached_480w.jpg', ContentFile(CONTENT))
+        author = User.objects.create_user(username='author')
+        post = Post.objects.create(text='old post', author=author)
+        Post.objects.filter(pk=post.pk).update(
+            image=image,
+            image_variants=json.dumps({'image/jpeg': [[480, variant]]}))
+        response = self.client.get(reverse('posts:main_page'))
+        self.assertContains(response, legacy.url(variant))
+        rehome_post(post.pk)
+        post.refresh_from_db()
+        response = self.client.get(reverse('posts:main_page'))
+        self.assertNotContains(response, legacy.url(variant))
+        self.assertContains(response, post.image.url)
@@ -0,0 +1,111 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .. import thumbnails
+from ..models import Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT,
+                   POSTS_IMAGE_INDEX=os.path.join(TEMP_MEDIA_ROOT,
+                                                  'index.pickle'))
+class ThumbnailTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def create_post(self):
+        image = SimpleUploadedFile('small.gif', SMALL_GIF, 'image/gif')
+        return Post.objects.create(text='post with image',
+                                   author=self.author, image=image)
+
+    def test_upload_queues_thumbnails(self):
+        """Загрузка картинки ставит миниатюры в очередь один раз"""
+        with mock.patch('posts.signals.queue_thumbnails') as queue:
+            post = self.create_post()
+            post.text = 'edited'
+            post.save()
+        queue.assert_called_once_with(post)
+
+    def test_page_shows_placeholder_until_ready(self):
+        """Пока вариантов нет, страница показывает заглушку"""
+        with mock.patch('posts.signals.queue_thumbnails'):
+            post = self.create_post()
+        with mock.patch.object(thumbnails.Image, 'open') as decode:
+            response = self.client.get(reverse('posts:main_page'))
+        decode.assert_not_called()
+        self.assertContains(response, 'bg-light')
+        self.assertNotContains(response, '<picture>')
+        thumbnails.generate_thumbnails(post.pk)
+        response = self.client.get(reverse('posts:main_page'))
+        self.assertContains(response, '<picture>')
+        self.assertContains(response, 'srcset=')
+
+    def test_variants_are_stored_with_original(self):
+        """Варианты лежат в каталоге оригинала и видны в API"""
+        with mock.patch('posts.signals.queue_thumbnails'):
+            post = self.create_post()
+        thumbnails.generate_thumbnails(post.pk)
+        post.refresh_from_db()
+        folder = post.image.name.split('/', 1)[0]
+        self.assertIn('image/png', post.variants)
+        for items in post.variants.values():
+            for width, name in items:
+                self.assertEqual(name.split('/', 1)[0], folder)
+                self.assertTrue(post.image.storage.exists(name))
+        response = self.client.get(f'/api/v1/posts/{post.pk}/')
+        variants = response.json()['image_variants']
+        self.assertEqual(set(variants), set(post.variants))
+        self.assertTrue(variants['image/png'][0]['url'].startswith('http'))
+
+    def test_variants_invalidate_api_etag(self):
+        """Готовые варианты меняют ETag поста в API"""
+        with mock.patch('posts.signals.queue_thumbnails'):
+            post = self.create_post()
+        url = f'/api/v1/posts/{post.pk}/'
+        etag = self.client.get(url)['ETag']
+        thumbnails.generate_thumbnails(post.pk)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('image/png', response.json()['image_variants'])
+
+    def test_new_image_resets_variants(self):
+        """Замена картинки сбрасывает варианты старой"""
+        with mock.patch('posts.signals.queue_thumbnails'):
+            post = self.create_post()
+            thumbnails.generate_thumbnails(post.pk)
+            post.refresh_from_db()
+            post.image = SimpleUploadedFile('other.gif', SMALL_GIF,
+                                            'image/gif')
+            post.save()
+        post.refresh_from_db()
+        self.assertEqual(post.variants, {})
@@ -0,0 +1,63 @@
+from importlib import import_module
+from unittest import mock
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from .. import timeline
+from ..models import Follow, Post, TimelineEntry
+
+User = get_user_model()
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        for i in range(3):
+            Post.objects.create(text=f'old post {i}', author=cls.author)
+
+    def feed(self):
+        return TimelineEntry.objects.filter(user=self.reader)
+
+    def test_follow_backfills_timeline(self):
+        """После подписки в ленте появляются старые посты автора"""
+        Follow.objects.create(user=self.reader, following=self.author)
+        self.assertEqual(self.feed().count(), 3)
+
+    def test_new_post_fans_out(self):
+        """Новый пост попадает в ленту подписчика"""
+        Follow.objects.create(user=self.reader, following=self.author)
+        post = Post.objects.create(text='new post', author=self.author)
+        self.assertTrue(self.feed().filter(post=post).exists())
+
+    def test_unfollow_clears_timeline(self):
+        """После отписки посты автора пропадают из ленты"""
+        Follow.objects.create(user=self.reader, following=self.author)
+        Follow.objects.filter(user=self.reader).delete()
+        self.assertFalse(self.feed().exists())
+
+    def test_timeline_is_trimmed(self):
+        """Лента не растёт больше TIMELINE_LENGTH записей"""
+        with mock.patch.object(timeline, 'TIMELINE_LENGTH', 2):
+            Follow.objects.create(user=self.reader, following=self.author)
+            self.assertEqual(self.feed().count(), 2)
+            newest = Post.objects.create(text='new post', author=self.author)
+            self.assertEqual(self.feed().count(), 2)
+            self.assertEqual(self.feed().first().post, newest)
+
+    def test_migration_trims_timelines(self):
+        """Заполнение лент в миграции обрезает их до TIMELINE_LENGTH"""
+        migration = import_module('posts.migrations.0012_timelineentry')
+        other = User.objects.create_user(username='other')
+        Post.objects.create(text='other post', author=other)
+        Follow.objects.create(user=self.reader, following=self.author)
+        Follow.objects.create(user=self.reader, following=other)
+        TimelineEntry.objects.all().delete()
+        with mock.patch.object(migration, 'TIMELINE_LENGTH', 2):
+            migration.fill_timelines(apps, None)
+        self.assertEqual(self.feed().count(), 2)
+        self.assertEqual(self.feed().first().post.author, other)
@@ -7,10 +7,14 @@ from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from ..models import Follow, Group, Post
+from ..caching import (LISTING_CACHE_TIMEOUT, LOCAL_CACHE_TIMEOUT,
+                       listing_timeout)
+from ..models import Comment, Follow, Group, Post
 
 User = get_user_model()
 
@@ -172,6 +176,27 @@ class PostsPagesTest(TestCase):
             self.assertEqual(len(second_page.context['page_obj']),
                              (self.POSTAMOUNT - self.POST_PER_LIST))
 
+    def test_cursor_paginator_in_links(self):
+        """Проверяем курсорную пагинацию на страницах"""
+        for link, args, template_ in self.links_with_list_of_post:
+            with self.subTest(link=link):
+                url = reverse(link, args=args)
+                first_page = self.authorized_client.get(url + '?after=')
+                page_obj = first_page.context['page_obj']
+                self.assertEqual(len(page_obj), self.POST_PER_LIST)
+                self.assertFalse(page_obj.has_previous())
+                second_page = self.authorized_client.get(
+                    url + '?after=' + page_obj.next_cursor)
+                page_obj = second_page.context['page_obj']
+                self.assertEqual(len(page_obj),
+                                 self.POSTAMOUNT - self.POST_PER_LIST)
+                self.assertFalse(page_obj.has_next())
+                back_page = self.authorized_client.get(
+                    url + '?before=' + page_obj.previous_cursor)
+                self.assertEqual(
+                    list(back_page.context['page_obj']),
+                    list(first_page.context['page_obj']))
+
     def test_other_group_doesnt_have_posts(self):
         """Проверяем, что в других группах нет созданных постов"""
         response = self.authorized_client.get(self.other_group_link)
@@ -180,20 +205,98 @@ class PostsPagesTest(TestCase):
         self.assertEqual(len(list), 0)
 
     def test_cache_data(self):
-        """Проверяем сохранение данных в кэше"""
+        """Проверяем сохранение данных в кэше и его сброс при изменении
+        постов"""
+        for link, args, template_ in self.links_with_list_of_post:
+            with self.subTest(link=link):
+                url = reverse(link, args=args)
+                cache_page = self.authorized_client.get(url).content
+                Post.objects.filter(pk=self.post_for_edit.pk).update(
+                    text='изменено в обход сигналов')
+                new_entry = self.authorized_client.get(url).content
+                self.assertEqual(new_entry, cache_page)
+
+                Post.objects.create(text='новый пост',
+                                    author=self.user,
+                                    group=self.main_group)
+                another_entry = self.authorized_client.get(url).content
+                self.assertNotEqual(another_entry, cache_page)
+
+    def test_cache_reset_on_delete(self):
+        """Проверяем, что удаление поста сбрасывает кэш главной страницы"""
+        link, *_ = self.main_page
+        cache_page = self.authorized_client.get(reverse(link)).content
+        Post.objects.get(pk=self.post_for_edit.pk).delete()
+        new_entry = self.authorized_client.get(reverse(link)).content
+        self.assertNotEqual(new_entry, cache_page)
+
+    def test_cache_reset_on_comment(self):
+        """Проверяем, что новый комментарий меняет счётчик в закэшированных
+        лентах"""
+        for link, args, template_ in self.links_with_list_of_post:
+            with self.subTest(link=link):
+                url = reverse(link, args=args)
+                self.authorized_client.get(url)
+                Comment.objects.create(post=self.post_for_edit,
+                                       author=self.other_user, text='ответ')
+                count = self.post_for_edit.comment.count()
+                self.assertContains(self.authorized_client.get(url),
+                                    f'Комментариев: {count}')
+
+    def test_cache_reset_on_group_and_author_change(self):
+        """Проверяем, что смена адреса группы и имени автора сбрасывает
+        кэш лент"""
         link, *_ = self.main_page
-        cache_page = self.authorized_client.get(
-            reverse(link)).content
-        self.post_for_edit.delete()
+        self.authorized_client.get(reverse(link))
+        self.main_group.slug = 'renamed-group'
+        self.main_group.save()
+        page = self.authorized_client.get(reverse(link))
+        self.assertContains(page, '/group/renamed-group/')
+        self.assertNotContains(page, '/group/test-group0/')
+        author = User.objects.get(pk=self.user.pk)
+        author.username = 'renamed-author'
+        author.save()
+        page = self.authorized_client.get(reverse(link))
+        self.assertContains(page, '/profile/renamed-author/')
 
-        new_entry = self.authorized_client.get(
-            reverse(link)).content
-        self.assertEqual(new_entry, cache_page)
+    def test_listing_cache_timeout(self):
+        """Кэш процесса держит ленты недолго, общий — долго"""
+        self.assertEqual(listing_timeout(), LOCAL_CACHE_TIMEOUT)
+        with override_settings(CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}):
+            self.assertEqual(listing_timeout(), LISTING_CACHE_TIMEOUT)
 
+    def test_cached_listing_renders_user_blocks(self):
+        """Проверяем, что закэшированная лента не выдаёт чужие
+        пользовательские блоки"""
+        link, *_ = self.main_page
+        edit_link = reverse('posts:post_edit', args=[self.post_for_edit.id])
+        other_page = self.other_client.get(reverse(link))
+        self.assertNotContains(other_page, edit_link)
+        self.assertContains(other_page, self.other_user.username)
+        with self.assertNumQueries(2):
+            author_page = self.authorized_client.get(reverse(link))
+        self.assertContains(author_page, edit_link)
+        self.assertContains(author_page, self.user.username)
+        self.assertNotContains(author_page, self.other_user.username)
+
+    def test_listing_queries_dont_depend_on_page_size(self):
+        """Проверяем, что число запросов ленты не растёт с числом постов"""
+        link, args, template_ = self.group_list
+        other_link = reverse('posts:group_list',
+                             args=[self.backup_group.slug])
+        for post in Post.objects.all()[:2]:
+            Post.objects.create(text=post.text, author=self.other_user,
+                                group=self.backup_group, image=post.image)
+        self.authorized_client.get(reverse(link, args=args))
+        self.authorized_client.get(other_link)
+        cache.clear()
+        with CaptureQueriesContext(connection) as full_page:
+            self.authorized_client.get(reverse(link, args=args))
         cache.clear()
-        another_entry = self.authorized_client.get(
-            reverse(link)).content
-        self.assertNotEqual(another_entry, cache_page)
+        with CaptureQueriesContext(connection) as short_page:
+            self.authorized_client.get(other_link)
+        self.assertEqual(len(full_page), len(short_page))
 
     def test_follow_user(self):
         """Проверяем, что пользователь может
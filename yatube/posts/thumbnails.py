@@ -0,0 +1,173 @@
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from PIL import Image, ImageOps, features
+
+from .duplicates import index_post
+
+# Карточка поста: картинка обрезается до пропорций 960x339 и
+# сохраняется в нескольких ширинах для srcset.
+CARD_RATIO = (960, 339)
+CARD_WIDTHS = (480, 960, 1440)
+FALLBACK_WIDTH = 960
+CARD_SIZES = '(max-width: 576px) 100vw, 960px'
+
+FORMATS = {
+    'JPEG': ('image/jpeg', 'jpg', {'quality': 85, 'optimize': True,
+                                   'progressive': True}),
+    'PNG': ('image/png', 'png', {'optimize': True}),
+    'WEBP': ('image/webp', 'webp', {'quality': 80, 'method': 4}),
+}
+WEBP = 'image/webp'
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def variant_formats(source):
+    """Форматы вариантов: WebP, если Pillow его умеет, и формат оригинала.
+
+    Картинки с прозрачностью остаются в PNG, остальные идут в JPEG.
+    """
+    formats = ['WEBP'] if features.check('webp') else []
+    formats.append('PNG' if source.format in ('PNG', 'GIF') else 'JPEG')
+    return formats
+
+
+def card_widths(source_width):
+    """Ширины вариантов без увеличения исходной картинки."""
+    widths = [width for width in CARD_WIDTHS if width <= source_width]
+    return widths or [source_width]
+
+
+def build_variants(image):
+    """Сохраняет варианты картинки в том же каталоге хранилища.
+
+    Возвращает словарь {mime: [[ширина, имя файла], ...]}.
+    """
+    with image.open('rb'):
+        source = Image.open(image)
+        source.load()
+    formats = variant_formats(source)
+    source = ImageOps.exif_transpose(source)
+    if source.mode not in ('RGB', 'RGBA'):
+        source = source.convert('RGBA')
+    root, _ = os.path.splitext(image.name)
+    variants = {}
+    for width in card_widths(source.width):
+        height = max(1, round(width * CARD_RATIO[1] / CARD_RATIO[0]))
+        resized = ImageOps.fit(source, (width, height), Image.LANCZOS)
+        for image_format in formats:
+            mime, extension, options = FORMATS[image_format]
+            frame = resized
+            if image_format == 'JPEG':
+                frame = frame.convert('RGB')
+            content = BytesIO()
+            frame.save(content, image_format, **options)
+            name = image.storage.save(f'{root}_{width}w.{extension}',
+                                      ContentFile(content.getvalue()))
+            variants.setdefault(mime, []).append([width, name])
+    return variants
+
+
+def picture(post):
+    """Источники для <picture> карточки поста или None, пока их нет."""
+    variants = post.variants
+    if not variants:
+        return None
+    storage = post.image.storage
+    sources = []
+    src = None
+    for mime, items in variants.items():
+        sources.append({
+            'type': mime,
+            'srcset': ', '.join(f'{storage.url(name)} {width}w'
+                                for width, name in items),
+        })
+        if mime != WEBP:
+            width, name = min(
+                items, key=lambda item: abs(item[0] - FALLBACK_WIDTH))
+            src = storage.url(name)
+    # WebP идёт первым: браузер берёт первый формат, который понимает.
+    sources.sort(key=lambda source: source['type'] != WEBP)
+    return {'sources': sources, 'src': src, 'sizes': CARD_SIZES}
+
+
+def generate_thumbnails(post_id):
+    """Строит варианты и хэш картинки поста и сбрасывает ленты с его
+    заглушкой и ETag постов в API."""
+    from .caching import (bump_listing_versions, bump_posts_version,
+                          post_scopes)
+    from .models import Post
+
+    post = Post.objects.select_related('author', 'group').filter(
+        pk=post_id).first()
+    if post is None or not post.image:
+        return
+    index_post(post)
+    variants = json.dumps(build_variants(post.image))
+    # Картинку могли заменить, пока строились варианты старой.
+    if Post.objects.filter(pk=post.pk, image=post.image.name).update(
+            image_variants=variants):
+        release_images(post.image.storage, None, post.image_variants)
+    else:
+        release_images(post.image.storage, None, variants)
+    bump_listing_versions(post_scopes(post))
+    bump_posts_version()
+
+
+def release_images(storage, image_name, image_variants):
+    """После коммита убирает ссылки на картинку поста и её варианты."""
+    names = [image_name] if image_name else []
+    if image_variants:
+        for items in json.loads(image_variants).values():
+            names.extend(name for _, name in items)
+    if not names:
+        return
+
+    def delete():
+        for name in names:
+            try:
+                storage.delete(name)
+            except Exception:
+                # Файл уже не нужен посту, ошибка не должна мешать запросу.
+                logger.exception('Не удалось удалить файл %s', name)
+
+    transaction.on_commit(delete)
+
+
+def _build(post_id):
+    try:
+        generate_thumbnails(post_id)
+    except Exception:
+        logger.exception('Не удалось построить миниатюры поста %s', post_id)
+
+
+def _run(post_id):
+    try:
+        _build(post_id)
+    finally:
+        connection.close()
+
+
+def queue_thumbnails(post):
+    """Ставит построение вариантов картинки в очередь после коммита.
+
+    При POSTS_THUMBNAIL_WORKERS = 0 варианты строятся сразу.
+    """
+    global _executor
+    workers = settings.POSTS_THUMBNAIL_WORKERS
+    if not workers:
+        transaction.on_commit(lambda: _build(post.pk))
+        return
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix='thumbnails')
+    transaction.on_commit(lambda: _executor.submit(_run, post.pk))
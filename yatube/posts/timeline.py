@@ -0,0 +1,136 @@
+from collections import defaultdict
+
+from django.db import connection
+from django.db.models import Count
+
+from .models import Follow, Post, TimelineEntry
+
+# Сколько последних записей хранится в ленте одного пользователя.
+TIMELINE_LENGTH = 1000
+BATCH_SIZE = 500
+
+
+def fan_out(posts):
+    """Раскладывает новые посты по лентам подписчиков их авторов."""
+    by_author = defaultdict(list)
+    for post in posts:
+        by_author[post.author_id].append(post)
+    if not by_author:
+        return
+    followers = Follow.objects.filter(
+        following_id__in=by_author).values_list('following_id', 'user_id')
+    entries = [
+        TimelineEntry(user_id=user_id, post_id=post.pk,
+                      author_id=author_id, pub_date=post.pub_date)
+        for author_id, user_id in followers
+        for post in by_author[author_id]
+    ]
+    TimelineEntry.objects.bulk_create(entries,
+                                      batch_size=BATCH_SIZE,
+                                      ignore_conflicts=True)
+    trim({entry.user_id for entry in entries})
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту последние посты автора после подписки."""
+    recent = Post.objects.filter(author_id=author_id).order_by(
+        '-pub_date').values_list('pk', 'pub_date')[:TIMELINE_LENGTH]
+    entries = [
+        TimelineEntry(user_id=user_id, post_id=post_id,
+                      author_id=author_id, pub_date=pub_date)
+        for post_id, pub_date in recent
+    ]
+    TimelineEntry.objects.bulk_create(entries,
+                                      batch_size=BATCH_SIZE,
+                                      ignore_conflicts=True)
+    trim([user_id])
+
+
+def remove(user_id, author_id):
+    """Убирает из ленты посты автора после отписки."""
+    TimelineEntry.objects.filter(user_id=user_id,
+                                 author_id=author_id).delete()
+
+
+def trim(user_ids):
+    """Обрезает ленты, вышедшие за TIMELINE_LENGTH записей."""
+    overflowed = TimelineEntry.objects.filter(
+        user_id__in=list(user_ids)).order_by().values('user_id').annotate(
+        total=Count('pk')).filter(
+        total__gt=TIMELINE_LENGTH).values_list('user_id', flat=True)
+    for user_id in overflowed:
+        stale = TimelineEntry.objects.filter(user_id=user_id).order_by(
+            '-pub_date').values_list('pk', flat=True)[TIMELINE_LENGTH:]
+        TimelineEntry.objects.filter(pk__in=list(stale)).delete()
+
+
+def rebuild(user_ids=None):
+    """Пересобирает ленты пользователей по их текущим подпискам."""
+    follows = Follow.objects.all()
+    if user_ids is not None:
+        user_ids = list(user_ids)
+        follows = follows.filter(user_id__in=user_ids)
+        TimelineEntry.objects.filter(user_id__in=user_ids).delete()
+    else:
+        TimelineEntry.objects.all().delete()
+    if _window_functions():
+        _fill(user_ids)
+        return
+    for user_id, author_id in follows.values_list('user_id',
+                                                  'following_id'):
+        backfill(user_id, author_id)
+
+
+def _window_functions():
+    """Django 2.2 не знает, что SQLite с 3.25 поддерживает OVER."""
+    if connection.vendor == 'sqlite':
+        return connection.Database.sqlite_version_info >= (3, 25, 0)
+    return connection.features.supports_over_clause
+
+
+def _fill(user_ids):
+    """Заполняет пустые ленты одним INSERT ... SELECT.
+
+    Сначала у каждого автора берутся TIMELINE_LENGTH последних постов:
+    старше них в ленту ничего не попадёт. Затем ROW_NUMBER() оставляет
+    каждому читателю TIMELINE_LENGTH последних постов из его подписок,
+    так что лишнее не вставляется и не обрезается потом.
+    """
+    where, params = '', []
+    if user_ids is not None:
+        if not user_ids:
+            return
+        where = 'WHERE f.user_id IN ({})'.format(
+            ', '.join(['%s'] * len(user_ids)))
+        params = user_ids
+    sql = f"""
+        INSERT INTO {TimelineEntry._meta.db_table}
+            (user_id, post_id, author_id, pub_date)
+        SELECT user_id, post_id, author_id, pub_date FROM (
+            SELECT f.user_id, latest.post_id, latest.author_id,
+                   latest.pub_date,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY f.user_id
+                       ORDER BY latest.pub_date DESC,
+                                latest.post_id DESC) AS position
+            FROM {Follow._meta.db_table} f
+            JOIN (
+                SELECT id AS post_id, author_id, pub_date FROM (
+                    SELECT id, author_id, pub_date,
+                           ROW_NUMBER() OVER (
+                               PARTITION BY author_id
+                               ORDER BY pub_date DESC, id DESC) AS number
+                    FROM {Post._meta.db_table}
+                    WHERE author_id IN (
+                        SELECT following_id
+                        FROM {Follow._meta.db_table} f {where})
+                ) AS numbered
+                WHERE number <= %s
+            ) AS latest ON latest.author_id = f.following_id
+            {where}
+        ) AS recent
+        WHERE position <= %s
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [*params, TIMELINE_LENGTH, *params,
+                             TIMELINE_LENGTH])
@@ -6,6 +6,7 @@ app_name = 'posts'
 
 urlpatterns = [
     path('follow/', views.follow_index, name='follow_index'),
+    path('search/', views.search, name='search'),
     path('profile/<str:username>/follow/',
          views.profile_follow,
          name='profile_follow'),
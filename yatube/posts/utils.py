@@ -1,11 +1,208 @@
+import base64
+import binascii
+import hashlib
+from collections.abc import Sequence
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
 from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+from .caching import posts_version
 
 POST_VIEW = 10
+# Сколько секунд хранится посчитанное количество постов в выборке.
+COUNT_CACHE_TIMEOUT = 60 * 60
+# Поля, по которым строится курсор: дата публикации и id поста.
+# Курсор может строиться и по одному id: ('id',).
+KEYSET = ('pub_date', 'id')
+CURSOR_PARAMS = ('after', 'before')
+
+
+def encode_cursor(*values):
+    """Упаковывает позицию (дата, id) или (id,) в токен для ссылки."""
+    raw = '|'.join(value.isoformat() if hasattr(value, 'isoformat')
+                   else str(value) for value in values).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Распаковывает токен курсора, для битого токена возвращает None."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        *dates, pk = raw.decode().split('|')
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if not dates:
+        return (pk,)
+    if len(dates) > 1:
+        return None
+    try:
+        date = parse_datetime(dates[0])
+    except ValueError:
+        return None
+    if date is None:
+        return None
+    return date, pk
+
+
+class PostPaginator(Paginator):
+    """Пажинатор постов с кэшируемым количеством записей.
+
+    COUNT(*) выполняется один раз для каждой выборки и хранится в кэше,
+    пока посты не изменятся.
+    """
+    ELLIPSIS = '…'
+
+    def _count_cache_key(self):
+        query = self.object_list.query
+        sql, params = query.sql_with_params()
+        digest = hashlib.md5(f'{sql}{params}'.encode()).hexdigest()
+        return f'posts:count:{posts_version()}:{digest}'
+
+    @cached_property
+    def count(self):
+        if not hasattr(self.object_list, 'query'):
+            return super().count
+        try:
+            key = self._count_cache_key()
+        except EmptyResultSet:
+            # Выборка вроде queryset.none() заведомо пуста и не строит SQL.
+            return 0
+        count = cache.get(key)
+        if count is None:
+            count = self.object_list.count()
+            cache.set(key, count, COUNT_CACHE_TIMEOUT)
+        return count
+
+    def get_elided_page_range(self, number=1, on_each_side=2, on_ends=1):
+        """Первые и последние страницы и окно вокруг текущей.
+
+        Пропущенные участки обозначаются ELLIPSIS.
+        """
+        number = self.validate_number(number)
+        num_pages = self.num_pages
+        if num_pages <= (on_each_side + on_ends) * 2 + 1:
+            yield from self.page_range
+            return
+        if number > 1 + on_each_side + on_ends + 1:
+            yield from range(1, on_ends + 1)
+            yield self.ELLIPSIS
+            yield from range(number - on_each_side, number + 1)
+        else:
+            yield from range(1, number + 1)
+        if number < num_pages - on_each_side - on_ends - 1:
+            yield from range(number + 1, number + on_each_side + 1)
+            yield self.ELLIPSIS
+            yield from range(num_pages - on_ends + 1, num_pages + 1)
+        else:
+            yield from range(number + 1, num_pages + 1)
+
+
+class CursorPage(Sequence):
+    """Страница курсорной пагинации.
+
+    Выборка выполняется при первом обращении к странице и не зависит
+    от того, насколько далеко от начала ленты она находится.
+    """
+    is_cursor = True
+
+    def __init__(self, posts, keyset, per_page, after=None, before=None):
+        self.posts = posts
+        self.keyset = keyset
+        self.per_page = per_page
+        self.after = after
+        self.before = before
+        self._object_list = None
+
+    def _slice(self, posts, cursor, newer):
+        direction = 'gt' if newer else 'lt'
+        if cursor is not None and len(cursor) == len(self.keyset):
+            if len(self.keyset) == 1:
+                condition = Q(**{f'{self.keyset[0]}__{direction}': cursor[0]})
+            else:
+                (date_field, id_field), (date, pk) = self.keyset, cursor
+                condition = (
+                    Q(**{f'{date_field}__{direction}': date})
+                    | Q(**{date_field: date, f'{id_field}__{direction}': pk}))
+            posts = posts.filter(condition)
+        prefix = '' if newer else '-'
+        posts = posts.order_by(*(prefix + field for field in self.keyset))
+        return list(posts[:self.per_page + 1])
+
+    def _fetch(self):
+        if self.before is not None:
+            rows = self._slice(self.posts, self.before, newer=True)
+            if len(rows) > self.per_page:
+                self._has_previous = True
+                self._has_next = True
+                return rows[:self.per_page][::-1]
+        rows = self._slice(self.posts, self.after, newer=False)
+        self._has_previous = self.after is not None
+        self._has_next = len(rows) > self.per_page
+        return rows[:self.per_page]
+
+    @property
+    def object_list(self):
+        if self._object_list is None:
+            self._object_list = self._fetch()
+        return self._object_list
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __repr__(self):
+        return '<Cursor page after=%r before=%r>' % (self.after, self.before)
+
+    def _cursor(self, post):
+        return encode_cursor(*(getattr(post, field) for field in self.keyset))
+
+    def has_next(self):
+        self.object_list
+        return self._has_next
+
+    def has_previous(self):
+        self.object_list
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    @property
+    def next_cursor(self):
+        if self.has_next():
+            return self._cursor(self.object_list[-1])
+        return None
+
+    @property
+    def previous_cursor(self):
+        if self.has_previous():
+            return self._cursor(self.object_list[0])
+        return None
+
+
+def cursor_mode(request):
+    """Курсорный режим включается настройкой или параметром запроса."""
+    return (settings.POSTS_PAGINATION == 'cursor'
+            or any(param in request.GET for param in CURSOR_PARAMS))
 
 
-def post_listing(posts, request):
+def post_listing(posts, request, keyset=KEYSET):
     """Пажинатор сайта"""
-    paginator = Paginator(posts, POST_VIEW)
+    if cursor_mode(request):
+        return CursorPage(posts, keyset, POST_VIEW,
+                          after=decode_cursor(request.GET.get('after')),
+                          before=decode_cursor(request.GET.get('before')))
+    paginator = PostPaginator(posts, POST_VIEW)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     return page_obj
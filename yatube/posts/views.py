@@ -1,20 +1,25 @@
+from urllib.parse import urlencode
+
 from django.contrib.auth.decorators import login_required
+from django.db.models import F
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
-from django.views.decorators.cache import cache_page
 
+from core.ratelimit import ratelimit
+from .counters import user_stats
 from .forms import CommentForm, PostForm
 from .models import Follow, Group, Post, User
-from .utils import post_listing
+from .search import search_posts
+from .utils import POST_VIEW, PostPaginator, post_listing
 
 
-@cache_page(timeout=20, key_prefix='index_page')
 def index(request):
     """Отображение главной страницы сайта"""
-    post_list = Post.objects.select_related('group')
+    post_list = Post.objects.cards()
     template = '../templates/posts/index.html'
     context = {
         'page_obj': post_listing(post_list, request),
+        'listing_scope': 'index',
     }
     return render(request, template, context)
 
@@ -23,20 +28,22 @@ def group_posts(request, slug):
     """Отображение страницы постов группы"""
     group = get_object_or_404(Group, slug=slug)
     template = '../templates/posts/group_list.html'
-    posts = group.group_posts.all()
+    posts = group.group_posts.cards()
     context = {
         'group': group,
         'page_obj': post_listing(posts, request),
+        'listing_scope': f'group:{slug}',
     }
     return render(request, template, context)
 
 
 def profile(request, username):
     """Отображение профиля пользователя и его сообщений"""
-    profile_user = get_object_or_404(User, username=username)
+    profile_user = get_object_or_404(User.objects.select_related('stats'),
+                                     username=username)
     template = 'posts/profile.html'
-    posts = profile_user.posts.all()
-    post_count = posts.count()
+    posts = profile_user.posts.cards()
+    post_count = user_stats(profile_user).posts_count
     if request.user.is_authenticated and Follow.objects.filter(
             user=request.user, following=profile_user).exists():
         following = True
@@ -46,18 +53,21 @@ def profile(request, username):
         'post_count': post_count,
         'username': profile_user,
         'page_obj': post_listing(posts, request),
-        'following': following
+        'following': following,
+        'listing_scope': f'profile:{username}',
     }
     return render(request, template, context)
 
 
 def post_detail(request, post_id):
     """Отображении детальной информации о посте"""
-    post = get_object_or_404(Post.objects.select_related('author'), pk=post_id)
-    post_count = post.author.posts.count()
+    post = get_object_or_404(
+        Post.objects.select_related('author', 'author__stats', 'group'),
+        pk=post_id)
+    post_count = user_stats(post.author).posts_count
     template = 'posts/post_detail.html'
     form = CommentForm()
-    comments = post.comment.all()
+    comments = post.comment.select_related('author')
     context = {
         'form': form,
         'post': post,
@@ -67,6 +77,20 @@ def post_detail(request, post_id):
     return render(request, template, context)
 
 
+def search(request):
+    """Полнотекстовый поиск по постам"""
+    query = request.GET.get('q', '').strip()
+    context = {'query': query, 'page_obj': []}
+    if query:
+        posts = search_posts(Post.objects.cards(), query)
+        paginator = PostPaginator(posts, POST_VIEW)
+        context.update({
+            'page_obj': paginator.get_page(request.GET.get('page')),
+            'paginator_query': urlencode({'q': query}) + '&',
+        })
+    return render(request, 'posts/search.html', context)
+
+
 @login_required
 def post_create(request):
     """Отображение формы для создания нового поста"""
@@ -113,6 +137,7 @@ def post_edit(request, post_id):
 
 
 @login_required
+@ratelimit('comment')
 def add_comment(request, post_id):
     """Добавление комментария к посту."""
     post = get_object_or_404(Post, pk=post_id)
@@ -128,9 +153,13 @@ def add_comment(request, post_id):
 @login_required
 def follow_index(request):
     """Просмотр записей, на которых подписан пользователь"""
-    author_list = Follow.objects.filter(user=request.user).values('following')
-    posts = Post.objects.filter(author__in=author_list)
-    context = {'page_obj': post_listing(posts, request), }
+    posts = Post.objects.cards().filter(
+        timeline_entries__user=request.user).annotate(
+        feed_date=F('timeline_entries__pub_date')).order_by(
+        '-feed_date', '-id')
+    context = {
+        'page_obj': post_listing(posts, request, keyset=('feed_date', 'id')),
+    }
     return render(request, 'posts/follow.html', context)
 
 
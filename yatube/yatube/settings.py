@@ -45,7 +45,7 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'rest_framework',
     'djoser',
-    'api',
+    'api.apps.ApiConfig',
     'posts.apps.PostsConfig',
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
@@ -141,8 +141,26 @@ REST_FRAMEWORK = {
     ],
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.CachedJWTAuthentication',
     ],
+
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.KeysetPagination',
+
+    'DEFAULT_THROTTLE_CLASSES': [
+        'api.throttling.TokenBucketThrottle',
+    ],
+}
+
+# Частота записи от одного пользователя или адреса: «число/период»,
+# период — s, m, h или d. Где какое ограничение действует, задают
+# ratelimits вьюсетов API и декоратор core.ratelimit.ratelimit.
+# Корзины лежат в кэше default: с LocMemCache у каждого процесса свои, и
+# ограничение при нескольких процессах сервера умножается на их число.
+RATELIMIT_RATES = {
+    'api-write': '60/m',
+    'api-bulk': '10/m',
+    'api-export': '30/h',
+    'comment': '10/m',
 }
 
 SIMPLE_JWT = {
@@ -151,6 +169,17 @@ SIMPLE_JWT = {
 }
 
 
+# Режим пагинации лент постов: 'page' (?page=N) или 'cursor' (?after=...).
+POSTS_PAGINATION = 'page'
+
+# Потоки, в которых строятся миниатюры загруженных картинок;
+# 0 — строить сразу после сохранения поста.
+POSTS_THUMBNAIL_WORKERS = 2
+
+# Снимок BK-дерева перцептивных хэшей картинок и журнал к нему (.log).
+# Каталог var/ создаётся при первой записи и не хранится в git.
+POSTS_IMAGE_INDEX = os.path.join(BASE_DIR, 'var', 'image_index.pickle')
+
 LOGIN_URL = 'users:login'
 LOGOUT_URL = 'users:logout'
 LOGIN_REDIRECT_URL = 'posts:main_page'
@@ -164,8 +193,18 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
-
-
+# Файлы называются по хэшу содержимого, одинаковые хранятся один раз.
+DEFAULT_FILE_STORAGE = 'core.storage.ContentAddressedStorage'
+# Кто отдаёт медиафайлы: None — Django (с Range и sendfile через
+# wsgi.file_wrapper), 'x-accel' — nginx по X-Accel-Redirect на
+# internal-location MEDIA_ACCEL_PREFIX, 'x-sendfile' — Apache mod_xsendfile.
+MEDIA_SENDFILE = None
+MEDIA_ACCEL_PREFIX = '/protected-media/'
+
+
+# LocMemCache годится для одного процесса. При нескольких процессах
+# нужен общий кэш (Memcached, Redis): иначе лимиты core.ratelimit и сброс
+# закэшированных лент действуют только в своём процессе.
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',